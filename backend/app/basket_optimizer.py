@@ -0,0 +1,361 @@
+"""
+Multi-vendor basket optimizer for price comparisons.
+
+Chooses which vendor supplies each line of a basket so that the sum of line
+totals plus per-vendor delivery fees is as small as possible, while every
+vendor that receives lines has the stock for them and reaches its minimum
+order amount.
+
+The search is a branch-and-bound over the set of vendors that are "opened"
+(i.e. receive at least one line). A greedy drop heuristic provides the first
+incumbent, so a usable plan exists even when the time budget runs out before
+the search completes.
+"""
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .comparison_models import (
+    ProductComparisonResult,
+    VendorResult,
+    BasketPlan,
+    BasketLineAssignment,
+    BasketVendorSummary
+)
+
+INF = float("inf")
+EPSILON = 1e-9
+
+Solution = Tuple[float, List[int]]
+
+
+class BasketOptimizer:
+    """Assign basket lines to vendors at minimum total cost"""
+
+    def __init__(self, results: List[ProductComparisonResult], time_budget_ms: int = 250):
+        self.time_budget = time_budget_ms / 1000.0
+        self.deadline = INF
+
+        self.vendor_ids: List[str] = []
+        self.vendor_names: List[str] = []
+        self.fees: List[float] = []
+        self.minimums: List[float] = []
+        vendor_index: Dict[str, int] = {}
+
+        self.line_queries = []
+        self.line_offers: List[Dict[int, VendorResult]] = []
+        self.unassigned: List[str] = []
+
+        for result in results:
+            quantity = result.query.quantity
+            offers: Dict[int, VendorResult] = {}
+            for vendor_result in result.vendors:
+                availability = vendor_result.availability
+                if not availability.in_stock:
+                    continue
+                if availability.quantity_available is not None and availability.quantity_available < quantity:
+                    continue
+
+                index = vendor_index.get(vendor_result.vendor_id)
+                if index is None:
+                    index = len(self.vendor_ids)
+                    vendor_index[vendor_result.vendor_id] = index
+                    self.vendor_ids.append(vendor_result.vendor_id)
+                    self.vendor_names.append(vendor_result.vendor_name)
+                    self.fees.append(vendor_result.pricing.delivery_fee or 0.0)
+                    self.minimums.append(vendor_result.minimum_order or 0.0)
+
+                # Keep only the cheapest matching product per vendor for this line
+                current = offers.get(index)
+                if current is None or vendor_result.pricing.unit_price < current.pricing.unit_price:
+                    offers[index] = vendor_result
+
+            if offers:
+                self.line_queries.append(result.query)
+                self.line_offers.append(offers)
+            else:
+                self.unassigned.append(result.query.name)
+
+        # costs[i][v] is the line total of line i at vendor v
+        self.costs: List[Dict[int, float]] = [
+            {v: offer.pricing.unit_price * query.quantity for v, offer in offers.items()}
+            for query, offers in zip(self.line_queries, self.line_offers)
+        ]
+        # Candidate vendors per line, cheapest first
+        self.sorted_offers: List[List[Tuple[int, float]]] = [
+            sorted(costs.items(), key=lambda entry: entry[1]) for costs in self.costs
+        ]
+
+        self.best: Optional[Solution] = None
+        self.exact = True
+        self.timed_out = False
+
+    # Evaluation of a fixed set of open vendors
+    def _total(self, assignment: List[int]) -> float:
+        used = set(assignment)
+        return sum(self.costs[i][v] for i, v in enumerate(assignment)) + sum(self.fees[v] for v in used)
+
+    def _cheapest_assignment(self, open_set: Set[int]) -> Optional[List[int]]:
+        assignment = []
+        for offers in self.sorted_offers:
+            for v, _ in offers:
+                if v in open_set:
+                    assignment.append(v)
+                    break
+            else:
+                return None
+        return assignment
+
+    def _repair_minimum(
+        self,
+        vendor: int,
+        assignment: List[int],
+        subtotals: Dict[int, float],
+        protect_donors: bool = True
+    ) -> bool:
+        """Move lines onto an under-minimum vendor, cheapest increase per dollar first"""
+        candidates = []
+        for i, current in enumerate(assignment):
+            if current != vendor and vendor in self.costs[i]:
+                added = self.costs[i][vendor]
+                increase = added - self.costs[i][current]
+                candidates.append((increase / added if added > 0 else INF, i))
+        candidates.sort()
+
+        for _, i in candidates:
+            if subtotals[vendor] >= self.minimums[vendor] - EPSILON:
+                break
+            current = assignment[i]
+            remaining = subtotals[current] - self.costs[i][current]
+            # Don't push the donor under its own minimum, unless it is emptied entirely
+            if protect_donors and EPSILON < remaining < self.minimums[current] - EPSILON:
+                continue
+            assignment[i] = vendor
+            subtotals[current] = remaining
+            subtotals[vendor] += self.costs[i][vendor]
+            if remaining <= EPSILON:
+                del subtotals[current]
+
+        return subtotals[vendor] >= self.minimums[vendor] - EPSILON
+
+    def _is_essential(self, vendor: int, assignment: List[int], open_set: Set[int]) -> bool:
+        """Whether some line assigned to the vendor has no other open supplier"""
+        return any(
+            v == vendor and all(u == vendor or u not in open_set for u in self.costs[i])
+            for i, v in enumerate(assignment)
+        )
+
+    def evaluate(self, open_vendors) -> Optional[Solution]:
+        """Cost of the best assignment found for a set of open vendors.
+
+        Vendors that cannot reach their minimum order are closed, so the result
+        may use a subset of ``open_vendors``. Returns None when no assignment
+        meeting every minimum is found.
+        """
+        open_set = set(open_vendors)
+        assignment = self._cheapest_assignment(open_set)
+        if assignment is None:
+            return None
+
+        for _ in range(2 * len(open_set) + 1):
+            subtotals: Dict[int, float] = {}
+            for i, v in enumerate(assignment):
+                subtotals[v] = subtotals.get(v, 0.0) + self.costs[i][v]
+
+            short = [v for v, subtotal in subtotals.items() if subtotal < self.minimums[v] - EPSILON]
+            if not short:
+                return self._total(assignment), assignment
+
+            # Minimums make the cheapest assignment a heuristic from here on
+            self.exact = False
+            failed = [
+                v for v in short
+                if v in subtotals and not self._repair_minimum(v, assignment, subtotals)
+            ]
+            # A later repair may have emptied a vendor that failed earlier
+            failed = [v for v in failed if v in subtotals]
+            if not failed:
+                continue
+
+            essential = [v for v in failed if self._is_essential(v, assignment, open_set)]
+            if essential:
+                # The vendor can't be closed, so let it pull lines from vendors
+                # that then have to be repaired themselves
+                if not self._repair_minimum(essential[0], assignment, subtotals, protect_donors=False):
+                    return None
+                continue
+
+            # Close the weakest under-minimum vendor and start over without it
+            open_set.discard(min(failed, key=lambda v: subtotals[v]))
+            assignment = self._cheapest_assignment(open_set)
+            if assignment is None:
+                return None
+
+        return None
+
+    def _consider(self, solution: Optional[Solution]):
+        if solution is not None and (self.best is None or solution[0] < self.best[0] - EPSILON):
+            self.best = solution
+
+    # Greedy incumbent
+    def _greedy(self):
+        cheapest = {offers[0][0] for offers in self.sorted_offers}
+        self._consider(self.evaluate(cheapest))
+        self._consider(self.evaluate(range(len(self.vendor_ids))))
+        if self.best is None:
+            return
+
+        # Drop heuristic: close one vendor at a time while it lowers the total
+        improved = True
+        while improved and time.perf_counter() < self.deadline:
+            improved = False
+            open_set = set(self.best[1])
+            for vendor in sorted(open_set):
+                candidate = self.evaluate(open_set - {vendor})
+                if candidate is not None and candidate[0] < self.best[0] - EPSILON:
+                    self.best = candidate
+                    improved = True
+                    break
+
+    # Branch and bound over open vendor sets
+    def _branch_and_bound(self):
+        vendor_count = len(self.vendor_ids)
+        line_count = len(self.costs)
+
+        # Vendors that are cheapest on many lines first, so good sets are found early
+        wins = [0] * vendor_count
+        for offers in self.sorted_offers:
+            wins[offers[0][0]] += 1
+        order = sorted(range(vendor_count), key=lambda v: (-wins[v], self.fees[v]))
+
+        # suffix_min[k][i]: cheapest cost of line i among vendors order[k:]
+        suffix_min = [[INF] * line_count for _ in range(vendor_count + 1)]
+        for k in range(vendor_count - 1, -1, -1):
+            v = order[k]
+            previous = suffix_min[k + 1]
+            current = suffix_min[k]
+            for i in range(line_count):
+                cost = self.costs[i].get(v, INF)
+                current[i] = cost if cost < previous[i] else previous[i]
+
+        included: List[int] = []
+
+        def branch(k: int, best_included: List[float], fee_total: float):
+            if self.timed_out:
+                return
+            if time.perf_counter() > self.deadline:
+                self.timed_out = True
+                return
+
+            bound = fee_total
+            remaining = suffix_min[k]
+            for i in range(line_count):
+                cost = best_included[i] if best_included[i] < remaining[i] else remaining[i]
+                if cost == INF:
+                    return
+                bound += cost
+            if self.best is not None and bound >= self.best[0] - EPSILON:
+                return
+            if k == vendor_count:
+                return
+
+            v = order[k]
+            line_costs = [self.costs[i].get(v, INF) for i in range(line_count)]
+            with_vendor = [c if c < b else b for c, b in zip(line_costs, best_included)]
+
+            # Opening a vendor only helps if it undercuts the open set on some line
+            if with_vendor != best_included:
+                included.append(v)
+                if INF not in with_vendor:
+                    self._consider(self.evaluate(included))
+                branch(k + 1, with_vendor, fee_total + self.fees[v])
+                included.pop()
+
+            branch(k + 1, best_included, fee_total)
+
+        branch(0, [INF] * line_count, 0.0)
+
+    def optimize(self) -> BasketPlan:
+        started = time.perf_counter()
+        self.deadline = started + self.time_budget
+
+        if self.costs:
+            self._greedy()
+            self._branch_and_bound()
+
+        meets_minimums = self.best is not None
+        if self.best is not None:
+            assignment = self.best[1]
+        elif self.costs:
+            # No assignment satisfies every minimum; fall back to cheapest per line
+            assignment = [offers[0][0] for offers in self.sorted_offers]
+        else:
+            assignment = []
+
+        baseline_assignment = [offers[0][0] for offers in self.sorted_offers]
+        baseline_cost = self._total(baseline_assignment) if baseline_assignment else 0.0
+
+        return self._build_plan(
+            assignment,
+            baseline_cost,
+            meets_minimums,
+            optimal=meets_minimums and self.exact and not self.timed_out,
+            search_time_ms=int((time.perf_counter() - started) * 1000)
+        )
+
+    def _build_plan(
+        self,
+        assignment: List[int],
+        baseline_cost: float,
+        meets_minimums: bool,
+        optimal: bool,
+        search_time_ms: int
+    ) -> BasketPlan:
+        lines = []
+        subtotals: Dict[int, float] = {}
+        for i, v in enumerate(assignment):
+            offer = self.line_offers[i][v]
+            query = self.line_queries[i]
+            line_total = self.costs[i][v]
+            subtotals[v] = subtotals.get(v, 0.0) + line_total
+            lines.append(BasketLineAssignment(
+                product_name=query.name,
+                quantity=query.quantity,
+                vendor_id=offer.vendor_id,
+                vendor_name=offer.vendor_name,
+                product_id=offer.product_id,
+                unit_price=offer.pricing.unit_price,
+                line_total=round(line_total, 2)
+            ))
+
+        vendors = [
+            BasketVendorSummary(
+                vendor_id=self.vendor_ids[v],
+                vendor_name=self.vendor_names[v],
+                subtotal=round(subtotal, 2),
+                delivery_fee=self.fees[v],
+                minimum_order=self.minimums[v]
+            ) for v, subtotal in subtotals.items()
+        ]
+
+        items_cost = sum(subtotals.values())
+        delivery_fees = sum(self.fees[v] for v in subtotals)
+        total_cost = items_cost + delivery_fees
+
+        return BasketPlan(
+            lines=lines,
+            vendors=vendors,
+            unassigned_products=self.unassigned,
+            items_cost=round(items_cost, 2),
+            delivery_fees=round(delivery_fees, 2),
+            total_cost=round(total_cost, 2),
+            baseline_cost=round(baseline_cost, 2),
+            potential_savings=round(max(0.0, baseline_cost - total_cost), 2),
+            meets_minimums=meets_minimums,
+            optimal=optimal,
+            search_time_ms=search_time_ms
+        )
+
+
+def optimize_basket(results: List[ProductComparisonResult], time_budget_ms: int = 250) -> BasketPlan:
+    """Compute the cheapest vendor assignment for a compared basket"""
+    return BasketOptimizer(results, time_budget_ms).optimize()
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+from pydantic import BaseModel
+from .inventory_models import InventoryCategory
+
+RESOLVED_CACHE_SIZE = 1024  # Most recently searched names whose matches are kept
+
+
+class CategoryNameView(BaseModel):
+    """Projection of the fields the index needs"""
+    category_id: int
+    name: str
+
+
+def normalize_category_name(name: str) -> str:
+    """Lowercase and collapse whitespace so lookups ignore case and spacing"""
+    return " ".join(name.lower().split())
+
+
+class CategoryNameIndex:
+    """In-memory map from normalized category name to active category IDs.
+
+    Loaded once from MongoDB, then kept current by InventoryService on every
+    category create, update and delete. Other workers' writes are picked up by
+    a periodic full reload.
+    """
+
+    def __init__(self, reload_seconds: int = 600):
+        self.reload_seconds = reload_seconds
+        self._ids_by_name: Dict[str, Set[int]] = {}
+        self._name_by_id: Dict[int, str] = {}
+        self._resolved: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_seconds
+
+    async def ensure_loaded(self):
+        """Load the index on first use and reload it when it gets old"""
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            categories = await InventoryCategory.find(
+                InventoryCategory.is_active == True
+            ).project(CategoryNameView).to_list()
+
+            ids_by_name: Dict[str, Set[int]] = {}
+            name_by_id: Dict[int, str] = {}
+            for category in categories:
+                key = normalize_category_name(category.name)
+                ids_by_name.setdefault(key, set()).add(category.category_id)
+                name_by_id[category.category_id] = key
+
+            self._ids_by_name = ids_by_name
+            self._name_by_id = name_by_id
+            self._resolved.clear()
+            self._loaded_at = time.monotonic()
+
+    def remove(self, category_id: int):
+        """Drop a category from the index"""
+        key = self._name_by_id.pop(category_id, None)
+        if key is None:
+            return
+        ids = self._ids_by_name.get(key)
+        if ids:
+            ids.discard(category_id)
+            if not ids:
+                del self._ids_by_name[key]
+        self._resolved.clear()
+
+    def upsert(self, category: InventoryCategory):
+        """Add or re-key a category after it was created or updated"""
+        self.remove(category.category_id)
+        if category.is_active:
+            key = normalize_category_name(category.name)
+            self._ids_by_name.setdefault(key, set()).add(category.category_id)
+            self._name_by_id[category.category_id] = key
+        self._resolved.clear()
+
+    async def resolve(self, name: str) -> List[int]:
+        """Return IDs of active categories whose name contains ``name``, ignoring case"""
+        await self.ensure_loaded()
+        key = normalize_category_name(name)
+
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            # Partial match, same semantics as the old case-insensitive regex.
+            # The result is memoized until the next category write, for the
+            # most recently searched names only since they come from clients.
+            resolved = sorted(
+                category_id
+                for other, ids in self._ids_by_name.items() if key in other
+                for category_id in ids
+            )
+            self._resolved[key] = resolved
+            if len(self._resolved) > RESOLVED_CACHE_SIZE:
+                self._resolved.popitem(last=False)
+        else:
+            self._resolved.move_to_end(key)
+        return resolved
+
+
+category_index = CategoryNameIndex()
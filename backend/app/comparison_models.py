@@ -15,6 +15,7 @@ class ProductQuery(BaseModel):
     category: Optional[str] = Field(None, description="Product category filter")
     brand: Optional[str] = Field(None, description="Brand filter")
     specifications: Optional[Dict[str, Any]] = Field(None, description="Product specifications")
+    quantity: int = Field(1, ge=1, description="Quantity of this product in the basket")
 
 class RequestFilters(BaseModel):
     max_price: Optional[float] = Field(None, description="Maximum price filter")
@@ -29,6 +30,8 @@ class ComparisonRequest(BaseModel):
     restaurant_location: Optional[Dict[str, float]] = Field(None, description="Restaurant coordinates (lat, lng)")
     filters: Optional[RequestFilters] = Field(None, description="Comparison filters")
     include_recommendations: Optional[bool] = Field(True, description="Include smart recommendations")
+    optimize_basket: Optional[bool] = Field(True, description="Compute the cheapest vendor assignment for the whole basket")
+    optimization_budget_ms: int = Field(250, ge=10, le=2000, description="Time budget for the basket optimizer in milliseconds")
 
 class Availability(BaseModel):
     in_stock: bool = Field(..., description="Whether product is in stock")
@@ -90,6 +93,35 @@ class ComparisonSummary(BaseModel):
     average_savings_potential: Optional[float] = Field(None, description="Average potential savings")
     best_overall_vendor: Optional[str] = Field(None, description="Best overall vendor recommendation")
 
+class BasketLineAssignment(BaseModel):
+    product_name: str = Field(..., description="Requested product name")
+    quantity: int = Field(..., description="Requested quantity")
+    vendor_id: str = Field(..., description="Vendor chosen for this line")
+    vendor_name: str = Field(..., description="Vendor business name")
+    product_id: str = Field(..., description="Vendor product identifier")
+    unit_price: float = Field(..., description="Unit price at the chosen vendor")
+    line_total: float = Field(..., description="Unit price times quantity")
+
+class BasketVendorSummary(BaseModel):
+    vendor_id: str = Field(..., description="Vendor identifier")
+    vendor_name: str = Field(..., description="Vendor business name")
+    subtotal: float = Field(..., description="Sum of line totals assigned to this vendor")
+    delivery_fee: float = Field(..., description="Delivery fee charged by this vendor")
+    minimum_order: float = Field(..., description="Vendor minimum order amount")
+
+class BasketPlan(BaseModel):
+    lines: List[BasketLineAssignment] = Field(..., description="Chosen vendor per basket line")
+    vendors: List[BasketVendorSummary] = Field(..., description="Per-vendor order totals")
+    unassigned_products: List[str] = Field([], description="Products no vendor can supply in the requested quantity")
+    items_cost: float = Field(..., description="Total of unit prices times quantities")
+    delivery_fees: float = Field(..., description="Total delivery fees")
+    total_cost: float = Field(..., description="Items cost plus delivery fees")
+    baseline_cost: Optional[float] = Field(None, description="Cost of buying every line at its cheapest vendor")
+    potential_savings: Optional[float] = Field(None, description="Baseline cost minus optimized cost")
+    meets_minimums: bool = Field(..., description="Whether every chosen vendor's minimum order is met")
+    optimal: bool = Field(..., description="Whether the search proved optimality within the time budget")
+    search_time_ms: int = Field(..., description="Optimizer execution time in milliseconds")
+
 class ComparisonResponse(BaseModel):
     request_id: str = Field(..., description="Unique request identifier")
     timestamp: datetime = Field(..., description="Response timestamp")
@@ -97,4 +129,28 @@ class ComparisonResponse(BaseModel):
     performance_metrics: PerformanceMetrics = Field(..., description="Performance metrics")
     recommendations: List[Recommendation] = Field(..., description="AI-powered recommendations")
     summary: ComparisonSummary = Field(..., description="Comparison summary")
-    smart_suggestions: Optional[List[SmartSuggestion]] = Field(None, description="Smart suggestions")
\ No newline at end of file
+    smart_suggestions: Optional[List[SmartSuggestion]] = Field(None, description="Smart suggestions")
+    optimized_basket: Optional[BasketPlan] = Field(None, description="Cheapest assignment of the basket to vendors")
+
+class PriceTrendPoint(BaseModel):
+    bucket_start: datetime = Field(..., description="Start of the day or week")
+    min_price: float = Field(..., description="Lowest recorded price in the bucket")
+    avg_price: float = Field(..., description="Average recorded price in the bucket")
+    max_price: float = Field(..., description="Highest recorded price in the bucket")
+    close_price: Optional[float] = Field(None, description="Latest price in the bucket")
+
+class VendorPriceTrend(BaseModel):
+    vendor_id: str = Field(..., description="Vendor identifier")
+    vendor_name: Optional[str] = Field(None, description="Vendor business name")
+    product_id: str = Field(..., description="Product identifier")
+    product_name: str = Field(..., description="Product name")
+    sku_id: int = Field(..., description="SKU the prices belong to")
+    points: List[PriceTrendPoint] = Field(..., description="Price statistics per bucket, oldest first")
+    price_change: Optional[float] = Field(None, description="Latest close price minus earliest open price")
+
+class PriceTrendResponse(BaseModel):
+    product: str = Field(..., description="Product name that was searched")
+    granularity: str = Field(..., description="Bucket size, day or week")
+    since: datetime = Field(..., description="Start of the reported period")
+    vendors: List[VendorPriceTrend] = Field(..., description="Price trends per vendor SKU")
+    overall: List[PriceTrendPoint] = Field(..., description="Price statistics across all vendors per bucket")
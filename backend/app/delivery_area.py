@@ -0,0 +1,145 @@
+import asyncio
+from numbers import Real
+from typing import Any, Dict, List, Optional, Set
+from .mongo_models import User
+
+METERS_PER_MILE = 1609.344
+EARTH_RADIUS_MILES = 3963.2
+
+# Upper bound for the $geoNear scan when the restaurant sets no radius of its own
+MAX_DELIVERY_RADIUS_MILES = 250.0
+
+
+def restaurant_point(location: Optional[Dict[str, float]]) -> Optional[Dict[str, Any]]:
+    """Build a GeoJSON point from {"lat", "lng"} (or latitude/longitude) coordinates"""
+    if not location:
+        return None
+    lat = location.get("lat", location.get("latitude"))
+    lng = location.get("lng", location.get("longitude"))
+    if lat is None or lng is None:
+        return None
+    return {"type": "Point", "coordinates": [float(lng), float(lat)]}
+
+
+def _validate_ring(ring: Any) -> None:
+    if not isinstance(ring, list) or len(ring) < 4:
+        raise ValueError("each polygon ring needs at least 4 positions")
+    for position in ring:
+        if (
+            not isinstance(position, list) or len(position) != 2
+            or not all(isinstance(value, Real) and not isinstance(value, bool) for value in position)
+        ):
+            raise ValueError("positions must be [longitude, latitude] pairs")
+        lng, lat = position
+        if not -180 <= lng <= 180 or not -90 <= lat <= 90:
+            raise ValueError("positions must be within longitude -180..180 and latitude -90..90")
+    if ring[0] != ring[-1]:
+        raise ValueError("polygon rings must be closed (first and last positions equal)")
+
+
+def _validate_polygon(rings: Any) -> None:
+    if not isinstance(rings, list) or not rings:
+        raise ValueError("a polygon needs at least one ring")
+    for ring in rings:
+        _validate_ring(ring)
+
+
+def validate_service_area(area: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Check that a service area is a GeoJSON Polygon or MultiPolygon the 2dsphere index accepts.
+
+    Raises ValueError so it can be used as a pydantic validator. Self-intersecting
+    rings are still left for MongoDB to reject.
+    """
+    if area is None:
+        return None
+    geometry_type = area.get("type")
+    coordinates: List[Any] = area.get("coordinates")
+    if geometry_type == "Polygon":
+        _validate_polygon(coordinates)
+    elif geometry_type == "MultiPolygon":
+        if not isinstance(coordinates, list) or not coordinates:
+            raise ValueError("a MultiPolygon needs at least one polygon")
+        for polygon in coordinates:
+            _validate_polygon(polygon)
+    else:
+        raise ValueError("service_area must be a GeoJSON Polygon or MultiPolygon")
+    return {"type": geometry_type, "coordinates": coordinates}
+
+
+async def find_vendors_delivering_to(
+    point: Dict[str, Any],
+    max_distance_miles: Optional[float] = None
+) -> Set[int]:
+    """Return user_ids of active vendors that deliver to a point.
+
+    A vendor delivers to the point when its service_area polygon contains it,
+    or when the point lies within delivery_radius_miles of its location.
+    Vendors with neither a service_area nor a usable delivery radius only
+    describe where they deliver in the free-text delivery_areas, so they are
+    kept by default. When the restaurant restricts the distance with
+    max_distance_miles, those with a location are kept if it is within that
+    distance, and those without one are dropped.
+    """
+    collection = User.get_motor_collection()
+    active_vendors = {"role": "vendor", "vendor_profile.is_active": True}
+
+    polygon_query = {
+        **active_vendors,
+        "vendor_profile.service_area": {"$geoIntersects": {"$geometry": point}}
+    }
+    if max_distance_miles is not None:
+        polygon_query["vendor_profile.location"] = {
+            "$geoWithin": {"$centerSphere": [point["coordinates"], max_distance_miles / EARTH_RADIUS_MILES]}
+        }
+
+    search_miles = MAX_DELIVERY_RADIUS_MILES
+    if max_distance_miles is not None:
+        search_miles = min(search_miles, max_distance_miles)
+    radius_pipeline = [
+        {
+            "$geoNear": {
+                "near": point,
+                "key": "vendor_profile.location",
+                "distanceField": "distance_meters",
+                "maxDistance": search_miles * METERS_PER_MILE,
+                "query": {**active_vendors, "vendor_profile.delivery_radius_miles": {"$gt": 0}},
+                "spherical": True
+            }
+        },
+        {
+            "$match": {
+                "$expr": {
+                    "$lte": [
+                        "$distance_meters",
+                        {"$multiply": ["$vendor_profile.delivery_radius_miles", METERS_PER_MILE]}
+                    ]
+                }
+            }
+        },
+        {"$project": {"_id": 0, "user_id": 1}}
+    ]
+
+    lookups = [
+        collection.distinct("user_id", polygon_query),
+        collection.aggregate(radius_pipeline).to_list(length=None)
+    ]
+    no_served_area = {
+        **active_vendors,
+        "vendor_profile.service_area": None,
+        # A radius without a location can't be measured from, so it counts as unset
+        "$or": [
+            {"vendor_profile.delivery_radius_miles": {"$not": {"$gt": 0}}},
+            {"vendor_profile.location": None}
+        ]
+    }
+    if max_distance_miles is not None:
+        no_served_area["vendor_profile.location"] = {
+            "$geoWithin": {"$centerSphere": [point["coordinates"], max_distance_miles / EARTH_RADIUS_MILES]}
+        }
+    lookups.append(collection.distinct("user_id", no_served_area))
+
+    results = await asyncio.gather(*lookups)
+    vendor_ids: Set[int] = set(results[0])
+    vendor_ids.update(doc["user_id"] for doc in results[1])
+    vendor_ids.update(results[2])
+    return vendor_ids
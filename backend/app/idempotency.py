@@ -0,0 +1,182 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+The first request with a key claims it by inserting an "in_progress" record
+(the unique index makes the claim atomic), runs the handler, and stores the
+response. Retries with the same key and body get the stored response back
+without running the handler again. A retry that arrives while the first
+request is still running waits for its result instead of creating a
+duplicate. Records expire through a TTL index.
+
+Only a failing handler gives the key up. Once the handler has succeeded, a
+response that can't be stored leaves the key in progress, so retries get a
+409 rather than running the handler a second time.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+from .mongo_models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_HOURS = 24
+# How long a retry waits for an in-flight request handled by another worker
+IN_FLIGHT_WAIT_SECONDS = 10.0
+IN_FLIGHT_POLL_SECONDS = 0.1
+STORE_ATTEMPTS = 3
+STORE_RETRY_SECONDS = 0.2
+
+# Requests in flight in this process, so duplicates can await them directly
+_in_flight: Dict[Tuple[int, str, str], "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of a request body"""
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _check_fingerprint(record: IdempotencyRecord, fingerprint: str):
+    if record.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request body"
+        )
+
+
+async def _wait_for_record(user_id: int, endpoint: str, key: str, fingerprint: str) -> Dict[str, Any]:
+    """Poll the stored record until the request that owns it completes"""
+    deadline = time.monotonic() + IN_FLIGHT_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        record = await IdempotencyRecord.find_one(
+            IdempotencyRecord.user_id == user_id,
+            IdempotencyRecord.endpoint == endpoint,
+            IdempotencyRecord.key == key
+        )
+        if record is None:
+            # The original request failed and gave the key up
+            break
+        _check_fingerprint(record, fingerprint)
+        if record.status == "completed":
+            return record.response_body
+        await asyncio.sleep(IN_FLIGHT_POLL_SECONDS)
+
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is still being processed"
+    )
+
+
+async def _store_response(record: IdempotencyRecord, response_body: Dict[str, Any]):
+    """Mark the record completed, retrying a few times before leaving it in progress"""
+    for attempt in range(1, STORE_ATTEMPTS + 1):
+        try:
+            await record.set({
+                IdempotencyRecord.status: "completed",
+                IdempotencyRecord.response_body: response_body
+            })
+            return
+        except Exception as e:
+            if attempt == STORE_ATTEMPTS:
+                logger.error(
+                    f"Failed to store the response for idempotency key {record.key}, "
+                    f"keeping it in progress: {e}"
+                )
+                return
+            await asyncio.sleep(STORE_RETRY_SECONDS * attempt)
+
+
+def _fail(future: "asyncio.Future[Dict[str, Any]]", error: BaseException):
+    """Pass a failure on to duplicates awaiting the in-flight request"""
+    if isinstance(error, asyncio.CancelledError):
+        future.cancel()
+    else:
+        future.set_exception(error)
+        # Nobody may be waiting on the future; don't warn about its exception
+        future.exception()
+
+
+async def run_idempotent(
+    key: Optional[str],
+    user_id: int,
+    endpoint: str,
+    payload: Any,
+    handler: Callable[[], Awaitable[Any]]
+) -> Any:
+    """Run ``handler`` at most once per (user, endpoint, key).
+
+    Without a key the handler just runs. Replays return the stored JSON
+    response, which FastAPI validates against the route's response_model.
+    """
+    if not key:
+        return await handler()
+
+    fingerprint = request_fingerprint(payload)
+    flight_key = (user_id, endpoint, key)
+
+    in_flight = _in_flight.get(flight_key)
+    if in_flight is not None:
+        record = await IdempotencyRecord.find_one(
+            IdempotencyRecord.user_id == user_id,
+            IdempotencyRecord.endpoint == endpoint,
+            IdempotencyRecord.key == key
+        )
+        if record is not None:
+            _check_fingerprint(record, fingerprint)
+        return await asyncio.shield(in_flight)
+
+    record = IdempotencyRecord(
+        key=key,
+        user_id=user_id,
+        endpoint=endpoint,
+        fingerprint=fingerprint,
+        expires_at=datetime.utcnow() + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    )
+    try:
+        await record.insert()
+    except DuplicateKeyError:
+        existing = await IdempotencyRecord.find_one(
+            IdempotencyRecord.user_id == user_id,
+            IdempotencyRecord.endpoint == endpoint,
+            IdempotencyRecord.key == key
+        )
+        if existing is None:
+            # Expired or released between the insert and the lookup
+            return await run_idempotent(key, user_id, endpoint, payload, handler)
+        _check_fingerprint(existing, fingerprint)
+        if existing.status == "completed":
+            return existing.response_body
+        return await _wait_for_record(user_id, endpoint, key, fingerprint)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[flight_key] = future
+    try:
+        try:
+            result = await handler()
+        except BaseException as e:
+            # Failed requests don't keep the key, so the client can retry them
+            try:
+                await record.delete()
+            except Exception as delete_error:
+                logger.error(f"Failed to release idempotency key {key}: {delete_error}")
+            _fail(future, e)
+            raise
+
+        # The handler's writes are done; from here on the key is never released
+        try:
+            response_body = jsonable_encoder(result)
+        except BaseException as e:
+            _fail(future, e)
+            raise
+        future.set_result(response_body)
+        await _store_response(record, response_body)
+        return result
+    finally:
+        _in_flight.pop(flight_key, None)
@@ -0,0 +1,392 @@
+"""
+Bulk catalog import from an uploaded CSV or NDJSON (JSON lines) file.
+
+The file is read row by row and processed in batches. For each batch the
+rows are validated against the vendor's category and item names (loaded once
+per import) and the SKU codes already taken (one $in query per batch), IDs
+are allocated in blocks from InventoryCounter, and new categories, items and
+SKUs are written with unordered bulk inserts. Progress and row errors are
+stored on an InventoryImportJob.
+
+Reading and parsing the upload is blocking file I/O, so each batch of rows is
+pulled from the parser on the threadpool. An item gets at most one default
+SKU, and a new item whose SKUs all fail to insert is removed again rather
+than left in the catalog without any.
+"""
+import codecs
+import csv
+import json
+import logging
+import uuid
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+from beanie.operators import In
+from .inventory_models import (
+    InventoryCategory, InventoryItem, InventorySKU,
+    InventoryImportJob, InventoryImportRow, ImportRowError
+)
+from .inventory_service import InventoryService
+from .category_index import category_index, normalize_category_name
+from .typeahead import typeahead_index
+from .price_history_service import PriceHistoryService
+from .stock_reservations import run_in_transaction
+from .stock_movements import stock_movement, insert_movements
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ERRORS = 1000
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+class ItemKeyView(BaseModel):
+    item_id: int
+    category_id: int
+    name: str
+
+
+class SKUCodeView(BaseModel):
+    sku_code: str
+
+
+def detect_import_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """Pick the parser from the file extension, falling back to the content type"""
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl", ".json")) or content_type in ("application/x-ndjson", "application/json"):
+        return "ndjson"
+    return None
+
+
+def iter_import_rows(file, file_format: str) -> Iterator[Any]:
+    """Yield raw rows from a binary file object without reading it all into memory.
+
+    A JSON line that doesn't parse is yielded as its ValueError so it can be
+    reported against its row number.
+    """
+    text = codecs.getreader("utf-8-sig")(file)
+    if file_format == "csv":
+        for row in csv.DictReader(text):
+            # Empty cells mean "use the default"
+            yield {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+    else:
+        for line in text:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield e
+
+
+def _next_rows(rows: Iterator[Any], count: int) -> List[Any]:
+    return list(islice(rows, count))
+
+
+def _item_key(category_id: int, item_name: str) -> Tuple[int, str]:
+    return category_id, normalize_category_name(item_name)
+
+
+def _item_name_key(row: InventoryImportRow) -> Tuple[str, str]:
+    """Identifies a row's item before its category has an ID"""
+    return normalize_category_name(row.category), normalize_category_name(row.item_name)
+
+
+class InventoryImportService:
+    """Runs catalog imports and tracks them as InventoryImportJob documents"""
+
+    def __init__(self, job: InventoryImportJob):
+        self.job = job
+        self.vendor_id = job.vendor_id
+        self.category_ids: Dict[str, int] = {}
+        self.item_ids: Dict[Tuple[int, str], int] = {}
+        self.seen_sku_codes: set = set()
+        self.default_items: Set[Tuple[str, str]] = set()
+
+    @staticmethod
+    async def create_job(vendor_id: int, filename: Optional[str], file_format: str) -> InventoryImportJob:
+        job = InventoryImportJob(
+            job_id=str(uuid.uuid4()),
+            vendor_id=vendor_id,
+            filename=filename,
+            file_format=file_format
+        )
+        await job.insert()
+        return job
+
+    @staticmethod
+    async def get_job(vendor_id: int, job_id: str) -> Optional[InventoryImportJob]:
+        return await InventoryImportJob.find_one(
+            InventoryImportJob.job_id == job_id,
+            InventoryImportJob.vendor_id == vendor_id
+        )
+
+    def _fail_row(self, row: int, message: str, sku_code: Optional[str] = None):
+        self.job.rows_failed += 1
+        self._report(row, message, sku_code)
+
+    def _report(self, row: int, message: str, sku_code: Optional[str] = None):
+        if len(self.job.errors) < MAX_IMPORT_ERRORS:
+            self.job.errors.append(ImportRowError(row=row, sku_code=sku_code, message=message))
+
+    def _row_item_key(self, row: InventoryImportRow) -> Optional[Tuple[int, str]]:
+        category_id = self.category_ids.get(normalize_category_name(row.category))
+        return _item_key(category_id, row.item_name) if category_id is not None else None
+
+    async def _load_caches(self):
+        """Load the vendor's category and item names once per import"""
+        categories = await InventoryCategory.find(InventoryCategory.vendor_id == self.vendor_id).to_list()
+        for category in categories:
+            # Active categories win over inactive ones with the same name
+            key = normalize_category_name(category.name)
+            if key not in self.category_ids or category.is_active:
+                self.category_ids[key] = category.category_id
+
+        items = await InventoryItem.find(InventoryItem.vendor_id == self.vendor_id).project(ItemKeyView).to_list()
+        for item in items:
+            self.item_ids[_item_key(item.category_id, item.name)] = item.item_id
+
+    async def run(self, file):
+        """Import every row of the file, saving progress after each batch"""
+        await self.job.set({InventoryImportJob.status: "running"})
+        try:
+            await self._load_caches()
+            rows = iter_import_rows(file, self.job.file_format)
+            row_number = 0
+            while True:
+                raw_rows = await run_in_threadpool(_next_rows, rows, IMPORT_BATCH_SIZE)
+                if not raw_rows:
+                    break
+                await self._process_batch([
+                    (row_number + offset, raw) for offset, raw in enumerate(raw_rows, start=1)
+                ])
+                row_number += len(raw_rows)
+            self.job.status = "completed"
+        except Exception as e:
+            logger.error(f"Inventory import {self.job.job_id} failed: {str(e)}")
+            self.job.status = "failed"
+            self.job.message = str(e)
+        self.job.finished_at = datetime.utcnow()
+        await self.job.save()
+
+    async def _process_batch(self, batch: List[Tuple[int, Any]]):
+        rows: List[Tuple[int, InventoryImportRow]] = []
+        for row_number, raw in batch:
+            if isinstance(raw, ValueError):
+                self._fail_row(row_number, f"Invalid JSON: {raw}")
+                continue
+            if not isinstance(raw, dict):
+                self._fail_row(row_number, "Row must be a JSON object")
+                continue
+            try:
+                rows.append((row_number, InventoryImportRow.parse_obj(raw)))
+            except ValidationError as e:
+                self._fail_row(row_number, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                ), raw.get("sku_code"))
+
+        # SKU codes are unique across all vendors
+        codes = [row.sku_code for _, row in rows if row.sku_code]
+        taken = {
+            sku.sku_code for sku in await InventorySKU.find(
+                In(InventorySKU.sku_code, codes)
+            ).project(SKUCodeView).to_list()
+        } if codes else set()
+
+        accepted: List[Tuple[int, InventoryImportRow]] = []
+        for row_number, row in rows:
+            if row.sku_code and (row.sku_code in taken or row.sku_code in self.seen_sku_codes):
+                self._fail_row(row_number, "SKU code already exists", row.sku_code)
+                continue
+            if row.sku_code:
+                self.seen_sku_codes.add(row.sku_code)
+            accepted.append((row_number, row))
+
+        accepted = await self._reject_extra_defaults(accepted)
+        await self._create_categories(accepted)
+        new_items = await self._create_items(accepted)
+        stocked_item_ids = await self._create_skus(accepted)
+        await self._remove_items_without_skus(accepted, new_items, stocked_item_ids)
+
+        self.job.rows_processed += len(batch)
+        await self.job.save()
+
+    async def _reject_extra_defaults(
+        self,
+        rows: List[Tuple[int, InventoryImportRow]]
+    ) -> List[Tuple[int, InventoryImportRow]]:
+        """Drop default SKU rows for items that already have an active default"""
+        defaults = [(row_number, row) for row_number, row in rows if row.sku_code and row.is_default]
+        if not defaults:
+            return rows
+
+        existing_item_ids = [
+            self.item_ids[key] for key in (self._row_item_key(row) for _, row in defaults)
+            if key in self.item_ids
+        ]
+        has_default = set(await InventorySKU.get_motor_collection().distinct("item_id", {
+            "item_id": {"$in": existing_item_ids},
+            "is_default": True,
+            "is_active": True
+        })) if existing_item_ids else set()
+
+        rejected = set()
+        for row_number, row in defaults:
+            name_key = _item_name_key(row)
+            if name_key in self.default_items or self.item_ids.get(self._row_item_key(row)) in has_default:
+                self._fail_row(row_number, "Item already has a default SKU", row.sku_code)
+                rejected.add(row_number)
+            else:
+                self.default_items.add(name_key)
+        return [(row_number, row) for row_number, row in rows if row_number not in rejected]
+
+    async def _create_categories(self, rows: List[Tuple[int, InventoryImportRow]]):
+        names: Dict[str, str] = {}
+        for _, row in rows:
+            key = normalize_category_name(row.category)
+            if key not in self.category_ids and key not in names:
+                names[key] = row.category.strip()
+        if not names:
+            return
+
+        first_id = await InventoryService.allocate_sequence_block("inventory_categories", len(names))
+        categories = [
+            InventoryCategory(category_id=first_id + offset, vendor_id=self.vendor_id, name=name)
+            for offset, name in enumerate(names.values())
+        ]
+        await InventoryCategory.insert_many(categories, ordered=False)
+        for key, category in zip(names, categories):
+            self.category_ids[key] = category.category_id
+            category_index.upsert(category)
+            typeahead_index.upsert_category(category)
+        self.job.categories_created += len(categories)
+
+    async def _create_items(self, rows: List[Tuple[int, InventoryImportRow]]) -> Dict[Tuple[int, str], InventoryItem]:
+        new_items: Dict[Tuple[int, str], InventoryImportRow] = {}
+        for _, row in rows:
+            key = self._row_item_key(row)
+            if key not in self.item_ids and key not in new_items:
+                new_items[key] = row
+        if not new_items:
+            return {}
+
+        first_id = await InventoryService.allocate_sequence_block("inventory_items", len(new_items))
+        items = [
+            InventoryItem(
+                item_id=first_id + offset,
+                vendor_id=self.vendor_id,
+                category_id=key[0],
+                name=row.item_name.strip(),
+                description=row.description,
+                brand=row.brand,
+                unit_of_measure=row.unit_of_measure,
+                base_price=row.base_price if row.base_price is not None else row.price,
+                cost_price=row.cost_price,
+                tags=row.tags
+            )
+            for offset, (key, row) in enumerate(new_items.items())
+        ]
+        await InventoryItem.insert_many(items, ordered=False)
+        for key, item in zip(new_items, items):
+            self.item_ids[key] = item.item_id
+            typeahead_index.upsert_item(item)
+        self.job.items_created += len(items)
+        return dict(zip(new_items, items))
+
+    async def _create_skus(self, rows: List[Tuple[int, InventoryImportRow]]) -> Set[int]:
+        """Insert the rows' SKUs and return the IDs of the items that got at least one"""
+        sku_rows = [(row_number, row) for row_number, row in rows if row.sku_code]
+        if not sku_rows:
+            return set()
+
+        first_id = await InventoryService.allocate_sequence_block("inventory_skus", len(sku_rows))
+        skus = []
+        for offset, (_, row) in enumerate(sku_rows):
+            skus.append(InventorySKU(
+                sku_id=first_id + offset,
+                vendor_id=self.vendor_id,
+                item_id=self.item_ids[self._row_item_key(row)],
+                sku_code=row.sku_code,
+                variant_name=row.variant_name,
+                price=row.price,
+                cost_price=row.cost_price,
+                discount_price=row.discount_price,
+                current_stock=row.current_stock,
+                available_stock=row.current_stock,
+                low_stock_threshold=row.low_stock_threshold,
+                is_default=row.is_default
+            ))
+
+        # The SKUs and their opening stock movements are written in one transaction
+        pending = list(range(len(skus)))
+
+        async def insert(session):
+            created = [skus[index] for index in pending]
+            await InventorySKU.insert_many(created, session=session)
+            await insert_movements([
+                stock_movement(sku.dict(), "receive", quantity=sku.current_stock)
+                for sku in created if sku.current_stock
+            ], session)
+
+        while pending:
+            try:
+                await run_in_transaction(insert)
+                break
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                if not write_errors:
+                    raise
+                # A concurrent import or create_sku took some of the codes; the
+                # error aborted the transaction, so run it again without them
+                failed_indexes = set()
+                for error in write_errors:
+                    index = pending[error["index"]]
+                    failed_indexes.add(index)
+                    row_number, row = sku_rows[index]
+                    message = "SKU code already exists" if error.get("code") == 11000 else error.get("errmsg", "Write failed")
+                    self._fail_row(row_number, message, row.sku_code)
+                    if row.is_default:
+                        self.default_items.discard(_item_name_key(row))
+                pending = [index for index in pending if index not in failed_indexes]
+
+        created = [skus[index] for index in pending]
+        self.job.skus_created += len(created)
+        try:
+            await PriceHistoryService.record_initial_prices(created)
+        except Exception as e:
+            logger.error(f"Failed to record initial prices for import {self.job.job_id}: {str(e)}")
+        return {sku.item_id for sku in created}
+
+    async def _remove_items_without_skus(
+        self,
+        rows: List[Tuple[int, InventoryImportRow]],
+        new_items: Dict[Tuple[int, str], InventoryItem],
+        stocked_item_ids: Set[int]
+    ):
+        """Delete items created by this batch whose SKU rows all failed.
+
+        Rows without a sku_code ask for an item without SKUs, so their items
+        are kept. Each removed item is reported against its first row.
+        """
+        orphans = {key: item for key, item in new_items.items() if item.item_id not in stocked_item_ids}
+        for _, row in rows:
+            if not row.sku_code:
+                orphans.pop(self._row_item_key(row), None)
+        if not orphans:
+            return
+
+        await InventoryItem.find(In(InventoryItem.item_id, [item.item_id for item in orphans.values()])).delete()
+        for key, item in orphans.items():
+            del self.item_ids[key]
+            typeahead_index.remove_item(item.item_id)
+        self.job.items_created -= len(orphans)
+
+        for row_number, row in rows:
+            item = orphans.pop(self._row_item_key(row), None)
+            if item is not None:
+                self._report(row_number, f"Item '{item.name}' was not created because none of its SKUs could be")
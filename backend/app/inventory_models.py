@@ -1,9 +1,13 @@
-from beanie import Document, Indexed
-from pydantic import BaseModel, Field
+from beanie import Document, Indexed, TimeSeriesConfig, Granularity
+from pydantic import BaseModel, Field, validator, root_validator, conlist
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
 
+# Server-side form of InventorySKU.is_low_stock for update pipelines
+LOW_STOCK_EXPRESSION = {"$lte": ["$current_stock", "$low_stock_threshold"]}
+
 
 class InventoryCategory(Document):
     """Inventory category document for organizing items"""
@@ -12,6 +16,7 @@ class InventoryCategory(Document):
     name: str
     description: Optional[str] = None
     parent_category_id: Optional[int] = None  # For hierarchical categories
+    ancestor_ids: List[int] = []  # Materialized path from the root down to the parent
     is_active: bool = True
     sort_order: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -19,6 +24,10 @@ class InventoryCategory(Document):
     
     class Settings:
         name = "inventory_categories"
+        indexes = [
+            # Multikey: finds every category under a given one in a single lookup
+            IndexModel([("vendor_id", ASCENDING), ("ancestor_ids", ASCENDING)], name="vendor_ancestors"),
+        ]
 
 
 class InventoryItem(Document):
@@ -80,6 +89,8 @@ class InventorySKU(Document):
     reserved_stock: int = 0  # Stock reserved for pending orders
     available_stock: int = 0  # current_stock - reserved_stock
     low_stock_threshold: int = 0
+    is_low_stock: bool = False  # current_stock <= low_stock_threshold, kept in sync on every write
+    last_stock_change: int = 0  # Change to current_stock made by the latest stock adjustment
     
     # Physical attributes
     weight: Optional[float] = None  # in kg
@@ -96,8 +107,21 @@ class InventorySKU(Document):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
+    @root_validator(skip_on_failure=True)
+    def set_low_stock(cls, values):
+        values["is_low_stock"] = values["current_stock"] <= values["low_stock_threshold"]
+        return values
+    
     class Settings:
         name = "inventory_skus"
+        indexes = [
+            # Only low-stock SKUs are indexed, so the reorder feed stays small at any catalog size
+            IndexModel(
+                [("vendor_id", ASCENDING), ("is_low_stock", ASCENDING), ("sku_id", ASCENDING)],
+                name="vendor_low_stock",
+                partialFilterExpression={"is_low_stock": True}
+            ),
+        ]
 
 
 class InventoryCounter(Document):
@@ -109,6 +133,128 @@ class InventoryCounter(Document):
         name = "inventory_counters"
 
 
+class PriceChangeMeta(BaseModel):
+    """Time-series metadata identifying the SKU whose price changed"""
+    vendor_id: int
+    item_id: int
+    sku_id: int
+
+
+class SKUPriceChange(Document):
+    """Raw SKU price change event, stored in a time-series collection"""
+    changed_at: datetime = Field(default_factory=datetime.utcnow)
+    meta: PriceChangeMeta
+    price: float
+    previous_price: Optional[float] = None
+
+    class Settings:
+        name = "sku_price_changes"
+        timeseries = TimeSeriesConfig(
+            time_field="changed_at",
+            meta_field="meta",
+            granularity=Granularity.hours
+        )
+
+
+class PriceHistoryBucket(Document):
+    """Daily or weekly min/avg/max price of a SKU, maintained on every price change"""
+    sku_id: int
+    item_id: int
+    vendor_id: int
+    granularity: str  # "day" or "week"
+    bucket_start: datetime
+    open_price: float  # Price in effect when the bucket started
+    close_price: float  # Latest price within the bucket
+    min_price: float
+    max_price: float
+    price_sum: float = 0.0  # Sum of recorded prices, avg = price_sum / sample_count
+    sample_count: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "price_history_buckets"
+        indexes = [
+            IndexModel(
+                [("sku_id", ASCENDING), ("granularity", ASCENDING), ("bucket_start", ASCENDING)],
+                name="sku_granularity_bucket", unique=True
+            ),
+            IndexModel(
+                [("item_id", ASCENDING), ("granularity", ASCENDING), ("bucket_start", ASCENDING)],
+                name="item_granularity_bucket"
+            ),
+        ]
+
+
+class StockMovement(Document):
+    """Append-only ledger entry for one change to a SKU's stock levels.
+
+    Besides the change itself, each entry carries the levels the SKU was left
+    at, as returned by the same atomic update, so the stock at any moment is
+    the levels of the last movement before it.
+    """
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    vendor_id: int
+    item_id: int
+    sku_id: int
+    movement_type: str  # "receive", "sale", "adjustment", "reservation", "release"
+    quantity: int = 0  # Change to current_stock
+    reserved_quantity: int = 0  # Change to reserved_stock
+    current_stock: int  # Levels after the movement
+    reserved_stock: int
+    order_id: Optional[int] = None  # Order behind a reservation, release or sale
+
+    class Settings:
+        # A regular collection: time-series collections can't be written in a transaction
+        name = "stock_ledger"
+        indexes = [
+            IndexModel([("sku_id", ASCENDING), ("created_at", DESCENDING)], name="sku_created"),
+        ]
+
+
+class StockSnapshot(Document):
+    """Periodic copy of a SKU's stock levels, the starting point for point-in-time lookups"""
+    sku_id: int
+    vendor_id: int
+    current_stock: int
+    reserved_stock: int
+    taken_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "stock_snapshots"
+        indexes = [
+            IndexModel([("sku_id", ASCENDING), ("taken_at", DESCENDING)], name="sku_taken"),
+            IndexModel([("taken_at", DESCENDING)], name="taken_at"),
+        ]
+
+
+class ImportRowError(BaseModel):
+    """A row of a catalog import that was not imported"""
+    row: int  # 1-based data row number, not counting the CSV header
+    sku_code: Optional[str] = None
+    message: str
+
+
+class InventoryImportJob(Document):
+    """Progress and outcome of a bulk catalog import"""
+    job_id: Indexed(str, unique=True)
+    vendor_id: Indexed(int)
+    filename: Optional[str] = None
+    file_format: str  # "csv" or "ndjson"
+    status: str = "queued"  # "queued", "running", "completed", "failed"
+    rows_processed: int = 0
+    rows_failed: int = 0
+    categories_created: int = 0
+    items_created: int = 0
+    skus_created: int = 0
+    errors: List[ImportRowError] = []  # First MAX_IMPORT_ERRORS row errors
+    message: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "inventory_import_jobs"
+
+
 # Pydantic models for API requests/responses
 class CategoryCreate(BaseModel):
     name: str
@@ -131,12 +277,22 @@ class CategoryResponse(BaseModel):
     name: str
     description: Optional[str] = None
     parent_category_id: Optional[int] = None
+    ancestor_ids: List[int] = []
     is_active: bool
     sort_order: int
     created_at: datetime
     updated_at: datetime
 
 
+class CategoryTreeNode(CategoryResponse):
+    item_count: int = 0  # Active items directly in this category
+    subtree_item_count: int = 0  # Active items in this category and all its subcategories
+    children: List["CategoryTreeNode"] = []
+
+
+CategoryTreeNode.update_forward_refs()
+
+
 class ItemCreate(BaseModel):
     category_id: int
     name: str
@@ -253,6 +409,7 @@ class SKUResponse(BaseModel):
     reserved_stock: int
     available_stock: int
     low_stock_threshold: int
+    is_low_stock: bool = False
     weight: Optional[float] = None
     dimensions: Optional[Dict[str, float]] = None
     is_active: bool
@@ -263,19 +420,157 @@ class SKUResponse(BaseModel):
     updated_at: datetime
 
 
+class InventoryImportRow(BaseModel):
+    """One row of a catalog import: an item, optionally with one of its SKUs.
+
+    Rows with the same category and item_name belong to the same item.
+    """
+    category: str
+    item_name: str
+    description: Optional[str] = None
+    brand: Optional[str] = None
+    unit_of_measure: str = "each"
+    base_price: Optional[float] = None  # Defaults to the SKU price
+    tags: List[str] = []
+    sku_code: Optional[str] = None
+    variant_name: Optional[str] = None
+    price: Optional[float] = None
+    cost_price: Optional[float] = None
+    discount_price: Optional[float] = None
+    current_stock: int = 0
+    low_stock_threshold: int = 0
+    is_default: bool = False
+
+    @validator("tags", pre=True)
+    def split_tags(cls, value):
+        # CSV cells hold tags as "organic;local"
+        if isinstance(value, str):
+            return [tag.strip() for tag in value.replace("|", ";").split(";") if tag.strip()]
+        return value
+
+    @validator("base_price", "price", "cost_price", "discount_price", "current_stock", "low_stock_threshold")
+    def not_negative(cls, value):
+        if value is not None and value < 0:
+            raise ValueError("must be non-negative")
+        return value
+
+    @root_validator(skip_on_failure=True)
+    def check_prices(cls, values):
+        if values.get("sku_code") and values.get("price") is None:
+            raise ValueError("price is required for a SKU")
+        if values.get("base_price") is None and values.get("price") is None:
+            raise ValueError("base_price or price is required")
+        return values
+
+
+class StockAdjustment(BaseModel):
+    """One line of a bulk stock update; identifies the SKU by sku_id or sku_code"""
+    sku_id: Optional[int] = None
+    sku_code: Optional[str] = None
+    operation: str = Field("set", regex="^(add|subtract|set)$")
+    quantity: int
+
+    @root_validator(skip_on_failure=True)
+    def check_sku_reference(cls, values):
+        if (values.get("sku_id") is None) == (values.get("sku_code") is None):
+            raise ValueError("exactly one of sku_id or sku_code is required")
+        return values
+
+
+class BulkStockUpdate(BaseModel):
+    adjustments: conlist(StockAdjustment, min_items=1, max_items=1000)
+    atomic: bool = False  # Apply all lines in one transaction, or none if any SKU is unknown
+
+
+class StockAdjustmentResult(BaseModel):
+    index: int
+    sku_id: Optional[int] = None
+    sku_code: Optional[str] = None
+    success: bool
+    error: Optional[str] = None
+    current_stock: Optional[int] = None
+    reserved_stock: Optional[int] = None
+    available_stock: Optional[int] = None
+
+
+class BulkStockUpdateResponse(BaseModel):
+    updated: int
+    failed: int
+    results: List[StockAdjustmentResult]
+
+
+class LowStockFeedResponse(BaseModel):
+    skus: List[SKUResponse]
+    next_after: Optional[int] = None  # Pass as ?after= for the next page
+
+
+class StockMovementResponse(BaseModel):
+    sku_id: int
+    movement_type: str
+    quantity: int
+    reserved_quantity: int
+    current_stock: int
+    reserved_stock: int
+    order_id: Optional[int] = None
+    created_at: datetime
+
+
+class StockLevelResponse(BaseModel):
+    sku_id: int
+    at: datetime
+    current_stock: int
+    reserved_stock: int
+    available_stock: int
+    source: str  # "movement" or "snapshot"
+    as_of: datetime  # When the levels were recorded
+
+
+class InventoryImportJobResponse(BaseModel):
+    job_id: str
+    filename: Optional[str] = None
+    file_format: str
+    status: str
+    rows_processed: int
+    rows_failed: int
+    categories_created: int
+    items_created: int
+    skus_created: int
+    errors: List[ImportRowError]
+    message: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
 # Export all models for easy import
 __all__ = [
     "InventoryCategory", 
     "InventoryItem", 
     "InventorySKU",
     "InventoryCounter",
+    "PriceChangeMeta",
+    "SKUPriceChange",
+    "PriceHistoryBucket",
+    "StockMovement",
+    "StockSnapshot",
+    "ImportRowError",
+    "InventoryImportJob",
     "CategoryCreate",
     "CategoryUpdate", 
     "CategoryResponse",
+    "CategoryTreeNode",
     "ItemCreate",
     "ItemUpdate",
     "ItemResponse",
     "SKUCreate",
     "SKUUpdate",
-    "SKUResponse"
+    "SKUResponse",
+    "InventoryImportRow",
+    "InventoryImportJobResponse",
+    "StockAdjustment",
+    "BulkStockUpdate",
+    "StockAdjustmentResult",
+    "BulkStockUpdateResponse",
+    "LowStockFeedResponse",
+    "StockMovementResponse",
+    "StockLevelResponse"
 ]
\ No newline at end of file
@@ -1,37 +1,90 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from .inventory_models import (
     InventoryCategory, InventoryItem, InventorySKU, InventoryCounter,
-    CategoryCreate, CategoryUpdate, CategoryResponse,
+    CategoryCreate, CategoryUpdate, CategoryResponse, CategoryTreeNode,
     ItemCreate, ItemUpdate, ItemResponse,
-    SKUCreate, SKUUpdate, SKUResponse
+    SKUCreate, SKUUpdate, SKUResponse,
+    BulkStockUpdate, StockAdjustmentResult, BulkStockUpdateResponse,
+    LowStockFeedResponse, LOW_STOCK_EXPRESSION
 )
+from .category_index import category_index
+from .typeahead import typeahead_index
+from .price_history_service import PriceHistoryService
+from .stock_reservations import run_in_transaction
+from .stock_movements import stock_movement, insert_movements, MOVEMENT_PROJECTION
 from fastapi import HTTPException, status
+from beanie.operators import In, Or
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+
+STOCK_OPERATIONS = ("add", "subtract", "set")
+
+# Fields to read back from a stock write for the response and its movement
+STOCK_LEVEL_PROJECTION = {**MOVEMENT_PROJECTION, "available_stock": 1, "last_stock_change": 1}
+
+
+def stock_update_pipeline(quantity_change: int, operation: str, now: datetime) -> List[Dict[str, Any]]:
+    """Update pipeline applying a stock operation on the server"""
+    return stock_operations_pipeline([(quantity_change, operation)], now)
+
+
+def stock_operations_pipeline(operations: List[Tuple[int, str]], now: datetime) -> List[Dict[str, Any]]:
+    """Update pipeline applying stock operations to one SKU in order.
+
+    current_stock is clamped at zero after every operation and
+    available_stock is recomputed from the stored reserved_stock in the same
+    write, so concurrent adjustments and reservations can't overwrite each
+    other. is_low_stock is refreshed from the new level, and
+    last_stock_change records the net change actually applied for the stock
+    movement ledger.
+    """
+    # A "set" overrides everything before it
+    last_set = max((index for index, (_, operation) in enumerate(operations) if operation == "set"), default=0)
+    # last_stock_change holds the starting level until the final stage
+    stages: List[Dict[str, Any]] = [{"$set": {"last_stock_change": "$current_stock", "updated_at": now}}]
+    for quantity_change, operation in operations[last_set:]:
+        if operation == "add":
+            new_stock = {"$add": ["$current_stock", quantity_change]}
+        elif operation == "subtract":
+            new_stock = {"$subtract": ["$current_stock", quantity_change]}
+        else:
+            new_stock = {"$literal": quantity_change}
+        stages.append({"$set": {"current_stock": {"$max": [0, new_stock]}}})
+    stages.append({"$set": {
+        "last_stock_change": {"$subtract": ["$current_stock", "$last_stock_change"]},
+        "available_stock": {"$subtract": ["$current_stock", "$reserved_stock"]},
+        "is_low_stock": LOW_STOCK_EXPRESSION
+    }})
+    return stages
 
 
 class InventoryService:
     """Service layer for inventory management operations"""
     
+    @staticmethod
+    async def allocate_sequence_block(collection_name: str, count: int) -> int:
+        """Reserve ``count`` consecutive IDs for a collection and return the first one"""
+        try:
+            counter = await InventoryCounter.get_motor_collection().find_one_and_update(
+                {"collection_name": collection_name},
+                {"$inc": {"sequence_value": count}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two first-time upserts raced; the counter exists now
+            counter = await InventoryCounter.get_motor_collection().find_one_and_update(
+                {"collection_name": collection_name},
+                {"$inc": {"sequence_value": count}},
+                return_document=ReturnDocument.AFTER
+            )
+        return counter["sequence_value"] - count + 1
+
     @staticmethod
     async def get_next_sequence(collection_name: str) -> int:
         """Get next auto-increment ID for a collection"""
-        counter = await InventoryCounter.find_one(
-            InventoryCounter.collection_name == collection_name
-        )
-        
-        if not counter:
-            # Create new counter
-            counter = InventoryCounter(
-                collection_name=collection_name,
-                sequence_value=1
-            )
-            await counter.save()
-            return 1
-        else:
-            # Increment and save
-            counter.sequence_value += 1
-            await counter.save()
-            return counter.sequence_value
+        return await InventoryService.allocate_sequence_block(collection_name, 1)
 
     # Category operations
     @staticmethod
@@ -48,18 +101,6 @@ class InventoryService:
                 detail="Category with this name already exists"
             )
         
-        # Validate parent category if specified
-        if category_data.parent_category_id:
-            parent = await InventoryCategory.find_one(
-                InventoryCategory.category_id == category_data.parent_category_id,
-                InventoryCategory.vendor_id == vendor_id
-            )
-            if not parent:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Parent category not found"
-                )
-        
         category_id = await InventoryService.get_next_sequence("inventory_categories")
         
         category = InventoryCategory(
@@ -67,7 +108,21 @@ class InventoryService:
             vendor_id=vendor_id,
             **category_data.dict()
         )
-        await category.save()
+        if category.parent_category_id:
+            # The path is copied from the parent inside the transaction, so a
+            # concurrent move of the parent can't leave it stale
+            async def insert(session):
+                parent = await InventoryService._claim_parent(
+                    vendor_id, category.parent_category_id, category.created_at, session
+                )
+                category.ancestor_ids = parent["ancestor_ids"] + [parent["category_id"]]
+                await category.save(session=session)
+
+            await run_in_transaction(insert)
+        else:
+            await category.save()
+        category_index.upsert(category)
+        typeahead_index.upsert_category(category)
         
         return CategoryResponse(**category.dict())
 
@@ -81,6 +136,55 @@ class InventoryService:
         categories = await InventoryCategory.find(*query_conditions).sort(+InventoryCategory.sort_order).to_list()
         return [CategoryResponse(**cat.dict()) for cat in categories]
 
+    @staticmethod
+    async def get_category_tree(vendor_id: int, include_inactive: bool = False) -> List[CategoryTreeNode]:
+        """All of a vendor's categories as a tree, with direct and subtree item counts"""
+        query_conditions = [InventoryCategory.vendor_id == vendor_id]
+        if not include_inactive:
+            query_conditions.append(InventoryCategory.is_active == True)
+        categories = await InventoryCategory.find(*query_conditions).sort(+InventoryCategory.sort_order).to_list()
+
+        item_counts = {
+            group["_id"]: group["count"]
+            async for group in InventoryItem.get_motor_collection().aggregate([
+                {"$match": {"vendor_id": vendor_id, "is_active": True}},
+                {"$group": {"_id": "$category_id", "count": {"$sum": 1}}}
+            ])
+        }
+
+        nodes = {
+            category.category_id: CategoryTreeNode(
+                **category.dict(),
+                item_count=item_counts.get(category.category_id, 0)
+            )
+            for category in categories
+        }
+        roots = []
+        for category in categories:
+            node = nodes[category.category_id]
+            # The materialized path credits every ancestor without walking the tree
+            for ancestor_id in [category.category_id] + category.ancestor_ids:
+                if ancestor_id in nodes:
+                    nodes[ancestor_id].subtree_item_count += node.item_count
+            parent = nodes.get(category.parent_category_id)
+            if parent is not None:
+                parent.children.append(node)
+            else:
+                roots.append(node)
+        return roots
+
+    @staticmethod
+    async def get_subtree_category_ids(vendor_id: int, category_id: int) -> List[int]:
+        """A category and all of its descendants, from one query on the vendor_ancestors index"""
+        categories = await InventoryCategory.get_motor_collection().find(
+            {
+                "vendor_id": vendor_id,
+                "$or": [{"category_id": category_id}, {"ancestor_ids": category_id}]
+            },
+            {"_id": 0, "category_id": 1}
+        ).to_list(length=None)
+        return [category["category_id"] for category in categories]
+
     @staticmethod
     async def get_category(vendor_id: int, category_id: int) -> CategoryResponse:
         """Get a specific category"""
@@ -121,28 +225,100 @@ class InventoryService:
                     detail="Category with this name already exists"
                 )
         
-        # Validate parent category if being updated
-        if category_data.parent_category_id:
-            parent = await InventoryCategory.find_one(
-                InventoryCategory.category_id == category_data.parent_category_id,
-                InventoryCategory.vendor_id == vendor_id
-            )
-            if not parent:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Parent category not found"
-                )
-        
         # Update fields
         update_data = category_data.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(category, field, value)
         
         category.updated_at = datetime.utcnow()
-        await category.save()
+        if "parent_category_id" in update_data:
+            await InventoryService._reparent(category)
+        else:
+            await category.save()
+        category_index.upsert(category)
+        typeahead_index.upsert_category(category)
         
         return CategoryResponse(**category.dict())
 
+    @staticmethod
+    async def _claim_parent(vendor_id: int, parent_category_id: int, now: datetime, session) -> Dict[str, Any]:
+        """Read a parent category inside a transaction, writing to it as well.
+
+        Transactions only conflict on writes, so touching the parent makes
+        concurrent moves or creates around it retry instead of both
+        committing from paths that are no longer current.
+        """
+        parent = await InventoryCategory.get_motor_collection().find_one_and_update(
+            {"category_id": parent_category_id, "vendor_id": vendor_id},
+            {"$set": {"updated_at": now}},
+            projection={"_id": 0, "category_id": 1, "ancestor_ids": 1},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if parent is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Parent category not found"
+            )
+        return parent
+
+    @staticmethod
+    async def _reparent(category: InventoryCategory):
+        """Save a category under its new parent_category_id and rewrite the paths of all its descendants.
+
+        The category's current path, the new parent and the cycle check are
+        all read inside the transaction. Descendant paths start with the old
+        path plus the category itself, so one update_many swaps that prefix
+        for the new path.
+        """
+        collection = InventoryCategory.get_motor_collection()
+
+        async def move(session):
+            current = await collection.find_one(
+                {"category_id": category.category_id, "vendor_id": category.vendor_id},
+                {"_id": 0, "ancestor_ids": 1},
+                session=session
+            )
+            if current is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Category not found"
+                )
+            previous_ancestors = current.get("ancestor_ids", [])
+
+            category.ancestor_ids = []
+            if category.parent_category_id:
+                parent = await InventoryService._claim_parent(
+                    category.vendor_id, category.parent_category_id, category.updated_at, session
+                )
+                if parent["category_id"] == category.category_id or category.category_id in parent["ancestor_ids"]:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Category cannot be moved under itself or one of its subcategories"
+                    )
+                category.ancestor_ids = parent["ancestor_ids"] + [parent["category_id"]]
+
+            await category.save(session=session)
+            if category.ancestor_ids == previous_ancestors:
+                return
+            await collection.update_many(
+                {"vendor_id": category.vendor_id, "ancestor_ids": category.category_id},
+                [{
+                    "$set": {
+                        "ancestor_ids": {
+                            "$concatArrays": [
+                                {"$literal": category.ancestor_ids},
+                                {"$slice": ["$ancestor_ids", len(previous_ancestors), {"$size": "$ancestor_ids"}]}
+                            ]
+                        },
+                        "updated_at": category.updated_at
+                    }
+                }],
+                session=session
+            )
+
+        await run_in_transaction(move)
+
     @staticmethod
     async def delete_category(vendor_id: int, category_id: int) -> bool:
         """Delete a category (soft delete by setting is_active=False)"""
@@ -169,9 +345,22 @@ class InventoryService:
                 detail="Cannot delete category with active items"
             )
         
+        subcategory = await InventoryCategory.find_one(
+            InventoryCategory.vendor_id == vendor_id,
+            InventoryCategory.parent_category_id == category_id,
+            InventoryCategory.is_active == True
+        )
+        if subcategory:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot delete category with active subcategories"
+            )
+        
         category.is_active = False
         category.updated_at = datetime.utcnow()
         await category.save()
+        category_index.remove(category_id)
+        typeahead_index.remove_category(category_id)
         return True
 
     # Item operations
@@ -198,6 +387,7 @@ class InventoryService:
             **item_data.dict()
         )
         await item.save()
+        typeahead_index.upsert_item(item)
         
         return ItemResponse(**item.dict())
 
@@ -208,12 +398,16 @@ class InventoryService:
         include_inactive: bool = False,
         search: Optional[str] = None,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        include_subcategories: bool = False
     ) -> List[ItemResponse]:
         """Get items for a vendor with optional filtering"""
         query_conditions = [InventoryItem.vendor_id == vendor_id]
         
-        if category_id:
+        if category_id and include_subcategories:
+            category_ids = await InventoryService.get_subtree_category_ids(vendor_id, category_id)
+            query_conditions.append(In(InventoryItem.category_id, category_ids))
+        elif category_id:
             query_conditions.append(InventoryItem.category_id == category_id)
         
         if not include_inactive:
@@ -280,6 +474,7 @@ class InventoryService:
         
         item.updated_at = datetime.utcnow()
         await item.save()
+        typeahead_index.upsert_item(item)
         
         return ItemResponse(**item.dict())
 
@@ -312,6 +507,7 @@ class InventoryService:
         item.is_active = False
         item.updated_at = datetime.utcnow()
         await item.save()
+        typeahead_index.remove_item(item_id)
         return True
 
     # SKU operations
@@ -348,7 +544,14 @@ class InventoryService:
             available_stock=sku_data.current_stock,  # Initially all stock is available
             **sku_data.dict()
         )
-        await sku.save()
+
+        async def insert(session):
+            await sku.save(session=session)
+            if sku.current_stock:
+                await insert_movements([stock_movement(sku.dict(), "receive", quantity=sku.current_stock)], session)
+
+        await run_in_transaction(insert)
+        await PriceHistoryService.safe_record_price_change(sku)
         
         return SKUResponse(**sku.dict())
 
@@ -411,6 +614,9 @@ class InventoryService:
                     detail="SKU code already exists"
                 )
         
+        previous_price = sku.price
+        previous_stock = (sku.current_stock, sku.reserved_stock)
+        
         # Update fields
         update_data = sku_data.dict(exclude_unset=True)
         for field, value in update_data.items():
@@ -419,9 +625,23 @@ class InventoryService:
         # Recalculate available stock if current_stock or reserved_stock changed
         if 'current_stock' in update_data or 'reserved_stock' in update_data:
             sku.available_stock = sku.current_stock - sku.reserved_stock
+        sku.is_low_stock = sku.current_stock <= sku.low_stock_threshold
         
         sku.updated_at = datetime.utcnow()
-        await sku.save()
+
+        async def save(session):
+            await sku.save(session=session)
+            if (sku.current_stock, sku.reserved_stock) != previous_stock:
+                await insert_movements([stock_movement(
+                    sku.dict(), "adjustment",
+                    quantity=sku.current_stock - previous_stock[0],
+                    reserved_quantity=sku.reserved_stock - previous_stock[1]
+                )], session)
+
+        await run_in_transaction(save)
+        
+        if sku.price != previous_price:
+            await PriceHistoryService.safe_record_price_change(sku, previous_price)
         
         return SKUResponse(**sku.dict())
 
@@ -445,31 +665,231 @@ class InventoryService:
 
     @staticmethod
     async def update_stock(vendor_id: int, sku_id: int, quantity_change: int, operation: str = "set") -> SKUResponse:
-        """Update SKU stock levels"""
-        sku = await InventorySKU.find_one(
-            InventorySKU.sku_id == sku_id,
-            InventorySKU.vendor_id == vendor_id
-        )
-        if not sku:
+        """Update SKU stock levels with a single atomic write"""
+        if operation not in STOCK_OPERATIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid operation. Use 'add', 'subtract', or 'set'"
+            )
+        
+        async def apply(session):
+            document = await InventorySKU.get_motor_collection().find_one_and_update(
+                {"sku_id": sku_id, "vendor_id": vendor_id},
+                stock_update_pipeline(quantity_change, operation, datetime.utcnow()),
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            change = document.get("last_stock_change") if document else None
+            if change:
+                movement_type = "receive" if operation == "add" and change > 0 else "adjustment"
+                await insert_movements([stock_movement(document, movement_type, quantity=change)], session)
+            return document
+
+        document = await run_in_transaction(apply)
+        if not document:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="SKU not found"
             )
         
-        if operation == "add":
-            sku.current_stock += quantity_change
-        elif operation == "subtract":
-            sku.current_stock = max(0, sku.current_stock - quantity_change)
-        elif operation == "set":
-            sku.current_stock = max(0, quantity_change)
-        else:
+        return SKUResponse(**InventorySKU.parse_obj(document).dict())
+
+    @staticmethod
+    async def bulk_update_stock(vendor_id: int, data: BulkStockUpdate) -> BulkStockUpdateResponse:
+        """Apply many stock adjustments in one bulk_write.
+
+        Each SKU's lines are folded into a single update pipeline in request
+        order, so several lines for the same SKU compose like separate calls
+        to update_stock. The bulk_write, a read-back of the written SKUs and
+        their stock movements all run in one transaction, so movements use
+        last_stock_change from each SKU's own write.
+
+        A SKU whose write fails only fails its own lines: the transaction is
+        run again without it. With atomic=True nothing is written unless
+        every SKU exists, and a write error fails the whole request with 409.
+        """
+        sku_ids = [line.sku_id for line in data.adjustments if line.sku_id is not None]
+        sku_codes = [line.sku_code for line in data.adjustments if line.sku_code is not None]
+        skus = await InventorySKU.find(
+            InventorySKU.vendor_id == vendor_id,
+            Or(In(InventorySKU.sku_id, sku_ids), In(InventorySKU.sku_code, sku_codes))
+        ).to_list()
+        by_id = {sku.sku_id: sku for sku in skus}
+        by_code = {sku.sku_code: sku for sku in skus}
+
+        resolved = [
+            by_id.get(line.sku_id) if line.sku_id is not None else by_code.get(line.sku_code)
+            for line in data.adjustments
+        ]
+        missing = [index for index, sku in enumerate(resolved) if sku is None]
+        if missing and data.atomic:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid operation. Use 'add', 'subtract', or 'set'"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"message": "SKUs not found", "indexes": missing}
             )
-        
-        sku.available_stock = sku.current_stock - sku.reserved_stock
-        sku.updated_at = datetime.utcnow()
-        await sku.save()
-        
-        return SKUResponse(**sku.dict())
\ No newline at end of file
+
+        now = datetime.utcnow()
+        lines_by_sku: Dict[int, List[int]] = {}
+        for index, sku in enumerate(resolved):
+            if sku is not None:
+                lines_by_sku.setdefault(sku.sku_id, []).append(index)
+        line_indexes = [index for indexes in lines_by_sku.values() for index in indexes]
+        pipelines = {
+            sku_id: stock_operations_pipeline(
+                [(data.adjustments[index].quantity, data.adjustments[index].operation) for index in indexes],
+                now
+            )
+            for sku_id, indexes in lines_by_sku.items()
+        }
+        collection = InventorySKU.get_motor_collection()
+        errors: Dict[int, str] = {}
+        levels: Dict[int, Dict[str, Any]] = {}
+        sku_order = list(pipelines)
+
+        async def apply(session):
+            levels.clear()
+            await collection.bulk_write([
+                UpdateOne({"sku_id": sku_id, "vendor_id": vendor_id}, pipelines[sku_id])
+                for sku_id in sku_order
+            ], ordered=False, session=session)
+            # Inside the transaction nothing else can have written these SKUs since
+            async for document in collection.find(
+                {"sku_id": {"$in": sku_order}}, STOCK_LEVEL_PROJECTION, session=session
+            ):
+                levels[document["sku_id"]] = document
+
+            # One movement per SKU with the net change its write applied
+            movements = []
+            for sku_id, document in levels.items():
+                change = document.get("last_stock_change") or 0
+                if change:
+                    receiving = all(data.adjustments[index].operation == "add" for index in lines_by_sku[sku_id])
+                    movements.append(stock_movement(
+                        document, "receive" if receiving and change > 0 else "adjustment", quantity=change
+                    ))
+            await insert_movements(movements, session)
+
+        while sku_order:
+            try:
+                await run_in_transaction(apply)
+                break
+            except BulkWriteError as e:
+                failed = {
+                    sku_order[error["index"]]: error.get("errmsg", "Write failed")
+                    for error in e.details.get("writeErrors", [])
+                }
+                if data.atomic or not failed:
+                    failed_lines = {
+                        index: message
+                        for sku_id, message in failed.items()
+                        for index in lines_by_sku[sku_id]
+                    }
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail={
+                            "message": "Stock update failed, nothing was applied",
+                            "errors": [
+                                {"index": index, "error": failed_lines[index]} for index in sorted(failed_lines)
+                            ]
+                        }
+                    )
+                # The write error aborted the transaction; run it again without the failed SKUs
+                for sku_id, message in failed.items():
+                    for index in lines_by_sku[sku_id]:
+                        errors[index] = message
+                sku_order = [sku_id for sku_id in sku_order if sku_id not in failed]
+
+        results = []
+        for index, (line, sku) in enumerate(zip(data.adjustments, resolved)):
+            if sku is None or index in errors:
+                results.append(StockAdjustmentResult(
+                    index=index,
+                    sku_id=sku.sku_id if sku else line.sku_id,
+                    sku_code=sku.sku_code if sku else line.sku_code,
+                    success=False,
+                    error=errors.get(index, "SKU not found")
+                ))
+                continue
+            level = levels.get(sku.sku_id, {})
+            results.append(StockAdjustmentResult(
+                index=index,
+                sku_id=sku.sku_id,
+                sku_code=sku.sku_code,
+                success=True,
+                current_stock=level.get("current_stock"),
+                reserved_stock=level.get("reserved_stock"),
+                available_stock=level.get("available_stock")
+            ))
+
+        return BulkStockUpdateResponse(
+            updated=len(line_indexes) - len(errors),
+            failed=len(missing) + len(errors),
+            results=results
+        )
+
+    @staticmethod
+    async def get_low_stock_skus(vendor_id: int, after: Optional[int] = None, limit: int = 100) -> LowStockFeedResponse:
+        """Page through a vendor's low-stock SKUs by sku_id, served from the vendor_low_stock index"""
+        query = InventorySKU.find(
+            InventorySKU.vendor_id == vendor_id,
+            InventorySKU.is_low_stock == True,
+            InventorySKU.is_active == True
+        )
+        if after is not None:
+            query = query.find(InventorySKU.sku_id > after)
+        skus = await query.sort(+InventorySKU.sku_id).limit(limit + 1).to_list()
+
+        next_after = None
+        if len(skus) > limit:
+            skus = skus[:limit]
+            next_after = skus[-1].sku_id
+        return LowStockFeedResponse(
+            skus=[SKUResponse(**sku.dict()) for sku in skus],
+            next_after=next_after
+        )
+
+    @staticmethod
+    async def get_inventory_summary(vendor_id: int) -> Dict[str, Any]:
+        """Dashboard counts and stock value for a vendor in one aggregation.
+
+        The SKU figures come from a single $group; category and item counts
+        are appended with $unionWith so the whole summary is one round trip.
+        """
+        def count_active(collection) -> Dict[str, Any]:
+            return {
+                "$unionWith": {
+                    "coll": collection.get_motor_collection().name,
+                    "pipeline": [
+                        {"$match": {"vendor_id": vendor_id, "is_active": True}},
+                        {"$group": {"_id": collection.__name__, "count": {"$sum": 1}}}
+                    ]
+                }
+            }
+
+        pipeline = [
+            {"$match": {"vendor_id": vendor_id, "is_active": True}},
+            {
+                "$group": {
+                    "_id": InventorySKU.__name__,
+                    "count": {"$sum": 1},
+                    "low_stock": {"$sum": {"$cond": ["$is_low_stock", 1, 0]}},
+                    # Stock is valued at cost, falling back to the selling price
+                    "value": {"$sum": {"$multiply": [{"$ifNull": ["$cost_price", "$price"]}, "$current_stock"]}}
+                }
+            },
+            count_active(InventoryCategory),
+            count_active(InventoryItem)
+        ]
+        groups = {
+            group["_id"]: group
+            async for group in InventorySKU.get_motor_collection().aggregate(pipeline)
+        }
+        skus = groups.get(InventorySKU.__name__, {})
+
+        return {
+            "categories_count": groups.get(InventoryCategory.__name__, {}).get("count", 0),
+            "items_count": groups.get(InventoryItem.__name__, {}).get("count", 0),
+            "skus_count": skus.get("count", 0),
+            "low_stock_alerts": skus.get("low_stock", 0),
+            "total_inventory_value": round(skus.get("value", 0), 2)
+        }
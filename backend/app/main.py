@@ -21,11 +21,17 @@ logger.info(f"GOOGLE_CLIENT_SECRET loaded: {'Yes' if os.getenv('GOOGLE_CLIENT_SE
 
 
 # Now, import other modules
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .mongodb import connect_to_mongo, close_mongo_connection, check_database_health
 from .routers import auth, orders, profiles, marketplace, vendor_profile, inventory, storefront, storefront_orders, email, webhooks
 from . import admin_routes
+from .stock_reservations import run_reservation_sweeper
+from .order_events import USE_CHANGE_STREAM, run_change_stream_feed
+from .snapshot_propagation import snapshot_propagator
+from .stock_movements import run_stock_snapshotter
+from .typeahead import typeahead_index
 
 # Create FastAPI app
 app = FastAPI(
@@ -61,9 +67,26 @@ app.include_router(admin_routes.router, tags=["admin"])
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
+    # Releases stock held by orders left pending past their reservation deadline
+    app.state.reservation_sweeper = asyncio.create_task(run_reservation_sweeper())
+    # Lets every worker push order events written by the others
+    app.state.order_event_feed = asyncio.create_task(run_change_stream_feed()) if USE_CHANGE_STREAM else None
+    # Copies profile changes into the contact details embedded in orders
+    app.state.snapshot_propagator = asyncio.create_task(snapshot_propagator.run())
+    # Periodic stock snapshots for point-in-time stock lookups
+    app.state.stock_snapshotter = asyncio.create_task(run_stock_snapshotter())
+    # Reloads the autocomplete index while requests keep using the current one
+    app.state.typeahead_refresher = asyncio.create_task(typeahead_index.run())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for task_name in (
+        "reservation_sweeper", "order_event_feed", "snapshot_propagator",
+        "stock_snapshotter", "typeahead_refresher"
+    ):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
     await close_mongo_connection()
 
 # Root endpoint
@@ -1,11 +1,26 @@
 from beanie import Document, Indexed
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, conlist, validator
+from pymongo import IndexModel, GEOSPHERE, ASCENDING, DESCENDING
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
 import uuid
 
 
+class GeoPoint(BaseModel):
+    """GeoJSON point, coordinates are [longitude, latitude]"""
+    type: str = "Point"
+    coordinates: conlist(float, min_items=2, max_items=2)
+
+    @validator("coordinates")
+    def in_range(cls, value):
+        # The 2dsphere index rejects out-of-range points on save
+        lng, lat = value
+        if not -180 <= lng <= 180 or not -90 <= lat <= 90:
+            raise ValueError("coordinates must be within longitude -180..180 and latitude -90..90")
+        return value
+
+
 class VendorProfile(BaseModel):
     """Embedded vendor profile within User document"""
     business_type: Optional[str] = None
@@ -15,6 +30,9 @@ class VendorProfile(BaseModel):
     is_active: bool = True
     business_hours: Optional[str] = None
     delivery_areas: Optional[str] = None
+    location: Optional[GeoPoint] = None  # Where deliveries start from
+    service_area: Optional[Dict[str, Any]] = None  # GeoJSON Polygon/MultiPolygon served
+    delivery_radius_miles: Optional[float] = None  # Served radius around location
     minimum_order: float = 0.0
     payment_terms: Optional[str] = None
     certifications: List[str] = []
@@ -72,6 +90,10 @@ class User(Document):
         #     "role",
         #     "vendor_profile.categories"
         # ]
+        indexes = [
+            IndexModel([("vendor_profile.location", GEOSPHERE)], name="vendor_location_2dsphere"),
+            IndexModel([("vendor_profile.service_area", GEOSPHERE)], name="vendor_service_area_2dsphere"),
+        ]
 
 
 class RestaurantInfo(BaseModel):
@@ -90,6 +112,27 @@ class VendorInfo(BaseModel):
     email: str
 
 
+class OrderLineItem(BaseModel):
+    """Structured order line, embedded in orders"""
+    product_id: Optional[str] = None  # Storefront product id, "item" or "item-sku"
+    item_id: Optional[int] = None  # InventoryItem.item_id when known
+    sku_id: Optional[int] = None  # InventorySKU.sku_id when known
+    name: str
+    quantity: float
+    unit: Optional[str] = None  # Unit parsed from free text, e.g. "lbs"
+    unit_price: Optional[float] = None
+    extended_price: Optional[float] = None  # quantity * unit_price
+
+
+class OrderStatusChange(BaseModel):
+    """Entry in an order's status history"""
+    status: str
+    previous_status: Optional[str] = None
+    changed_by: Optional[int] = None  # user_id of the vendor who made the change
+    changed_at: datetime = Field(default_factory=datetime.utcnow)
+    transition_id: Optional[str] = None  # Shared by every order moved by one bulk request
+
+
 class Order(Document):
     """Order document with denormalized user data"""
     order_id: Indexed(int, unique=True)  # Original SQLite ID
@@ -101,15 +144,82 @@ class Order(Document):
     vendor: VendorInfo
     
     items_text: str
+    line_items: List[OrderLineItem] = []
+    total_amount: Optional[float] = None  # Sum of extended prices when every line is priced
     status: Indexed(str) = "pending"  # "pending", "confirmed", "fulfilled"
+    status_history: List[OrderStatusChange] = []
     notes: Optional[str] = None
     
+    # Stock reservation for line items with a SKU: "reserved", "committed", "released"
+    reservation_status: Optional[str] = None
+    reservation_expires_at: Optional[datetime] = None
+    
     created_at: Indexed(datetime) = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "orders"
         # Indexes are already created by migration script
+        indexes = [
+            IndexModel(
+                [("reservation_status", ASCENDING), ("reservation_expires_at", ASCENDING)],
+                name="reservation_expiry",
+                partialFilterExpression={"reservation_status": "reserved"}
+            ),
+            IndexModel([("line_items.sku_id", ASCENDING)], name="line_items_sku", sparse=True),
+            IndexModel(
+                [("vendor_id", ASCENDING), ("line_items.sku_id", ASCENDING)],
+                name="vendor_line_items_sku"
+            ),
+            # Order inbox pages, newest first, with and without a status filter
+            IndexModel(
+                [("vendor_id", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)],
+                name="vendor_created_order"
+            ),
+            IndexModel(
+                [("vendor_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)],
+                name="vendor_status_created_order"
+            ),
+            IndexModel(
+                [("restaurant_id", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)],
+                name="restaurant_created_order"
+            ),
+            IndexModel(
+                [("restaurant_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)],
+                name="restaurant_status_created_order"
+            ),
+        ]
+
+
+class ArchivedOrder(Order):
+    """Fulfilled order moved out of the hot orders collection by the archive job"""
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "orders_archive"
+
+
+class OrderRollup(Document):
+    """Order counts and revenue for one vendor or restaurant over a day or month"""
+    party_type: str  # "vendor" or "restaurant"
+    party_id: int  # user_id of the vendor or restaurant
+    period: str  # "day" or "month"
+    period_start: datetime  # Bucket of the orders' created_at
+    order_count: int = 0
+    status_counts: Dict[str, int] = {}  # Current status of the orders created in the period
+    revenue: float = 0.0  # Sum of total_amount over priced orders
+    priced_order_count: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "order_rollups"
+        indexes = [
+            IndexModel(
+                [("party_type", ASCENDING), ("party_id", ASCENDING), ("period", ASCENDING), ("period_start", ASCENDING)],
+                name="party_period_start",
+                unique=True
+            ),
+        ]
 
 
 class VendorCategory(Document):
@@ -211,17 +321,46 @@ class EmailLog(Document):
         name = "email_logs"
 
 
+class IdempotencyRecord(Document):
+    """Stored outcome of a POST request sent with an Idempotency-Key header"""
+    key: str
+    user_id: int
+    endpoint: str  # e.g. "POST /api/orders"
+    fingerprint: str  # Hash of the request body
+    status: str = "in_progress"  # "in_progress", "completed"
+    response_body: Optional[Dict[str, Any]] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+    
+    class Settings:
+        name = "idempotency_keys"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("endpoint", ASCENDING), ("key", ASCENDING)],
+                name="user_endpoint_key",
+                unique=True
+            ),
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        ]
+
+
 # Export all models for easy import
 __all__ = [
     "User",
     "Order",
+    "ArchivedOrder",
+    "OrderRollup",
     "VendorCategory",
     "AdminAuditLog",
     "UserEventLog",
     "ImpersonationSession",
     "VendorProfile",
+    "GeoPoint",
     "RestaurantInfo",
     "VendorInfo",
+    "OrderLineItem",
+    "OrderStatusChange",
     "EmailTemplate",
-    "EmailLog"
+    "EmailLog",
+    "IdempotencyRecord"
 ]
\ No newline at end of file
@@ -2,11 +2,13 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 import os
 from .mongo_models import (
-    User, Order, VendorCategory, AdminAuditLog,
-    UserEventLog, ImpersonationSession, EmailTemplate, EmailLog
+    User, Order, ArchivedOrder, OrderRollup, VendorCategory, AdminAuditLog,
+    UserEventLog, ImpersonationSession, EmailTemplate, EmailLog, IdempotencyRecord
 )
 from .inventory_models import (
-    InventoryCategory, InventoryItem, InventorySKU, InventoryCounter
+    InventoryCategory, InventoryItem, InventorySKU, InventoryCounter,
+    SKUPriceChange, PriceHistoryBucket, InventoryImportJob,
+    StockMovement, StockSnapshot
 )
 from .storefront_models import (
     VendorStorefront,
@@ -47,10 +49,12 @@ async def connect_to_mongo():
         await init_beanie(
             database=db.database,
             document_models=[
-                User, Order, VendorCategory,
+                User, Order, ArchivedOrder, OrderRollup, VendorCategory,
                 AdminAuditLog, UserEventLog, ImpersonationSession,
-                EmailTemplate, EmailLog,
+                EmailTemplate, EmailLog, IdempotencyRecord,
                 InventoryCategory, InventoryItem, InventorySKU, InventoryCounter,
+                SKUPriceChange, PriceHistoryBucket, InventoryImportJob,
+                StockMovement, StockSnapshot,
                 VendorStorefront,
                 ProductCategory,
                 VendorProduct,
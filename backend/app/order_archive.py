@@ -0,0 +1,76 @@
+"""
+Moves old fulfilled orders from the orders collection to orders_archive.
+
+Keeping years of fulfilled orders out of the hot collection keeps its indexes
+small. Each batch is copied with one bulk_write of upserting replaces and then
+removed from orders with one bulk_write of deletes, so a run that is
+interrupted part way can simply be started again.
+"""
+import logging
+import os
+from typing import Optional
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne, DeleteOne
+from .mongo_models import Order, ArchivedOrder
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = 500
+
+
+async def archive_fulfilled_orders(
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE
+) -> int:
+    """Archive orders fulfilled (last updated) more than ``older_than_days`` ago"""
+    orders = Order.get_motor_collection()
+    archive = ArchivedOrder.get_motor_collection()
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    query = {"status": "fulfilled", "updated_at": {"$lt": cutoff}}
+
+    archived = 0
+    last_id = None
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        batch = await orders.find(batch_query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        archived_at = datetime.utcnow()
+        await archive.bulk_write(
+            [ReplaceOne({"_id": order["_id"]}, {**order, "archived_at": archived_at}, upsert=True) for order in batch],
+            ordered=False
+        )
+        # An order edited since it was read stays in the hot collection until the next run
+        result = await orders.bulk_write(
+            [DeleteOne({"_id": order["_id"], "updated_at": order["updated_at"]}) for order in batch],
+            ordered=False
+        )
+
+        archived += result.deleted_count
+        last_id = batch[-1]["_id"]
+        logger.info(f"Archived {archived} orders so far")
+
+    return archived
+
+
+async def find_order(order_id: int) -> Optional[Order]:
+    """Look an order up in the hot collection, then in the archive"""
+    order = await Order.find_one(Order.order_id == order_id)
+    if order is None:
+        order = await ArchivedOrder.find_one(ArchivedOrder.order_id == order_id)
+    return order
+
+
+async def next_order_id() -> int:
+    """Next order_id, taking archived orders into account"""
+    last_order = await Order.find().sort(-Order.order_id).limit(1).first_or_none()
+    # The newest orders may all be archived if nothing was ordered for a while
+    last_archived = await ArchivedOrder.find().sort(-ArchivedOrder.order_id).limit(1).first_or_none()
+    return max(
+        last_order.order_id if last_order else 0,
+        last_archived.order_id if last_archived else 0
+    ) + 1
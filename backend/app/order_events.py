@@ -0,0 +1,136 @@
+"""
+Order change notifications for the vendor and restaurant dashboards.
+
+Routers publish an event whenever an order is created or its status or notes
+change. The hub fans events out to the SSE streams of the order's restaurant
+and vendor that are connected to this process.
+
+With ORDER_EVENTS_CHANGE_STREAM=true the events are taken from a MongoDB
+change stream on the orders collection instead (this needs a replica set), so
+every worker sees orders written by any other worker.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set
+from datetime import datetime
+from .mongo_models import Order
+
+logger = logging.getLogger(__name__)
+
+USE_CHANGE_STREAM = os.getenv("ORDER_EVENTS_CHANGE_STREAM", "false").lower() == "true"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def order_event(event_type: str, order: Order) -> Dict[str, Any]:
+    """Build the event payload sent to clients for an order"""
+    return {
+        "type": event_type,
+        "order_id": order.order_id,
+        "restaurant_id": order.restaurant_id,
+        "vendor_id": order.vendor_id,
+        "status": order.status,
+        "notes": order.notes,
+        "updated_at": order.updated_at.isoformat()
+    }
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode an event as a server-sent events message"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+class OrderEventHub:
+    """In-process pub/sub of order events keyed by user_id"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def deliver(self, event: Dict[str, Any]):
+        """Hand an event to every local stream of the order's restaurant and vendor"""
+        for user_id in {event["restaurant_id"], event["vendor_id"]}:
+            for queue in self._subscribers.get(user_id, ()):
+                if queue.full():
+                    # A stalled client loses its oldest event rather than blocking publishers
+                    queue.get_nowait()
+                queue.put_nowait(event)
+
+    def publish(self, event: Dict[str, Any]):
+        """Publish an event written by this process.
+
+        When the change stream feed is running it delivers the event to every
+        worker, including this one, so it is not delivered here as well.
+        """
+        if not USE_CHANGE_STREAM:
+            self.deliver(event)
+
+    def publish_many(self, events: List[Dict[str, Any]]):
+        """Publish a batch of events, e.g. from a bulk status change"""
+        for event in events:
+            self.publish(event)
+
+
+order_events = OrderEventHub()
+
+
+def _change_to_event(change: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    document = change.get("fullDocument")
+    if not document:
+        return None
+
+    if change["operationType"] == "insert":
+        event_type = "order.created"
+    else:
+        updated = change.get("updateDescription", {}).get("updatedFields", {})
+        if change["operationType"] == "update" and "status" not in updated and "notes" not in updated:
+            return None
+        if change["operationType"] == "replace":
+            # Whole-document saves don't say which fields changed
+            event_type = "order.updated"
+        else:
+            event_type = "order.status" if "status" in updated else "order.notes"
+
+    updated_at = document.get("updated_at")
+    return {
+        "type": event_type,
+        "order_id": document["order_id"],
+        "restaurant_id": document["restaurant_id"],
+        "vendor_id": document["vendor_id"],
+        "status": document.get("status"),
+        "notes": document.get("notes"),
+        "updated_at": updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at
+    }
+
+
+async def run_change_stream_feed():
+    """Feed order changes from every worker into the local hub until cancelled"""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    resume_token = None
+    while True:
+        try:
+            async with Order.get_motor_collection().watch(
+                pipeline, full_document="updateLookup", resume_after=resume_token
+            ) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    event = _change_to_event(change)
+                    if event is not None:
+                        order_events.deliver(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Order change stream failed, reconnecting: {e}")
+            await asyncio.sleep(5)
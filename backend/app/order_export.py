@@ -0,0 +1,166 @@
+"""
+Order history export for accounting, as CSV or XLSX.
+
+Rows are read from a Motor cursor in batches and written out as they arrive,
+one row per line item (or one row per order when it has no structured line
+items). CSV is streamed to the client as it is produced. XLSX has to be
+finished before it can be sent, so it is written in xlsxwriter's
+constant_memory mode to a temporary file and streamed from there. Rows are
+handed to xlsxwriter in batches on the threadpool, since each write may hit
+the disk.
+"""
+import csv
+import io
+import os
+import tempfile
+from typing import Any, AsyncIterator, Dict, List, Optional
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from .mongo_models import Order, ArchivedOrder
+
+EXPORT_COLUMNS = [
+    "order_id", "created_at", "status", "restaurant", "vendor",
+    "item", "quantity", "unit", "unit_price", "line_total",
+    "order_total", "notes"
+]
+CURSOR_BATCH_SIZE = 500
+CSV_FLUSH_ROWS = 200
+XLSX_WRITE_ROWS = 500
+FILE_CHUNK_SIZE = 64 * 1024
+
+EXPORT_PROJECTION = {
+    "order_id": 1, "created_at": 1, "status": 1, "restaurant.name": 1, "vendor.name": 1,
+    "items_text": 1, "line_items": 1, "total_amount": 1, "notes": 1
+}
+
+
+def export_filter(
+    party_field: str,
+    user_id: int,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Mongo filter for one party's orders in a date range"""
+    match: Dict[str, Any] = {party_field: user_id}
+    if status:
+        match["status"] = status
+    if created_from or created_to:
+        match["created_at"] = {}
+        if created_from:
+            match["created_at"]["$gte"] = created_from
+        if created_to:
+            match["created_at"]["$lt"] = created_to
+    return match
+
+
+def order_rows(order: Dict[str, Any]) -> List[List[Any]]:
+    """Export rows for one raw order document"""
+    common = [
+        order["order_id"],
+        order["created_at"].isoformat() if order.get("created_at") else "",
+        order.get("status", ""),
+        order.get("restaurant", {}).get("name", ""),
+        order.get("vendor", {}).get("name", ""),
+    ]
+    total = order.get("total_amount")
+    notes = order.get("notes") or ""
+
+    line_items = order.get("line_items") or []
+    if not line_items:
+        return [common + [order.get("items_text", ""), "", "", "", "", total, notes]]
+    return [
+        common + [
+            line.get("name", ""),
+            line.get("quantity"),
+            line.get("unit") or "",
+            line.get("unit_price"),
+            line.get("extended_price"),
+            total,
+            notes
+        ]
+        for line in line_items
+    ]
+
+
+async def iter_export_rows(match: Dict[str, Any], include_archived: bool = True) -> AsyncIterator[List[Any]]:
+    """Yield export rows, oldest orders first, archived orders before current ones"""
+    collections = [Order.get_motor_collection()]
+    if include_archived:
+        collections.insert(0, ArchivedOrder.get_motor_collection())
+
+    for collection in collections:
+        cursor = collection.find(match, EXPORT_PROJECTION).sort("created_at", 1).batch_size(CURSOR_BATCH_SIZE)
+        async for order in cursor:
+            for row in order_rows(order):
+                yield row
+
+
+async def stream_csv(rows: AsyncIterator[List[Any]]) -> AsyncIterator[str]:
+    """Encode rows as CSV, yielding a chunk every CSV_FLUSH_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 1
+    async for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+        pending += 1
+        if pending >= CSV_FLUSH_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _write_xlsx_rows(worksheet, first_row: int, rows: List[List[Any]]):
+    for offset, row in enumerate(rows):
+        worksheet.write_row(first_row + offset, 0, ["" if value is None else value for value in row])
+
+
+def _discard_xlsx(workbook, path: str):
+    workbook.close()
+    os.remove(path)
+
+
+async def write_xlsx(rows: AsyncIterator[List[Any]]) -> str:
+    """Write rows to a temporary XLSX file and return its path"""
+    import xlsxwriter
+
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    # constant_memory flushes each row to disk once the next one is started
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "in_memory": False})
+    try:
+        worksheet = workbook.add_worksheet("Orders")
+        worksheet.write_row(0, 0, EXPORT_COLUMNS, workbook.add_format({"bold": True}))
+        row_number = 1
+        batch: List[List[Any]] = []
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= XLSX_WRITE_ROWS:
+                await run_in_threadpool(_write_xlsx_rows, worksheet, row_number, batch)
+                row_number += len(batch)
+                batch = []
+        if batch:
+            await run_in_threadpool(_write_xlsx_rows, worksheet, row_number, batch)
+    except BaseException:
+        await run_in_threadpool(_discard_xlsx, workbook, path)
+        raise
+    # Assembling the zip container is the slow part; keep it off the event loop
+    await run_in_threadpool(workbook.close)
+    return path
+
+
+async def stream_file(path: str) -> AsyncIterator[bytes]:
+    """Stream a temporary file and delete it afterwards"""
+    try:
+        with open(path, "rb") as export_file:
+            while True:
+                chunk = await run_in_threadpool(export_file.read, FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
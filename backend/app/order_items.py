@@ -0,0 +1,112 @@
+"""
+Conversion between structured order line items and the free-text items_text field.
+
+Storefront orders are written as "name: qty x $price" lines. Orders placed
+through POST /api/orders carry whatever the restaurant typed, which is usually
+one product per line such as "10 lbs tomatoes" or "Eggs x 12".
+"""
+import re
+from typing import List, Optional, Tuple
+from .mongo_models import OrderLineItem
+
+NUMBER = r"\d+(?:\.\d+)?"
+
+UNITS = {
+    "lb", "lbs", "pound", "pounds", "kg", "kgs", "g", "oz",
+    "case", "cases", "cs", "box", "boxes", "bag", "bags", "pack", "packs",
+    "crate", "crates", "bunch", "bunches", "dozen", "doz", "each", "ea",
+    "pc", "pcs", "piece", "pieces", "ct", "count", "gal", "gallon", "gallons",
+    "l", "liter", "liters", "litre", "litres", "qt", "quart", "quarts",
+    "bottle", "bottles", "can", "cans", "jar", "jars", "tray", "trays", "unit", "units"
+}
+
+# "Roma Tomatoes: 3 x $2.50", the format written by format_items_text
+STOREFRONT_LINE = re.compile(rf"^(?P<name>.+?):\s*(?P<qty>{NUMBER})\s*x\s*\$(?P<price>{NUMBER})$", re.IGNORECASE)
+# "10 lbs tomatoes", "2 x eggs", "3 cases: lettuce"
+LEADING_QUANTITY = re.compile(rf"^(?P<qty>{NUMBER})\s*(?:x\s+)?(?P<rest>[a-z].*)$", re.IGNORECASE)
+# "tomatoes x 10", "tomatoes - 10 lbs", "tomatoes: 10"
+TRAILING_QUANTITY = re.compile(rf"^(?P<name>.+?)\s*(?:x|-|:|,)\s*(?P<qty>{NUMBER})\s*(?P<unit>[a-z]+)?\.?$", re.IGNORECASE)
+BULLET = re.compile(r"^(?:[-*•]|\d+[.)])\s+")
+
+
+def parse_product_id(product_id: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Split a storefront product id ("item" or "item-sku") into item and SKU ids"""
+    if not product_id:
+        return None, None
+    parts = str(product_id).split("-")
+    try:
+        item_id = int(parts[0])
+        sku_id = int(parts[1]) if len(parts) > 1 else None
+    except ValueError:
+        return None, None
+    return item_id, sku_id
+
+
+def _split_unit(text: str) -> Tuple[Optional[str], str]:
+    words = text.split(None, 1)
+    if len(words) == 2 and words[0].lower().rstrip(".:") in UNITS:
+        return words[0].lower().rstrip(".:"), words[1].lstrip(":- ").strip()
+    return None, text.strip()
+
+
+def parse_items_line(line: str) -> Optional[OrderLineItem]:
+    """Parse a single items_text line, returning None for blank lines"""
+    line = BULLET.sub("", line.strip()).strip()
+    if not line:
+        return None
+
+    match = STOREFRONT_LINE.match(line)
+    if match:
+        quantity = float(match.group("qty"))
+        unit_price = float(match.group("price"))
+        return OrderLineItem(
+            name=match.group("name").strip(),
+            quantity=quantity,
+            unit_price=unit_price,
+            extended_price=round(quantity * unit_price, 2)
+        )
+
+    match = LEADING_QUANTITY.match(line)
+    if match:
+        unit, name = _split_unit(match.group("rest"))
+        if name:
+            return OrderLineItem(name=name, quantity=float(match.group("qty")), unit=unit)
+
+    match = TRAILING_QUANTITY.match(line)
+    if match:
+        unit = match.group("unit")
+        if unit is None or unit.lower() in UNITS:
+            return OrderLineItem(
+                name=match.group("name").strip(),
+                quantity=float(match.group("qty")),
+                unit=unit.lower() if unit else None
+            )
+
+    # No recognizable quantity, keep the text as a single unit line
+    return OrderLineItem(name=line, quantity=1)
+
+
+def parse_items_text(items_text: str) -> List[OrderLineItem]:
+    """Parse free-text order items into structured line items"""
+    line_items = []
+    for line in (items_text or "").splitlines():
+        line_item = parse_items_line(line)
+        if line_item is not None:
+            line_items.append(line_item)
+    return line_items
+
+
+def format_items_text(line_items: List[OrderLineItem]) -> str:
+    """Render structured line items in the storefront items_text format"""
+    return "\n".join(
+        f"{line.name}: {line.quantity:g} x ${line.unit_price:.2f}" if line.unit_price is not None
+        else f"{line.name}: {line.quantity:g}"
+        for line in line_items
+    )
+
+
+def order_total(line_items: List[OrderLineItem]) -> Optional[float]:
+    """Sum of extended prices, or None when any line has no price"""
+    if not line_items or any(line.extended_price is None for line in line_items):
+        return None
+    return round(sum(line.extended_price for line in line_items), 2)
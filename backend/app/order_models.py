@@ -1,12 +1,12 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 class OrderItemCreate(BaseModel):
     """Pydantic model for individual order items in storefront orders"""
     product_id: str
     name: str  # Product name for display
-    quantity: int
+    quantity: int = Field(..., ge=1)
     price: float
 
 
@@ -14,6 +14,15 @@ class OrderCreate(BaseModel):
     """Pydantic model for creating orders from vendor storefront"""
     vendor_id: int
     items: List[OrderItemCreate]
+    accept_price_changes: bool = False  # Place the order at current prices instead of rejecting stale ones
+
+
+class PriceChange(BaseModel):
+    """A line whose submitted price no longer matches the catalog"""
+    product_id: str
+    name: str
+    submitted_price: float
+    current_price: float
 
 
 class OrderResponse(BaseModel):
@@ -23,4 +32,6 @@ class OrderResponse(BaseModel):
     vendor_id: int
     restaurant_id: int
     total_items: int
-    status: str
\ No newline at end of file
+    status: str
+    total_amount: Optional[float] = None  # Computed from catalog prices
+    price_changes: List[PriceChange] = []  # Lines repriced because the submitted price was stale
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Authoritative pricing of storefront order lines.
+
+Client-supplied names and prices are only used to detect stale carts. Every
+line is resolved against the catalog with one $in query on InventoryItem and
+one on InventorySKU, however many lines the cart has.
+"""
+import asyncio
+from typing import Dict, List, Tuple
+from beanie.operators import In, Or
+from .inventory_models import InventoryItem, InventorySKU
+from .mongo_models import OrderLineItem
+from .order_models import OrderItemCreate, PriceChange
+from .order_items import parse_product_id
+
+# Differences below half a cent are rounding, not price changes
+PRICE_TOLERANCE = 0.005
+
+
+def sku_unit_price(sku: InventorySKU) -> float:
+    """Price a restaurant pays for one unit of a SKU.
+
+    Storefront listings quote this same value, so a cart built from a listing
+    always passes the stale-price check.
+    """
+    return sku.price
+
+
+async def price_order_items(
+    vendor_id: int,
+    items: List[OrderItemCreate]
+) -> Tuple[List[OrderLineItem], List[PriceChange], List[str]]:
+    """Build line items from catalog data.
+
+    Returns the line items, the lines whose submitted price differs from the
+    catalog, and the product IDs that don't resolve to an active product of
+    the vendor. Lines that name only an item are priced like the storefront
+    lists them: from its default SKU, any active SKU when it has no default,
+    or the item's base price when it has no SKUs.
+    """
+    parsed = [(item, *parse_product_id(item.product_id)) for item in items]
+    item_ids = list({item_id for _, item_id, _ in parsed if item_id is not None})
+    sku_ids = list({sku_id for _, _, sku_id in parsed if sku_id is not None})
+    default_item_ids = list({item_id for _, item_id, sku_id in parsed if item_id is not None and sku_id is None})
+
+    catalog_items, skus = await asyncio.gather(
+        InventoryItem.find(
+            In(InventoryItem.item_id, item_ids),
+            InventoryItem.vendor_id == vendor_id,
+            InventoryItem.is_active == True
+        ).to_list(),
+        InventorySKU.find(
+            Or(In(InventorySKU.sku_id, sku_ids), In(InventorySKU.item_id, default_item_ids)),
+            InventorySKU.vendor_id == vendor_id,
+            InventorySKU.is_active == True
+        ).to_list()
+    )
+    items_by_id = {item.item_id: item for item in catalog_items}
+    skus_by_id = {sku.sku_id: sku for sku in skus}
+    default_skus: Dict[int, InventorySKU] = {}
+    for sku in skus:
+        if sku.is_default or sku.item_id not in default_skus:
+            default_skus[sku.item_id] = sku
+
+    line_items: List[OrderLineItem] = []
+    price_changes: List[PriceChange] = []
+    unknown: List[str] = []
+    for item, item_id, sku_id in parsed:
+        catalog_item = items_by_id.get(item_id)
+        sku = skus_by_id.get(sku_id) if sku_id is not None else default_skus.get(item_id)
+        if catalog_item is None or (sku_id is not None and (sku is None or sku.item_id != item_id)):
+            unknown.append(item.product_id)
+            continue
+
+        unit_price = sku_unit_price(sku) if sku else catalog_item.base_price
+        name = f"{catalog_item.name} - {sku.variant_name}" if sku and sku.variant_name else catalog_item.name
+        if abs(unit_price - item.price) > PRICE_TOLERANCE:
+            price_changes.append(PriceChange(
+                product_id=item.product_id,
+                name=name,
+                submitted_price=item.price,
+                current_price=unit_price
+            ))
+
+        line_items.append(OrderLineItem(
+            product_id=item.product_id,
+            item_id=item_id,
+            sku_id=sku.sku_id if sku else None,
+            name=name,
+            quantity=item.quantity,
+            unit=catalog_item.unit_of_measure,
+            unit_price=unit_price,
+            extended_price=round(item.quantity * unit_price, 2)
+        ))
+
+    return line_items, price_changes, unknown
@@ -0,0 +1,149 @@
+"""
+Per-vendor and per-restaurant order rollups by day and by month.
+
+Each order counts towards the day and month buckets of its created_at, for
+both its vendor and its restaurant. Buckets are kept current with $inc
+upserts when orders are created or change status, so dashboards read a few
+small documents instead of aggregating the orders collection.
+"""
+import logging
+from typing import Dict, Iterable, List, Tuple
+from datetime import datetime
+from pymongo import UpdateOne
+from .mongo_models import Order, ArchivedOrder, OrderRollup
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PERIODS = ("day", "month")
+PARTY_FIELDS = {"vendor": "vendor_id", "restaurant": "restaurant_id"}
+REBUILD_BATCH_SIZE = 1000
+
+RollupKey = Tuple[str, int, str, datetime]
+
+
+def period_start(timestamp: datetime, period: str) -> datetime:
+    """Start of the UTC day or month containing timestamp"""
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _rollup_keys(order: Order) -> Iterable[RollupKey]:
+    for party_type, field in PARTY_FIELDS.items():
+        for period in ROLLUP_PERIODS:
+            yield party_type, getattr(order, field), period, period_start(order.created_at, period)
+
+
+def _rollup_filter(key: RollupKey) -> dict:
+    party_type, party_id, period, start = key
+    return {"party_type": party_type, "party_id": party_id, "period": period, "period_start": start}
+
+
+class OrderRollupService:
+    """Maintains and reads OrderRollup documents"""
+
+    @staticmethod
+    async def _apply(increments: Dict[RollupKey, Dict[str, float]]):
+        """$inc every touched bucket in one bulk_write, never failing the caller"""
+        if not increments:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(_rollup_filter(key), {"$inc": changes, "$set": {"updated_at": now}}, upsert=True)
+            for key, changes in increments.items()
+        ]
+        try:
+            await OrderRollup.get_motor_collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            # The backfill command can repair rollups that missed an update
+            logger.error(f"Failed to update order rollups: {str(e)}")
+
+    @staticmethod
+    async def record_order_created(order: Order):
+        """Count a new order in its vendor's and restaurant's buckets"""
+        changes = {"order_count": 1, f"status_counts.{order.status}": 1}
+        if order.total_amount is not None:
+            changes["revenue"] = order.total_amount
+            changes["priced_order_count"] = 1
+        await OrderRollupService._apply({key: changes for key in _rollup_keys(order)})
+
+    @staticmethod
+    async def record_status_changes(orders: List[Order], previous_status: str, new_status: str):
+        """Move orders from one status count to another in their buckets"""
+        increments: Dict[RollupKey, Dict[str, float]] = {}
+        for order in orders:
+            for key in _rollup_keys(order):
+                changes = increments.setdefault(key, {
+                    f"status_counts.{previous_status}": 0,
+                    f"status_counts.{new_status}": 0
+                })
+                changes[f"status_counts.{previous_status}"] -= 1
+                changes[f"status_counts.{new_status}"] += 1
+        await OrderRollupService._apply(increments)
+
+    @staticmethod
+    async def get_rollups(
+        party_type: str,
+        party_id: int,
+        period: str,
+        start: datetime,
+        end: datetime
+    ) -> List[OrderRollup]:
+        """Buckets of one vendor or restaurant starting in [start, end), oldest first"""
+        return await OrderRollup.find(
+            OrderRollup.party_type == party_type,
+            OrderRollup.party_id == party_id,
+            OrderRollup.period == period,
+            OrderRollup.period_start >= period_start(start, period),
+            OrderRollup.period_start < end
+        ).sort(+OrderRollup.period_start).to_list()
+
+    @staticmethod
+    async def rebuild() -> int:
+        """Recompute every rollup from the orders and orders_archive collections.
+
+        Buckets are overwritten with $set, so run it while orders are quiet or
+        the counts of orders written during the run may be off until the next
+        rebuild.
+        """
+        collection = OrderRollup.get_motor_collection()
+        written = 0
+        for party_type, field in PARTY_FIELDS.items():
+            for period in ROLLUP_PERIODS:
+                pipeline = [
+                    {"$unionWith": {"coll": ArchivedOrder.get_motor_collection().name}},
+                    {
+                        "$group": {
+                            "_id": {
+                                "party_id": f"${field}",
+                                "period_start": {"$dateTrunc": {"date": "$created_at", "unit": period}},
+                                "status": "$status"
+                            },
+                            "count": {"$sum": 1},
+                            "revenue": {"$sum": {"$ifNull": ["$total_amount", 0]}},
+                            "priced": {"$sum": {"$cond": [{"$eq": [{"$type": "$total_amount"}, "double"]}, 1, 0]}}
+                        }
+                    }
+                ]
+                buckets: Dict[RollupKey, dict] = {}
+                async for group in Order.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+                    key = (party_type, group["_id"]["party_id"], period, group["_id"]["period_start"])
+                    bucket = buckets.setdefault(key, {
+                        "order_count": 0, "status_counts": {}, "revenue": 0.0, "priced_order_count": 0
+                    })
+                    bucket["order_count"] += group["count"]
+                    bucket["status_counts"][group["_id"]["status"]] = group["count"]
+                    bucket["revenue"] += group["revenue"]
+                    bucket["priced_order_count"] += group["priced"]
+
+                now = datetime.utcnow()
+                operations = [
+                    UpdateOne(_rollup_filter(key), {"$set": {**bucket, "updated_at": now}}, upsert=True)
+                    for key, bucket in buckets.items()
+                ]
+                for i in range(0, len(operations), REBUILD_BATCH_SIZE):
+                    await collection.bulk_write(operations[i:i + REBUILD_BATCH_SIZE], ordered=False)
+                written += len(operations)
+                logger.info(f"Rebuilt {len(operations)} {party_type} {period} rollups")
+        return written
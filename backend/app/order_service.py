@@ -0,0 +1,249 @@
+import logging
+import uuid
+from typing import Dict, List, Optional
+from datetime import datetime
+from pydantic import BaseModel
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from beanie.operators import In
+from .mongo_models import Order, OrderStatusChange, User
+from .stock_reservations import StockReservationService, InsufficientStockError
+from .order_events import order_events, order_event
+from .order_rollups import OrderRollupService
+
+logger = logging.getLogger(__name__)
+
+ORDER_STATUSES = ["pending", "confirmed", "fulfilled"]
+
+# Legal transitions: target status -> status the order must currently have
+PREVIOUS_STATUS = {
+    "confirmed": "pending",
+    "fulfilled": "confirmed",
+}
+
+# Status history can grow long and isn't part of the API response
+ORDER_PROJECTION = {"status_history": 0}
+
+
+def _status_change_update(
+    new_status: str,
+    changed_by: int,
+    changed_at: datetime,
+    transition_id: Optional[str] = None
+) -> dict:
+    """$set the new status and $push the transition onto the history in the same write"""
+    return {
+        "$set": {"status": new_status, "updated_at": changed_at},
+        "$push": {"status_history": OrderStatusChange(
+            status=new_status,
+            previous_status=PREVIOUS_STATUS[new_status],
+            changed_by=changed_by,
+            changed_at=changed_at,
+            transition_id=transition_id
+        ).dict()}
+    }
+
+
+class OrderStatusResult(BaseModel):
+    """Outcome of a status change for one order in a bulk request"""
+    order_id: int
+    success: bool
+    status: Optional[str] = None  # Status after the request, None if the order wasn't found
+    error: Optional[str] = None
+
+
+class OrderStateView(BaseModel):
+    """Projection used to read back the result of a conditional update"""
+    order_id: int
+    restaurant_id: int
+    vendor_id: int
+    status: str
+    updated_at: datetime
+    moved: bool  # Whether this request's transition is in the status history
+
+
+class OrderService:
+    """Order state changes as single conditional writes.
+
+    Every change is a find_one_and_update (or update_many) whose filter
+    includes the expected current status, so concurrent requests can't
+    overwrite each other or skip a step of pending → confirmed → fulfilled.
+    """
+
+    @staticmethod
+    async def update_status(vendor_id: int, order_id: int, new_status: str) -> Order:
+        """Move one of a vendor's orders to ``new_status``.
+
+        Raises 404 when the vendor has no such order and 409 when the order's
+        current status doesn't allow the transition.
+        """
+        required_status = PREVIOUS_STATUS[new_status]
+        collection = Order.get_motor_collection()
+        match = {"order_id": order_id, "vendor_id": vendor_id, "status": required_status}
+
+        # Orders holding a stock reservation take the slow path below
+        document = await collection.find_one_and_update(
+            {**match, "reservation_status": {"$nin": ["reserved", "released"]}},
+            _status_change_update(new_status, vendor_id, datetime.utcnow()),
+            projection=ORDER_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+
+        if document is None:
+            order = await Order.find_one(Order.order_id == order_id, Order.vendor_id == vendor_id)
+            if order is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Order not found"
+                )
+            if order.status != required_status:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Cannot change status from {order.status} to {new_status}"
+                )
+
+            # Confirming or fulfilling takes the reserved stock out of inventory
+            try:
+                await StockReservationService.commit(order)
+            except InsufficientStockError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Insufficient stock for SKU {e.sku_id}"
+                )
+
+            document = await collection.find_one_and_update(
+                match,
+                _status_change_update(new_status, vendor_id, datetime.utcnow()),
+                projection=ORDER_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+            if document is None:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Order status was changed by another request"
+                )
+
+        order = Order.parse_obj(document)
+        order_events.publish(order_event("order.status", order))
+        await OrderRollupService.record_status_changes([order], required_status, new_status)
+        return order
+
+    @staticmethod
+    async def update_notes(user: User, order_id: int, notes: str) -> Order:
+        """Set an order's notes if the user is its restaurant or vendor"""
+        match = {"order_id": order_id}
+        if user.role == "restaurant":
+            match["restaurant_id"] = user.user_id
+        elif user.role == "vendor":
+            match["vendor_id"] = user.user_id
+
+        document = await Order.get_motor_collection().find_one_and_update(
+            match,
+            {"$set": {"notes": notes, "updated_at": datetime.utcnow()}},
+            projection=ORDER_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if document is None:
+            if await Order.find(Order.order_id == order_id).count():
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Order not found"
+            )
+
+        order = Order.parse_obj(document)
+        order_events.publish(order_event("order.notes", order))
+        return order
+
+    @staticmethod
+    async def bulk_update_status(vendor_id: int, order_ids: List[int], new_status: str) -> List[OrderStatusResult]:
+        """Move a vendor's orders to ``new_status``, reporting the outcome per order.
+
+        Reservations are committed in one transaction, and the status write is
+        a single update_many guarded on the previous status. An order changed
+        concurrently by another request is left alone and reported as failed.
+        """
+        required_status = PREVIOUS_STATUS[new_status]
+        order_ids = list(dict.fromkeys(order_ids))
+
+        orders = await Order.find(
+            In(Order.order_id, order_ids),
+            Order.vendor_id == vendor_id
+        ).to_list()
+        orders_by_id = {order.order_id: order for order in orders}
+
+        errors: Dict[int, str] = {}
+        eligible: List[int] = []
+        for order_id in order_ids:
+            order = orders_by_id.get(order_id)
+            if order is None:
+                errors[order_id] = "Order not found"
+            elif order.status == new_status:
+                errors[order_id] = f"Order is already {new_status}"
+            elif order.status != required_status:
+                errors[order_id] = f"Cannot change status from {order.status} to {new_status}"
+            else:
+                eligible.append(order_id)
+
+        # Reserved stock is taken out of inventory before the status moves on
+        holding = [
+            orders_by_id[order_id] for order_id in eligible
+            if orders_by_id[order_id].reservation_status in ("reserved", "released")
+        ]
+        if holding:
+            stock_errors = await StockReservationService.commit_many(holding)
+            for order_id, error in stock_errors.items():
+                errors[order_id] = f"Insufficient stock for SKU {error.sku_id}"
+                eligible.remove(order_id)
+
+        if eligible:
+            transition_id = uuid.uuid4().hex
+            await Order.find(
+                In(Order.order_id, eligible),
+                Order.vendor_id == vendor_id,
+                Order.status == required_status
+            ).update(_status_change_update(new_status, vendor_id, datetime.utcnow(), transition_id))
+
+            # Read back which orders this request actually moved
+            written = await Order.aggregate([
+                {"$match": {"order_id": {"$in": eligible}}},
+                {"$project": {
+                    "_id": 0,
+                    "order_id": 1,
+                    "restaurant_id": 1,
+                    "vendor_id": 1,
+                    "status": 1,
+                    "updated_at": 1,
+                    "moved": {"$in": [transition_id, {"$ifNull": ["$status_history.transition_id", []]}]}
+                }}
+            ], projection_model=OrderStateView).to_list()
+            for state in written:
+                order = orders_by_id[state.order_id]
+                order.status = state.status
+                order.updated_at = state.updated_at
+                if not state.moved:
+                    errors[state.order_id] = f"Order status was changed to {state.status} by another request"
+
+        results = []
+        events = []
+        updated_orders = []
+        for order_id in order_ids:
+            order = orders_by_id.get(order_id)
+            error = errors.get(order_id)
+            results.append(OrderStatusResult(
+                order_id=order_id,
+                success=error is None,
+                status=order.status if order else None,
+                error=error
+            ))
+            if error is None:
+                events.append(order_event("order.status", order))
+                updated_orders.append(order)
+
+        order_events.publish_many(events)
+        await OrderRollupService.record_status_changes(updated_orders, required_status, new_status)
+        logger.info(f"Bulk status update to {new_status} for vendor {vendor_id}: {len(events)}/{len(order_ids)} orders")
+        return results
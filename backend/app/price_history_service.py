@@ -0,0 +1,159 @@
+import logging
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from beanie.operators import In
+from .inventory_models import (
+    InventoryItem, InventorySKU, SKUPriceChange, PriceChangeMeta, PriceHistoryBucket
+)
+from .comparison_models import PriceTrendPoint, VendorPriceTrend, PriceTrendResponse
+
+logger = logging.getLogger(__name__)
+
+BUCKET_GRANULARITIES = ("day", "week")
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the UTC day, or of the Monday-based week, containing timestamp"""
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+class PriceHistoryService:
+    """Records SKU price changes and serves price trends from pre-aggregated buckets"""
+
+    @staticmethod
+    def _bucket_updates(sku: InventorySKU, previous_price: Optional[float], changed_at: datetime) -> List[UpdateOne]:
+        """Upserts folding one price change into the SKU's daily and weekly buckets"""
+        # The previous price was in effect at the start of the bucket, so it
+        # counts towards the bucket's range as well
+        low = min(sku.price, previous_price) if previous_price is not None else sku.price
+        high = max(sku.price, previous_price) if previous_price is not None else sku.price
+        return [
+            UpdateOne(
+                {"sku_id": sku.sku_id, "granularity": granularity, "bucket_start": bucket_start(changed_at, granularity)},
+                {
+                    "$setOnInsert": {
+                        "item_id": sku.item_id,
+                        "vendor_id": sku.vendor_id,
+                        "open_price": previous_price if previous_price is not None else sku.price
+                    },
+                    "$min": {"min_price": low},
+                    "$max": {"max_price": high},
+                    "$inc": {"price_sum": sku.price, "sample_count": 1},
+                    "$set": {"close_price": sku.price, "updated_at": changed_at}
+                },
+                upsert=True
+            )
+            for granularity in BUCKET_GRANULARITIES
+        ]
+
+    @staticmethod
+    async def record_price_change(sku: InventorySKU, previous_price: Optional[float] = None):
+        """Store a price change event and fold it into its daily and weekly buckets"""
+        changed_at = datetime.utcnow()
+        await SKUPriceChange(
+            changed_at=changed_at,
+            meta=PriceChangeMeta(vendor_id=sku.vendor_id, item_id=sku.item_id, sku_id=sku.sku_id),
+            price=sku.price,
+            previous_price=previous_price
+        ).insert()
+        await PriceHistoryBucket.get_motor_collection().bulk_write(
+            PriceHistoryService._bucket_updates(sku, previous_price, changed_at), ordered=False
+        )
+
+    @staticmethod
+    async def record_initial_prices(skus: List[InventorySKU]):
+        """Record the starting price of many new SKUs with one insert and one bulk write"""
+        if not skus:
+            return
+        changed_at = datetime.utcnow()
+        await SKUPriceChange.insert_many([
+            SKUPriceChange(
+                changed_at=changed_at,
+                meta=PriceChangeMeta(vendor_id=sku.vendor_id, item_id=sku.item_id, sku_id=sku.sku_id),
+                price=sku.price
+            )
+            for sku in skus
+        ])
+        await PriceHistoryBucket.get_motor_collection().bulk_write(
+            [update for sku in skus for update in PriceHistoryService._bucket_updates(sku, None, changed_at)],
+            ordered=False
+        )
+
+    @staticmethod
+    async def safe_record_price_change(sku: InventorySKU, previous_price: Optional[float] = None):
+        """Record a price change without failing the SKU write that triggered it"""
+        try:
+            await PriceHistoryService.record_price_change(sku, previous_price)
+        except Exception as e:
+            logger.error(f"Failed to record price change for SKU {sku.sku_id}: {str(e)}")
+
+    @staticmethod
+    async def get_price_trends(
+        product: str,
+        items: List[InventoryItem],
+        vendor_names: Dict[int, str],
+        granularity: str = "day",
+        days: int = 90
+    ) -> PriceTrendResponse:
+        """Build price trends for the given items from bucket documents only"""
+        since = bucket_start(datetime.utcnow() - timedelta(days=days), granularity)
+        items_by_id = {item.item_id: item for item in items}
+
+        buckets = await PriceHistoryBucket.find(
+            In(PriceHistoryBucket.item_id, list(items_by_id)),
+            PriceHistoryBucket.granularity == granularity,
+            PriceHistoryBucket.bucket_start >= since
+        ).sort(+PriceHistoryBucket.sku_id, +PriceHistoryBucket.bucket_start).to_list()
+
+        trends: Dict[int, VendorPriceTrend] = {}
+        opens: Dict[int, float] = {}
+        overall: Dict[datetime, Dict[str, float]] = {}
+        for bucket in buckets:
+            point = PriceTrendPoint(
+                bucket_start=bucket.bucket_start,
+                min_price=bucket.min_price,
+                avg_price=round(bucket.price_sum / bucket.sample_count, 2) if bucket.sample_count else bucket.close_price,
+                max_price=bucket.max_price,
+                close_price=bucket.close_price
+            )
+            trend = trends.get(bucket.sku_id)
+            if trend is None:
+                item = items_by_id[bucket.item_id]
+                trend = trends[bucket.sku_id] = VendorPriceTrend(
+                    vendor_id=str(bucket.vendor_id),
+                    vendor_name=vendor_names.get(bucket.vendor_id),
+                    product_id=str(bucket.item_id),
+                    product_name=item.name,
+                    sku_id=bucket.sku_id,
+                    points=[]
+                )
+                opens[bucket.sku_id] = bucket.open_price
+            trend.points.append(point)
+            trend.price_change = round(bucket.close_price - opens[bucket.sku_id], 2)
+
+            totals = overall.setdefault(bucket.bucket_start, {
+                "min": bucket.min_price, "max": bucket.max_price, "sum": 0.0, "count": 0
+            })
+            totals["min"] = min(totals["min"], bucket.min_price)
+            totals["max"] = max(totals["max"], bucket.max_price)
+            totals["sum"] += bucket.price_sum
+            totals["count"] += bucket.sample_count
+
+        return PriceTrendResponse(
+            product=product,
+            granularity=granularity,
+            since=since,
+            vendors=list(trends.values()),
+            overall=[
+                PriceTrendPoint(
+                    bucket_start=start,
+                    min_price=totals["min"],
+                    avg_price=round(totals["sum"] / totals["count"], 2) if totals["count"] else totals["min"],
+                    max_price=totals["max"]
+                ) for start, totals in sorted(overall.items())
+            ]
+        )
@@ -1,13 +1,18 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, UploadFile, File, BackgroundTasks
 from ..mongo_models import User
 from ..auth_simple import verify_token
 from ..inventory_service import InventoryService
 from ..inventory_models import (
-    CategoryCreate, CategoryUpdate, CategoryResponse,
+    CategoryCreate, CategoryUpdate, CategoryResponse, CategoryTreeNode,
     ItemCreate, ItemUpdate, ItemResponse,
-    SKUCreate, SKUUpdate, SKUResponse
+    SKUCreate, SKUUpdate, SKUResponse,
+    InventoryImportJobResponse, BulkStockUpdate, BulkStockUpdateResponse,
+    LowStockFeedResponse, StockMovementResponse, StockLevelResponse
 )
+from ..stock_movements import StockLedgerService
+from ..inventory_import import InventoryImportService, detect_import_format
 
 router = APIRouter()
 
@@ -55,6 +60,14 @@ async def get_categories(
     """Get all categories for the current vendor"""
     return await InventoryService.get_categories(current_user.user_id, include_inactive)
 
+@router.get("/categories/tree", response_model=List[CategoryTreeNode])
+async def get_category_tree(
+    include_inactive: bool = Query(False, description="Include inactive categories"),
+    current_user: User = Depends(get_current_vendor)
+):
+    """Get all categories as a tree, with item counts per category and per subtree"""
+    return await InventoryService.get_category_tree(current_user.user_id, include_inactive)
+
 @router.get("/categories/{category_id}", response_model=CategoryResponse)
 async def get_category(
     category_id: int,
@@ -94,13 +107,14 @@ async def get_items(
     category_id: Optional[int] = Query(None, description="Filter by category ID"),
     include_inactive: bool = Query(False, description="Include inactive items"),
     search: Optional[str] = Query(None, description="Search items by name, description, brand, or tags"),
+    include_subcategories: bool = Query(False, description="With category_id, also include items of its subcategories"),
     skip: int = Query(0, ge=0, description="Number of items to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of items to return"),
     current_user: User = Depends(get_current_vendor)
 ):
     """Get items for the current vendor with optional filtering"""
     return await InventoryService.get_items(
-        current_user.user_id, category_id, include_inactive, search, skip, limit
+        current_user.user_id, category_id, include_inactive, search, skip, limit, include_subcategories
     )
 
 @router.get("/items/{item_id}", response_model=ItemResponse)
@@ -150,6 +164,15 @@ async def get_skus(
         current_user.user_id, item_id, include_inactive, skip, limit
     )
 
+@router.get("/skus/low-stock", response_model=LowStockFeedResponse)
+async def get_low_stock_skus(
+    after: Optional[int] = Query(None, description="Return SKUs with sku_id greater than this (next_after of the previous page)"),
+    limit: int = Query(100, ge=1, le=500, description="Maximum number of SKUs to return"),
+    current_user: User = Depends(get_current_vendor)
+):
+    """Get active SKUs at or below their low-stock threshold, for reorder lists"""
+    return await InventoryService.get_low_stock_skus(current_user.user_id, after, limit)
+
 @router.get("/skus/{sku_id}", response_model=SKUResponse)
 async def get_sku(
     sku_id: int,
@@ -186,7 +209,66 @@ async def update_stock(
     """Update SKU stock levels"""
     return await InventoryService.update_stock(current_user.user_id, sku_id, quantity_change, operation)
 
+@router.get("/skus/{sku_id}/movements", response_model=List[StockMovementResponse])
+async def get_stock_movements(
+    sku_id: int,
+    before: Optional[datetime] = Query(None, description="Only movements before this time (created_at of the last one seen)"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of movements to return"),
+    current_user: User = Depends(get_current_vendor)
+):
+    """Get the stock movement ledger of a SKU, newest first"""
+    return await StockLedgerService.get_movements(current_user.user_id, sku_id, before, limit)
+
+@router.get("/skus/{sku_id}/stock-at", response_model=StockLevelResponse)
+async def get_stock_at(
+    sku_id: int,
+    at: datetime = Query(..., description="Point in time (UTC)"),
+    current_user: User = Depends(get_current_vendor)
+):
+    """Get a SKU's stock levels as they were at a point in time"""
+    return await StockLedgerService.stock_at(current_user.user_id, sku_id, at)
+
 # Bulk operations
+@router.post("/stock/bulk", response_model=BulkStockUpdateResponse)
+async def bulk_update_stock(
+    update_data: BulkStockUpdate,
+    current_user: User = Depends(get_current_vendor)
+):
+    """Adjust stock for many SKUs at once, e.g. when receiving a delivery or after a cycle count"""
+    return await InventoryService.bulk_update_stock(current_user.user_id, update_data)
+
+@router.post("/import", response_model=InventoryImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_catalog(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(..., description="CSV with a header row, or JSON lines (one object per line)"),
+    current_user: User = Depends(get_current_vendor)
+):
+    """Start a bulk import of categories, items and SKUs; poll the returned job for progress"""
+    file_format = detect_import_format(file.filename, file.content_type)
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file type: upload a .csv or .ndjson/.jsonl file"
+        )
+
+    job = await InventoryImportService.create_job(current_user.user_id, file.filename, file_format)
+    background_tasks.add_task(InventoryImportService(job).run, file.file)
+    return InventoryImportJobResponse(**job.dict())
+
+@router.get("/import/{job_id}", response_model=InventoryImportJobResponse)
+async def get_import_job(
+    job_id: str,
+    current_user: User = Depends(get_current_vendor)
+):
+    """Get the progress and row errors of a catalog import"""
+    job = await InventoryImportService.get_job(current_user.user_id, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found"
+        )
+    return InventoryImportJobResponse(**job.dict())
+
 @router.get("/items/{item_id}/skus", response_model=List[SKUResponse])
 async def get_item_skus(
     item_id: int,
@@ -202,13 +284,14 @@ async def get_item_skus(
 async def get_category_items(
     category_id: int,
     include_inactive: bool = Query(False, description="Include inactive items"),
+    include_subcategories: bool = Query(False, description="Include items of all subcategories"),
     skip: int = Query(0, ge=0, description="Number of items to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of items to return"),
     current_user: User = Depends(get_current_vendor)
 ):
     """Get all items for a specific category"""
     return await InventoryService.get_items(
-        current_user.user_id, category_id, include_inactive, None, skip, limit
+        current_user.user_id, category_id, include_inactive, None, skip, limit, include_subcategories
     )
 
 # Dashboard/summary endpoints
@@ -217,46 +300,4 @@ async def get_inventory_summary(
     current_user: User = Depends(get_current_vendor)
 ):
     """Get inventory summary statistics"""
-    from ..inventory_models import InventoryCategory, InventoryItem, InventorySKU
-    
-    # Get counts
-    categories_count = await InventoryCategory.find(
-        InventoryCategory.vendor_id == current_user.user_id,
-        InventoryCategory.is_active == True
-    ).count()
-    
-    items_count = await InventoryItem.find(
-        InventoryItem.vendor_id == current_user.user_id,
-        InventoryItem.is_active == True
-    ).count()
-    
-    skus_count = await InventorySKU.find(
-        InventorySKU.vendor_id == current_user.user_id,
-        InventorySKU.is_active == True
-    ).count()
-    
-    # Get low stock SKUs
-    low_stock_skus = await InventorySKU.find(
-        InventorySKU.vendor_id == current_user.user_id,
-        InventorySKU.is_active == True,
-        InventorySKU.current_stock <= InventorySKU.low_stock_threshold
-    ).count()
-    
-    # Get total inventory value (based on cost price)
-    skus = await InventorySKU.find(
-        InventorySKU.vendor_id == current_user.user_id,
-        InventorySKU.is_active == True
-    ).to_list()
-    
-    total_inventory_value = sum(
-        (sku.cost_price or sku.price) * sku.current_stock 
-        for sku in skus
-    )
-    
-    return {
-        "categories_count": categories_count,
-        "items_count": items_count,
-        "skus_count": skus_count,
-        "low_stock_alerts": low_stock_skus,
-        "total_inventory_value": round(total_inventory_value, 2)
-    }
\ No newline at end of file
+    return await InventoryService.get_inventory_summary(current_user.user_id)
@@ -1,8 +1,9 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from ..mongo_models import User, VendorCategory
+from ..mongo_models import User, VendorCategory, GeoPoint
 from ..inventory_models import InventoryItem, InventorySKU, InventoryCategory
 from ..comparison_models import (
     ComparisonRequest,
@@ -14,9 +15,17 @@ from ..comparison_models import (
     PerformanceMetrics,
     Recommendation,
     ComparisonSummary,
-    SmartSuggestion
+    SmartSuggestion,
+    BasketPlan,
+    PriceTrendResponse
 )
+from ..basket_optimizer import optimize_basket
+from ..category_index import category_index
+from ..typeahead import typeahead_index, TypeaheadSuggestion
+from ..price_history_service import PriceHistoryService
+from ..delivery_area import restaurant_point, find_vendors_delivering_to
 from beanie import PydanticObjectId
+from beanie.operators import In, RegEx
 from bson import ObjectId
 from ..auth_simple import verify_token, TokenData
 from datetime import datetime
@@ -53,6 +62,8 @@ class VendorListingResponse(BaseModel):
     is_active: bool = True
     business_hours: Optional[str] = None
     delivery_areas: Optional[str] = None
+    location: Optional[GeoPoint] = None
+    delivery_radius_miles: Optional[float] = None
     minimum_order: float = 0.0
     payment_terms: Optional[str] = None
     certifications: List[str] = []
@@ -80,6 +91,23 @@ class VendorSearchResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    total_count_is_approximate: bool = False
+
+class AutocompleteResponse(BaseModel):
+    query: str
+    suggestions: List[TypeaheadSuggestion]
+
+# Cached count of all active vendors, used by unfiltered listings in approximate mode
+VENDOR_COUNT_TTL_SECONDS = 300
+_active_vendor_count = {"value": None, "expires_at": 0.0}
+
+async def get_cached_active_vendor_count(query_conditions) -> int:
+    """Return the number of active vendors, recounting at most every VENDOR_COUNT_TTL_SECONDS"""
+    now = time.monotonic()
+    if _active_vendor_count["value"] is None or now >= _active_vendor_count["expires_at"]:
+        _active_vendor_count["value"] = await User.find(*query_conditions).count()
+        _active_vendor_count["expires_at"] = now + VENDOR_COUNT_TTL_SECONDS
+    return _active_vendor_count["value"]
 
 # Dependency to get current user from Clerk JWT token
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -126,7 +154,11 @@ async def get_marketplace_vendors(
     search: Optional[str] = Query(None, description="Search vendor names and descriptions"),
     rating_min: Optional[float] = Query(None, description="Minimum rating filter"),
     page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(12, ge=1, le=100, description="Items per page")
+    page_size: int = Query(12, ge=1, le=100, description="Items per page"),
+    count_mode: str = Query("exact", regex="^(exact|approximate)$", description="Use a cached total count for unfiltered listings"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Restaurant latitude, only vendors delivering there are listed"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Restaurant longitude"),
+    delivery_radius: Optional[float] = Query(None, gt=0, description="Maximum vendor distance in miles")
 ):
     """Get paginated list of vendors with filtering and search"""
 
@@ -155,12 +187,32 @@ async def get_marketplace_vendors(
             }
         )
 
-    # Get total count before pagination
-    total_count = await User.find(*query_conditions).count()
+    point = restaurant_point({"lat": lat, "lng": lng}) if lat is not None and lng is not None else None
+    if point:
+        vendor_ids = await find_vendors_delivering_to(point, delivery_radius)
+        query_conditions.append(In(User.user_id, list(vendor_ids)))
 
-    # Apply pagination
     skip = (page - 1) * page_size
-    vendors = await User.find(*query_conditions).skip(skip).limit(page_size).to_list()
+    is_filtered = bool(category or search or rating_min is not None or point)
+    total_count_is_approximate = count_mode == "approximate" and not is_filtered
+
+    if total_count_is_approximate:
+        # Unfiltered listing: the page query is cheap, so only the count is cached
+        total_count = await get_cached_active_vendor_count(query_conditions)
+        vendors = await User.find(*query_conditions).skip(skip).limit(page_size).to_list()
+    else:
+        # Page and total in one round trip, evaluating the filter once
+        facet_results = await User.find(*query_conditions).aggregate([
+            {
+                "$facet": {
+                    "vendors": [{"$skip": skip}, {"$limit": page_size}],
+                    "total": [{"$count": "count"}]
+                }
+            }
+        ]).to_list()
+        facet = facet_results[0] if facet_results else {"vendors": [], "total": []}
+        total_count = facet["total"][0]["count"] if facet["total"] else 0
+        vendors = [User.parse_obj(doc) for doc in facet["vendors"]]
 
     # Format response
     vendor_listings = [
@@ -183,7 +235,8 @@ async def get_marketplace_vendors(
         total_count=total_count,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        total_count_is_approximate=total_count_is_approximate
     )
 
 @router.get("/vendors/{user_id}", response_model=VendorDetailResponse)
@@ -214,11 +267,53 @@ async def get_vendor_detail(
         **vendor.vendor_profile.dict()
     )
 
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100, description="Prefix typed so far"),
+    types: Optional[str] = Query(
+        None,
+        regex="^(product|brand|category|vendor)(,(product|brand|category|vendor))*$",
+        description="Comma-separated suggestion kinds, default all"
+    ),
+    limit: int = Query(10, ge=1, le=25, description="Maximum number of suggestions"),
+    current_user: User = Depends(get_current_user)
+):
+    """Suggest product, brand, category and vendor names starting with the typed prefix, most popular first"""
+    kinds = types.split(",") if types else None
+    return AutocompleteResponse(query=q, suggestions=await typeahead_index.suggest(q, kinds, limit))
+
+@router.get("/price-trends", response_model=PriceTrendResponse)
+async def get_price_trends(
+    product: str = Query(..., min_length=1, description="Product name to report price trends for"),
+    category: Optional[str] = Query(None, description="Product category filter"),
+    brand: Optional[str] = Query(None, description="Brand filter"),
+    granularity: str = Query("day", regex="^(day|week)$", description="Bucket size: day or week"),
+    days: int = Query(90, ge=1, le=730, description="Number of days of history"),
+    current_user: User = Depends(get_current_user)
+):
+    """Get price trends for a product across vendors from pre-aggregated price buckets"""
+    items = await search_products_by_query(product, category, brand)
+    
+    vendor_ids = list({item.vendor_id for item in items})
+    vendors = await User.find(In(User.user_id, vendor_ids)).to_list() if vendor_ids else []
+    vendor_names = {vendor.user_id: vendor.name for vendor in vendors}
+    
+    return await PriceHistoryService.get_price_trends(product, items, vendor_names, granularity, days)
+
 # Helper functions for price comparison
-async def search_products_by_query(query: str, category: str = None, brand: str = None) -> List[InventoryItem]:
+async def search_products_by_query(
+    query: str,
+    category: str = None,
+    brand: str = None,
+    vendor_ids: Optional[List[int]] = None
+) -> List[InventoryItem]:
     """Search for products matching the query parameters"""
     query_conditions = [InventoryItem.is_active == True]
     
+    # Restrict to candidate vendors, e.g. those delivering to the restaurant
+    if vendor_ids is not None:
+        query_conditions.append(In(InventoryItem.vendor_id, vendor_ids))
+    
     # Filter by name (case-insensitive partial match)
     if query:
         search_regex = {"$regex": query, "$options": "i"}
@@ -234,19 +329,15 @@ async def search_products_by_query(query: str, category: str = None, brand: str
     
     # Filter by category if provided
     if category:
-        # First find matching categories
-        categories = await InventoryCategory.find(
-            InventoryCategory.name.regex(category, "i"),
-            InventoryCategory.is_active == True
-        ).to_list()
+        # Resolve matching categories from the in-memory name index
+        category_ids = await category_index.resolve(category)
         
-        if categories:
-            category_ids = [cat.category_id for cat in categories]
-            query_conditions.append(InventoryItem.category_id.in_(category_ids))
+        if category_ids:
+            query_conditions.append(In(InventoryItem.category_id, category_ids))
     
     # Filter by brand if provided
     if brand:
-        query_conditions.append(InventoryItem.brand.regex(brand, "i"))
+        query_conditions.append(RegEx(InventoryItem.brand, brand, "i"))
     
     return await InventoryItem.find(*query_conditions).to_list()
 
@@ -323,18 +414,28 @@ def generate_mock_recommendations(vendors: List[VendorResult]) -> List[Recommend
     
     return recommendations
 
-def generate_smart_suggestions(results: List[ProductComparisonResult]) -> List[SmartSuggestion]:
+def generate_smart_suggestions(
+    results: List[ProductComparisonResult],
+    basket_plan: Optional[BasketPlan] = None
+) -> List[SmartSuggestion]:
     """Generate smart suggestions based on comparison results"""
     suggestions = []
     
-    # Bundle suggestion
-    if len(results) > 1:
+    # Basket suggestion from the optimizer
+    if basket_plan and basket_plan.lines and len(results) > 1:
+        vendor_count = len(basket_plan.vendors)
+        if vendor_count == 1:
+            title = "Order Everything From One Vendor"
+            description = f"Ordering the whole basket from {basket_plan.vendors[0].vendor_name} is cheapest once delivery fees are included"
+        else:
+            title = "Optimized Multi-Vendor Basket"
+            description = f"Splitting the basket across {vendor_count} vendors is cheapest once delivery fees and minimum orders are included"
         suggestions.append(SmartSuggestion(
             type="bundle",
-            title="Bundle Discount Available",
-            description="Order all items from the same vendor to save on delivery fees",
-            potential_savings=15.99,
-            confidence_score=0.72
+            title=title,
+            description=f"{description} (total ${basket_plan.total_cost:.2f})",
+            potential_savings=basket_plan.potential_savings,
+            confidence_score=1.0 if basket_plan.optimal else 0.9
         ))
     
     # Alternative product suggestion
@@ -361,13 +462,26 @@ async def compare_prices(request: ComparisonRequest, current_user: User = Depend
         all_vendors = set()
         total_products_found = 0
         
+        # Pre-filter to vendors that deliver to the restaurant before any pricing work
+        candidate_vendor_ids = None
+        point = restaurant_point(request.restaurant_location)
+        if point:
+            max_distance = request.filters.delivery_radius if request.filters else None
+            candidate_vendor_ids = await find_vendors_delivering_to(point, max_distance)
+        if request.filters and request.filters.vendors:
+            requested_ids = {int(v) for v in request.filters.vendors if v.isdigit()}
+            candidate_vendor_ids = requested_ids if candidate_vendor_ids is None else candidate_vendor_ids & requested_ids
+        if candidate_vendor_ids is not None:
+            candidate_vendor_ids = sorted(candidate_vendor_ids)
+        
         # Process each product query
         for product_query in request.products:
             # Search for matching products
             products = await search_products_by_query(
                 product_query.name,
                 product_query.category,
-                product_query.brand
+                product_query.brand,
+                candidate_vendor_ids
             )
             
             vendor_results = []
@@ -460,8 +574,15 @@ async def compare_prices(request: ComparisonRequest, current_user: User = Depend
             best_overall_vendor=recommendations[0].vendor_id if recommendations else None
         )
         
+        # Find the cheapest assignment of the whole basket to vendors
+        optimized_basket = None
+        if request.optimize_basket and total_products_found:
+            optimized_basket = await run_in_threadpool(
+                optimize_basket, results, request.optimization_budget_ms
+            )
+        
         # Generate smart suggestions
-        smart_suggestions = generate_smart_suggestions(results) if request.include_recommendations else []
+        smart_suggestions = generate_smart_suggestions(results, optimized_basket) if request.include_recommendations else []
         
         # Create response
         response = ComparisonResponse(
@@ -471,7 +592,8 @@ async def compare_prices(request: ComparisonRequest, current_user: User = Depend
             performance_metrics=performance_metrics,
             recommendations=recommendations,
             summary=summary,
-            smart_suggestions=smart_suggestions
+            smart_suggestions=smart_suggestions,
+            optimized_basket=optimized_basket
         )
         
         return response
@@ -1,15 +1,29 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Header, BackgroundTasks
+from typing import List, Optional, Dict
+from fastapi import APIRouter, Depends, HTTPException, status, Header, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel
-from ..mongo_models import User, Order, RestaurantInfo, VendorInfo
+from pydantic import BaseModel, conlist
+from ..mongo_models import User, Order, RestaurantInfo, VendorInfo, OrderLineItem
+from ..order_items import parse_items_text, order_total
+from ..idempotency import run_idempotent
+from ..order_events import order_events, order_event, format_sse
+from ..order_archive import next_order_id, find_order
+from ..order_rollups import OrderRollupService
+from ..typeahead import typeahead_index
+from ..order_export import export_filter, iter_export_rows, stream_csv, write_xlsx, stream_file
+from ..order_service import OrderService, OrderStatusResult, ORDER_STATUSES, PREVIOUS_STATUS
 from ..auth_simple import verify_token
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
+import base64
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
 
 # Pydantic models for orders
 class OrderCreate(BaseModel):
@@ -22,17 +36,47 @@ class OrderResponse(BaseModel):
     restaurant: RestaurantInfo
     vendor: VendorInfo
     items_text: str
+    line_items: List[OrderLineItem] = []
+    total_amount: Optional[float] = None
     status: str
     notes: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
+class OrderInboxResponse(BaseModel):
+    orders: List[OrderResponse]
+    status_counts: Dict[str, int]
+    total_count: int
+    next_cursor: Optional[str] = None
+
+class OrderRollupPoint(BaseModel):
+    period_start: datetime
+    order_count: int
+    status_counts: Dict[str, int]
+    revenue: float
+    priced_order_count: int
+
+class OrderRollupResponse(BaseModel):
+    period: str
+    start: datetime
+    end: datetime
+    points: List[OrderRollupPoint]
+
 class OrderStatusUpdate(BaseModel):
     status: str
 
 class OrderNotesUpdate(BaseModel):
     notes: str
 
+class BulkOrderStatusUpdate(BaseModel):
+    order_ids: conlist(int, min_items=1, max_items=500)
+    status: str
+
+class BulkOrderStatusResponse(BaseModel):
+    results: List[OrderStatusResult]
+    updated_count: int
+    failed_count: int
+
 # Dependency to get current user from Clerk JWT token
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     token_data = verify_token(token)
@@ -45,12 +89,37 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         )
     return user
 
+# EventSource can't set headers, so the event stream also accepts ?token=
+async def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    query_token: Optional[str] = Query(None, alias="token")
+):
+    token = token or query_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_user(token)
+
 @router.post("/orders", response_model=OrderResponse)
 async def create_order(
     order_data: OrderCreate,
     background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     current_user: User = Depends(get_current_user)
 ):
+    # Retries with the same Idempotency-Key return the first response
+    return await run_idempotent(
+        idempotency_key,
+        current_user.user_id,
+        "POST /api/orders",
+        order_data,
+        lambda: place_order(order_data, background_tasks, current_user)
+    )
+
+async def place_order(order_data: OrderCreate, background_tasks: BackgroundTasks, current_user: User) -> OrderResponse:
     if current_user.role != "restaurant":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -64,21 +133,27 @@ async def create_order(
             detail="Vendor not found"
         )
     
-    last_order = await Order.find().sort(-Order.order_id).limit(1).first_or_none()
-    next_order_id = (last_order.order_id + 1) if last_order else 1
+    order_id = await next_order_id()
+
+    line_items = parse_items_text(order_data.items_text)
 
     new_order = Order(
-        order_id=next_order_id,
+        order_id=order_id,
         restaurant_id=current_user.user_id,
         vendor_id=order_data.vendor_id,
         restaurant=RestaurantInfo(**current_user.dict()),
         vendor=VendorInfo(**vendor.dict()),
         items_text=order_data.items_text,
+        line_items=line_items,
+        total_amount=order_total(line_items),
         notes=order_data.notes,
         status="pending"
     )
     
     await new_order.insert()
+    order_events.publish(order_event("order.created", new_order))
+    await OrderRollupService.record_order_created(new_order)
+    typeahead_index.record_order(new_order)
     
     # Send email notifications in background
     try:
@@ -120,12 +195,10 @@ async def get_orders(current_user: User = Depends(get_current_user)):
     print(f"🔍 Orders API - User: {current_user.name} (ID: {current_user.user_id}, Role: {current_user.role})")
     
     if current_user.role == "restaurant":
-        print(f"🔍 Searching for orders with restaurant_id: {current_user.user_id}")
-        orders = await Order.find(Order.restaurant_id == current_user.user_id).to_list()
+        orders = await Order.find(Order.restaurant_id == current_user.user_id).sort(-Order.created_at).to_list()
         print(f"🔍 Found {len(orders)} orders for restaurant")
     elif current_user.role == "vendor":
-        print(f"🔍 Searching for orders with vendor_id: {current_user.user_id}")
-        orders = await Order.find(Order.vendor_id == current_user.user_id).to_list()
+        orders = await Order.find(Order.vendor_id == current_user.user_id).sort(-Order.created_at).to_list()
         print(f"🔍 Found {len(orders)} orders for vendor")
     else:
         raise HTTPException(
@@ -133,15 +206,217 @@ async def get_orders(current_user: User = Depends(get_current_user)):
             detail="Invalid user role"
         )
     
-    # Debug: Show order details
-    for order in orders:
-        print(f"🔍 Order {order.order_id}: restaurant_id={order.restaurant_id}, vendor_id={order.vendor_id}, status={order.status}")
-    
     return [OrderResponse(**order.dict()) for order in orders]
 
+@router.get("/orders/events")
+async def stream_order_events(request: Request, current_user: User = Depends(get_stream_user)):
+    """Server-sent events for orders the current user is a party to.
+
+    Events: order.created, order.status, order.notes (and order.updated when
+    the change stream feed sees a whole-document save).
+    """
+    queue = order_events.subscribe(current_user.user_id)
+    
+    async def event_stream():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            order_events.unsubscribe(current_user.user_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/orders/export")
+async def export_orders(
+    format: str = Query("csv", regex="^(csv|xlsx)$", description="csv or xlsx"),
+    status_filter: Optional[str] = Query(None, alias="status", regex="^(pending|confirmed|fulfilled)$"),
+    created_from: Optional[datetime] = Query(None, description="Only orders created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only orders created before this time"),
+    include_archived: bool = Query(True, description="Include archived orders"),
+    current_user: User = Depends(get_current_user)
+):
+    """Download order history with one row per line item"""
+    if current_user.role == "restaurant":
+        party_field = "restaurant_id"
+    elif current_user.role == "vendor":
+        party_field = "vendor_id"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid user role"
+        )
+    
+    match = export_filter(party_field, current_user.user_id, status_filter, created_from, created_to)
+    rows = iter_export_rows(match, include_archived)
+    filename = f"orders-{datetime.utcnow():%Y%m%d}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    
+    if format == "xlsx":
+        path = await write_xlsx(rows)
+        return StreamingResponse(
+            stream_file(path),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers=headers
+        )
+    
+    return StreamingResponse(stream_csv(rows), media_type="text/csv", headers=headers)
+
+@router.get("/orders/rollups", response_model=OrderRollupResponse)
+async def get_order_rollups(
+    period: str = Query("day", regex="^(day|month)$", description="Bucket size"),
+    start: Optional[datetime] = Query(None, description="Defaults to 30 days (day) or 12 months (month) ago"),
+    end: Optional[datetime] = Query(None, description="Defaults to now"),
+    current_user: User = Depends(get_current_user)
+):
+    """Order counts and revenue per day or month for the current vendor or restaurant"""
+    if current_user.role not in ("vendor", "restaurant"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid user role"
+        )
+    
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30 if period == "day" else 365)
+    rollups = await OrderRollupService.get_rollups(current_user.role, current_user.user_id, period, start, end)
+    
+    return OrderRollupResponse(
+        period=period,
+        start=start,
+        end=end,
+        points=[OrderRollupPoint(**rollup.dict()) for rollup in rollups]
+    )
+
+def encode_inbox_cursor(created_at: datetime, order_id: int) -> str:
+    """Encode the sort key of the last order on a page"""
+    raw = f"{created_at.isoformat()}|{order_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_inbox_cursor(cursor: str):
+    """Decode a cursor produced by encode_inbox_cursor"""
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+@router.get("/orders/inbox", response_model=OrderInboxResponse)
+async def get_order_inbox(
+    status_filter: Optional[str] = Query(None, alias="status", regex="^(pending|confirmed|fulfilled)$", description="Only orders in this status"),
+    created_from: Optional[datetime] = Query(None, description="Only orders created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only orders created before this time"),
+    counterparty_id: Optional[int] = Query(None, description="Vendor ID for restaurants, restaurant ID for vendors"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(25, ge=1, le=100, description="Orders per page"),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a page of orders, newest first, with per-status counts"""
+    if current_user.role == "restaurant":
+        match = {"restaurant_id": current_user.user_id}
+        counterparty_field = "vendor_id"
+    elif current_user.role == "vendor":
+        match = {"vendor_id": current_user.user_id}
+        counterparty_field = "restaurant_id"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid user role"
+        )
+    
+    if counterparty_id is not None:
+        match[counterparty_field] = counterparty_id
+    if created_from or created_to:
+        match["created_at"] = {}
+        if created_from:
+            match["created_at"]["$gte"] = created_from
+        if created_to:
+            match["created_at"]["$lt"] = created_to
+    
+    # Status and cursor only narrow the page, counts cover every status
+    page_match = {}
+    if status_filter:
+        page_match["status"] = status_filter
+    if cursor:
+        cursor_created_at, cursor_order_id = decode_inbox_cursor(cursor)
+        page_match["$or"] = [
+            {"created_at": {"$lt": cursor_created_at}},
+            {"created_at": cursor_created_at, "order_id": {"$lt": cursor_order_id}}
+        ]
+    
+    # The page is a keyset find on the *_created_order indexes; counts are a
+    # separate $group so the page never waits on an in-memory sort
+    collection = Order.get_motor_collection()
+    page, counts = await asyncio.gather(
+        collection.find({**match, **page_match})
+            .sort([("created_at", -1), ("order_id", -1)])
+            .limit(limit + 1)
+            .to_list(length=limit + 1),
+        collection.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+    )
+    
+    orders = page[:limit]
+    next_cursor = None
+    if len(page) > limit:
+        last = orders[-1]
+        next_cursor = encode_inbox_cursor(last["created_at"], last["order_id"])
+    
+    status_counts = {order_status: 0 for order_status in ORDER_STATUSES}
+    for entry in counts:
+        status_counts[entry["_id"]] = entry["count"]
+    
+    return OrderInboxResponse(
+        orders=[OrderResponse(**order) for order in orders],
+        status_counts=status_counts,
+        total_count=sum(status_counts.values()),
+        next_cursor=next_cursor
+    )
+
+@router.post("/orders/bulk-status", response_model=BulkOrderStatusResponse)
+async def bulk_update_order_status(
+    bulk_update: BulkOrderStatusUpdate,
+    current_user: User = Depends(get_current_user)
+):
+    """Move many orders to the next status (pending → confirmed → fulfilled) in one request"""
+    if current_user.role != "vendor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only vendors can update order status"
+        )
+    
+    if bulk_update.status not in PREVIOUS_STATUS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid status. Must be one of: {', '.join(PREVIOUS_STATUS)}"
+        )
+    
+    results = await OrderService.bulk_update_status(current_user.user_id, bulk_update.order_ids, bulk_update.status)
+    updated_count = sum(1 for result in results if result.success)
+    
+    return BulkOrderStatusResponse(
+        results=results,
+        updated_count=updated_count,
+        failed_count=len(results) - updated_count
+    )
+
 @router.get("/orders/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: int, current_user: User = Depends(get_current_user)):
-    order = await Order.find_one(Order.order_id == order_id)
+    # Old fulfilled orders are served from the archive
+    order = await find_order(order_id)
     
     if not order:
         raise HTTPException(
@@ -170,24 +445,19 @@ async def update_order_status(
             detail="Only vendors can update order status"
         )
     
-    order = await Order.find_one(Order.order_id == order_id, Order.vendor_id == current_user.user_id)
-    
-    if not order:
+    if status_update.status not in ORDER_STATUSES:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Order not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}"
         )
     
-    valid_statuses = ["pending", "confirmed", "fulfilled"]
-    if status_update.status not in valid_statuses:
+    if status_update.status not in PREVIOUS_STATUS:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Orders can't be moved back to {status_update.status}"
         )
     
-    order.status = status_update.status
-    order.updated_at = datetime.utcnow()
-    await order.save()
+    order = await OrderService.update_status(current_user.user_id, order_id, status_update.status)
     
     return OrderResponse(**order.dict())
 
@@ -197,23 +467,6 @@ async def update_order_notes(
     notes_update: OrderNotesUpdate,
     current_user: User = Depends(get_current_user)
 ):
-    order = await Order.find_one(Order.order_id == order_id)
-    
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Order not found"
-        )
-    
-    if (current_user.role == "restaurant" and order.restaurant_id != current_user.user_id) or \
-       (current_user.role == "vendor" and order.vendor_id != current_user.user_id):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
-    
-    order.notes = notes_update.notes
-    order.updated_at = datetime.utcnow()
-    await order.save()
+    order = await OrderService.update_notes(current_user, order_id, notes_update.notes)
     
     return OrderResponse(**order.dict())
\ No newline at end of file
@@ -6,6 +6,8 @@ from datetime import datetime
 
 from ..mongo_models import User
 from ..auth_simple import verify_token
+from ..snapshot_propagation import snapshot_propagator
+from ..typeahead import typeahead_index
 
 router = APIRouter()
 
@@ -64,6 +66,7 @@ async def update_my_profile(
     current_user: User = Depends(get_current_user)
 ):
     """Update the profile of the currently authenticated user."""
+    previous_contact = (current_user.name, current_user.email, current_user.phone, current_user.address)
     current_user.name = profile_data.name
     current_user.email = profile_data.email
     current_user.phone = profile_data.phone
@@ -72,6 +75,11 @@ async def update_my_profile(
     
     await current_user.save()
     
+    # Orders embed these fields; refresh them in the background
+    if (current_user.name, current_user.email, current_user.phone, current_user.address) != previous_contact:
+        snapshot_propagator.enqueue(current_user.user_id)
+        typeahead_index.upsert_vendor(current_user)
+    
     return UserProfileResponse(
         user_id=current_user.user_id,
         username=current_user.username,
@@ -4,6 +4,7 @@ from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from ..mongo_models import User, VendorProfile
 from ..inventory_models import InventoryItem, InventorySKU, InventoryCategory
+from ..order_pricing import sku_unit_price
 from ..auth_simple import verify_token
 from datetime import datetime
 from beanie import PydanticObjectId
@@ -111,7 +112,7 @@ async def get_vendor_storefront(
                 InventorySKU.is_active == True
             )
         
-        price = default_sku.price if default_sku else item.base_price
+        price = sku_unit_price(default_sku) if default_sku else item.base_price
         quantity_available = default_sku.current_stock if default_sku else 0
         in_stock = quantity_available > 0
         
@@ -232,7 +233,7 @@ async def get_vendor_products(
                 InventorySKU.is_active == True
             )
         
-        price = default_sku.price if default_sku else item.base_price
+        price = sku_unit_price(default_sku) if default_sku else item.base_price
         quantity_available = default_sku.current_stock if default_sku else 0
         in_stock = quantity_available > 0
         
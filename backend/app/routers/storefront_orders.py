@@ -2,8 +2,17 @@ from fastapi import APIRouter, HTTPException, status, Header, Depends
 from fastapi.security import OAuth2PasswordBearer
 from ..order_models import OrderCreate, OrderResponse
 from ..mongo_models import User, Order, RestaurantInfo, VendorInfo
+from ..order_items import format_items_text, order_total
+from ..order_pricing import price_order_items
+from ..stock_reservations import StockReservationService, InsufficientStockError
+from ..idempotency import run_idempotent
+from ..order_archive import next_order_id
+from ..order_events import order_events, order_event
+from ..order_rollups import OrderRollupService
+from ..typeahead import typeahead_index
 from ..auth_simple import verify_token
 from datetime import datetime
+from typing import Optional
 import uuid
 
 router = APIRouter()
@@ -25,6 +34,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 @router.post("/orders", response_model=OrderResponse)
 async def create_storefront_order(
     order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -32,8 +42,18 @@ async def create_storefront_order(
     
     This endpoint accepts order data from the vendor storefront, processes it,
     and saves it to MongoDB so it appears in the restaurant dashboard.
+    Retries sent with the same Idempotency-Key header return the first response.
     """
-    
+    return await run_idempotent(
+        idempotency_key,
+        current_user.user_id,
+        "POST /api/storefront/orders",
+        order_data,
+        lambda: place_storefront_order(order_data, current_user)
+    )
+
+async def place_storefront_order(order_data: OrderCreate, current_user: User) -> OrderResponse:
+    """Validate a storefront order, reserve its stock and save it"""
     # Validate that we have items in the order
     if not order_data.items:
         raise HTTPException(
@@ -73,19 +93,30 @@ async def create_storefront_order(
             detail="Vendor not found"
         )
     
-    # Generate next order ID
-    last_order = await Order.find().sort(-Order.order_id).limit(1).first_or_none()
-    next_order_id = (last_order.order_id + 1) if last_order else 1
+    # Prices and names come from the catalog, not from the client
+    line_items, price_changes, unknown_products = await price_order_items(order_data.vendor_id, order_data.items)
+    if unknown_products:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown or unavailable products: {', '.join(unknown_products)}"
+        )
+    if price_changes and not order_data.accept_price_changes:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Prices have changed since the cart was loaded",
+                "price_changes": [change.dict() for change in price_changes]
+            }
+        )
+    # Plain-text format for compatibility with existing clients
+    items_text = format_items_text(line_items)
     
-    # Convert items to text format for compatibility with existing Order model
-    items_text = "\n".join([
-        f"{item.name}: {item.quantity} x ${item.price:.2f}"
-        for item in order_data.items
-    ])
+    # Generate next order ID
+    order_id = await next_order_id()
     
     # Create and save the order to database
     new_order = Order(
-        order_id=next_order_id,
+        order_id=order_id,
         restaurant_id=restaurant_id,
         vendor_id=order_data.vendor_id,
         restaurant=RestaurantInfo(
@@ -101,12 +132,24 @@ async def create_storefront_order(
             email=vendor.email
         ),
         items_text=items_text,
+        line_items=line_items,
+        total_amount=order_total(line_items),
         status="pending"
     )
     
-    await new_order.insert()
+    # Reserves stock for every SKU line in the same transaction as the insert
+    try:
+        await StockReservationService.create_order_with_reservation(new_order)
+    except InsufficientStockError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Insufficient stock for SKU {e.sku_id}"
+        )
+    order_events.publish(order_event("order.created", new_order))
+    await OrderRollupService.record_order_created(new_order)
+    typeahead_index.record_order(new_order)
     
-    print(f"🔍 Storefront order created: Order {next_order_id} for restaurant {restaurant_id} from vendor {order_data.vendor_id}")
+    print(f"🔍 Storefront order created: Order {order_id} for restaurant {restaurant_id} from vendor {order_data.vendor_id}")
     
     # Calculate total items
     total_items = sum(item.quantity for item in order_data.items)
@@ -114,9 +157,11 @@ async def create_storefront_order(
     # Return success response
     return OrderResponse(
         message="Order placed successfully",
-        order_id=str(next_order_id),
+        order_id=str(order_id),
         vendor_id=order_data.vendor_id,
         restaurant_id=restaurant_id,
         total_items=total_items,
-        status="pending"
+        status="pending",
+        total_amount=new_order.total_amount,
+        price_changes=price_changes
     )
\ No newline at end of file
@@ -1,8 +1,10 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, status, Header
-from pydantic import BaseModel
-from ..mongo_models import User, VendorProfile
+from pydantic import BaseModel, validator
+from ..mongo_models import User, VendorProfile, GeoPoint
+from ..delivery_area import validate_service_area
 from ..auth_simple import verify_token
+from ..typeahead import typeahead_index
 from datetime import datetime
 
 router = APIRouter()
@@ -13,6 +15,9 @@ class VendorProfileUpdate(BaseModel):
     specialties: Optional[List[str]] = None
     business_hours: Optional[str] = None
     delivery_areas: Optional[str] = None
+    location: Optional[GeoPoint] = None
+    service_area: Optional[Dict[str, Any]] = None
+    delivery_radius_miles: Optional[float] = None
     minimum_order: Optional[float] = None
     payment_terms: Optional[str] = None
     certifications: Optional[List[str]] = None
@@ -24,6 +29,8 @@ class VendorProfileUpdate(BaseModel):
     categories: Optional[List[str]] = None
     is_active: Optional[bool] = None
 
+    _check_service_area = validator("service_area", allow_reuse=True)(validate_service_area)
+
 class VendorProfileResponse(BaseModel):
     user_id: int
     business_type: Optional[str] = None
@@ -33,6 +40,9 @@ class VendorProfileResponse(BaseModel):
     is_active: bool = True
     business_hours: Optional[str] = None
     delivery_areas: Optional[str] = None
+    location: Optional[GeoPoint] = None
+    service_area: Optional[Dict[str, Any]] = None
+    delivery_radius_miles: Optional[float] = None
     minimum_order: float = 0.0
     payment_terms: Optional[str] = None
     certifications: List[str] = []
@@ -108,6 +118,7 @@ async def update_vendor_profile(
     
     current_user.updated_at = datetime.utcnow()
     await current_user.save()
+    typeahead_index.upsert_vendor(current_user)
     
     return VendorProfileResponse(
         user_id=current_user.user_id,
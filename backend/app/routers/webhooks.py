@@ -8,6 +8,8 @@ from fastapi import APIRouter, Request, HTTPException, status
 from pydantic import BaseModel
 from ..mongo_models import User
 from ..admin_auth import log_user_event
+from ..snapshot_propagation import snapshot_propagator
+from ..typeahead import typeahead_index
 
 router = APIRouter()
 
@@ -197,18 +199,26 @@ async def handle_user_updated(user_data: Dict[str, Any], request: Request):
             primary_email = email_addresses[0].get('email_address')
         
         # Update user fields
+        contact_changed = False
         if primary_email and primary_email != user.email:
             user.email = primary_email
+            contact_changed = True
         
         first_name = user_data.get('first_name', '')
         last_name = user_data.get('last_name', '')
         full_name = f"{first_name} {last_name}".strip()
         if full_name and full_name != user.name:
             user.name = full_name
+            contact_changed = True
         
         user.updated_at = datetime.utcnow()
         await user.save()
         
+        # Orders embed name and email; refresh them in the background
+        if contact_changed:
+            snapshot_propagator.enqueue(user.user_id)
+            typeahead_index.upsert_vendor(user)
+        
         print(f"✅ Updated user from Clerk webhook: {primary_email}")
         
         # Log user update event
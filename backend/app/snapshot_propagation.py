@@ -0,0 +1,93 @@
+"""
+Propagates profile changes into the RestaurantInfo / VendorInfo snapshots
+embedded in orders.
+
+Profile updates only enqueue the user_id. A single background worker then
+rewrites that user's snapshot on the hot orders collection in chunks, pausing
+between chunks so a user with thousands of orders doesn't crowd out request
+traffic. Archived orders keep the contact details they were fulfilled with.
+"""
+import asyncio
+import logging
+from typing import Set
+from .mongo_models import User, Order, RestaurantInfo, VendorInfo
+
+logger = logging.getLogger(__name__)
+
+PROPAGATION_CHUNK_SIZE = 500
+PROPAGATION_PAUSE_SECONDS = 0.2
+
+SNAPSHOT_FIELDS = {
+    "restaurant": ("restaurant_id", "restaurant", RestaurantInfo),
+    "vendor": ("vendor_id", "vendor", VendorInfo),
+}
+
+
+class SnapshotPropagator:
+    """Queue and worker that refresh order snapshots after profile changes"""
+
+    def __init__(self, chunk_size: int = PROPAGATION_CHUNK_SIZE, pause_seconds: float = PROPAGATION_PAUSE_SECONDS):
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._queued: Set[int] = set()
+
+    def enqueue(self, user_id: int):
+        """Schedule a refresh; a user already waiting in the queue isn't added twice"""
+        if user_id not in self._queued:
+            self._queued.add(user_id)
+            self._queue.put_nowait(user_id)
+
+    async def propagate(self, user_id: int) -> int:
+        """Rewrite the user's snapshot on every order where it is out of date"""
+        user = await User.find_one(User.user_id == user_id)
+        if user is None or user.role not in SNAPSHOT_FIELDS:
+            return 0
+
+        party_field, snapshot_field, info_model = SNAPSHOT_FIELDS[user.role]
+        snapshot = info_model(
+            name=user.name,
+            phone=user.phone,
+            address=user.address,
+            email=user.email
+        ).dict()
+        stale = {
+            party_field: user_id,
+            "$or": [{f"{snapshot_field}.{key}": {"$ne": value}} for key, value in snapshot.items()]
+        }
+
+        collection = Order.get_motor_collection()
+        updated = 0
+        while True:
+            # Matching on staleness makes each chunk skip orders already rewritten
+            chunk = await collection.find(stale, {"_id": 1}).limit(self.chunk_size).to_list(length=self.chunk_size)
+            if not chunk:
+                break
+            result = await collection.update_many(
+                {"_id": {"$in": [order["_id"] for order in chunk]}},
+                {"$set": {snapshot_field: snapshot}}
+            )
+            updated += result.modified_count
+            if len(chunk) < self.chunk_size:
+                break
+            await asyncio.sleep(self.pause_seconds)
+
+        if updated:
+            logger.info(f"Refreshed {snapshot_field} snapshot for user {user_id} on {updated} orders")
+        return updated
+
+    async def run(self):
+        """Process queued users one at a time until cancelled"""
+        while True:
+            user_id = await self._queue.get()
+            # Changes made from here on queue the user again
+            self._queued.discard(user_id)
+            try:
+                await self.propagate(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to refresh order snapshots for user {user_id}: {str(e)}")
+
+
+snapshot_propagator = SnapshotPropagator()
@@ -0,0 +1,178 @@
+"""
+Stock movement ledger and point-in-time stock levels.
+
+Every write that changes a SKU's current or reserved stock records a
+StockMovement built from the document returned by that same update, so each
+entry carries the exact levels it left the SKU at. A request's movements are
+inserted with one insert_many inside the transaction of its stock writes, so
+the ledger commits or rolls back together with the stock it describes.
+
+A periodic snapshot of every recently changed SKU bounds how far back a
+point-in-time lookup has to look: the stock at a moment is the last movement
+between the preceding snapshot and that moment, or the snapshot itself.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, List, Mapping, Optional
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from .inventory_models import (
+    InventorySKU, StockMovement, StockSnapshot, StockMovementResponse, StockLevelResponse
+)
+
+logger = logging.getLogger(__name__)
+
+MOVEMENT_TYPES = ("receive", "sale", "adjustment", "reservation", "release")
+SNAPSHOT_INTERVAL_HOURS = int(os.getenv("STOCK_SNAPSHOT_INTERVAL_HOURS", "24"))
+SNAPSHOT_BATCH_SIZE = 1000
+
+# Fields to read back from a stock update to build its movement
+MOVEMENT_PROJECTION = {"_id": 0, "sku_id": 1, "vendor_id": 1, "item_id": 1, "current_stock": 1, "reserved_stock": 1}
+
+# created_at only has millisecond precision once stored; _id keeps record order within a batch
+NEWEST_FIRST = ("-created_at", "-_id")
+
+
+def stock_movement(
+    sku: Mapping[str, Any],
+    movement_type: str,
+    quantity: int = 0,
+    reserved_quantity: int = 0,
+    order_id: Optional[int] = None
+) -> StockMovement:
+    """Ledger entry for a SKU document (raw or ``InventorySKU.dict()``) as it was after the change"""
+    return StockMovement(
+        vendor_id=sku["vendor_id"],
+        item_id=sku["item_id"],
+        sku_id=sku["sku_id"],
+        movement_type=movement_type,
+        quantity=quantity,
+        reserved_quantity=reserved_quantity,
+        current_stock=sku["current_stock"],
+        reserved_stock=sku["reserved_stock"],
+        order_id=order_id
+    )
+
+
+async def insert_movements(movements: List[StockMovement], session=None):
+    """Write a request's movements with one insert_many, in the transaction of its stock writes"""
+    if movements:
+        await StockMovement.insert_many(movements, session=session)
+
+
+class StockLedgerService:
+    """Reads the movement ledger and maintains stock snapshots"""
+
+    @staticmethod
+    async def _get_vendor_sku(vendor_id: int, sku_id: int) -> InventorySKU:
+        sku = await InventorySKU.find_one(
+            InventorySKU.sku_id == sku_id,
+            InventorySKU.vendor_id == vendor_id
+        )
+        if not sku:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="SKU not found"
+            )
+        return sku
+
+    @staticmethod
+    async def get_movements(
+        vendor_id: int,
+        sku_id: int,
+        before: Optional[datetime] = None,
+        limit: int = 100
+    ) -> List[StockMovementResponse]:
+        """A SKU's movements, newest first"""
+        await StockLedgerService._get_vendor_sku(vendor_id, sku_id)
+
+        query = StockMovement.find(StockMovement.sku_id == sku_id)
+        if before is not None:
+            query = query.find(StockMovement.created_at < before)
+        movements = await query.sort(*NEWEST_FIRST).limit(limit).to_list()
+        return [
+            StockMovementResponse(**movement.dict(exclude={"id", "vendor_id", "item_id"}))
+            for movement in movements
+        ]
+
+    @staticmethod
+    async def stock_at(vendor_id: int, sku_id: int, at: datetime) -> StockLevelResponse:
+        """Stock levels of a SKU at a past moment, from the last snapshot and movement before it"""
+        await StockLedgerService._get_vendor_sku(vendor_id, sku_id)
+
+        snapshot = await StockSnapshot.find(
+            StockSnapshot.sku_id == sku_id,
+            StockSnapshot.taken_at <= at
+        ).sort(-StockSnapshot.taken_at).first_or_none()
+
+        # Movements since the snapshot; only the latest matters since it carries the levels
+        query = StockMovement.find(StockMovement.sku_id == sku_id, StockMovement.created_at <= at)
+        if snapshot:
+            query = query.find(StockMovement.created_at > snapshot.taken_at)
+        movement = await query.sort(*NEWEST_FIRST).first_or_none()
+
+        if movement:
+            source, as_of, levels = "movement", movement.created_at, movement
+        elif snapshot:
+            source, as_of, levels = "snapshot", snapshot.taken_at, snapshot
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No stock history for this SKU at that time"
+            )
+        return StockLevelResponse(
+            sku_id=sku_id,
+            at=at,
+            current_stock=levels.current_stock,
+            reserved_stock=levels.reserved_stock,
+            available_stock=levels.current_stock - levels.reserved_stock,
+            source=source,
+            as_of=as_of
+        )
+
+    @staticmethod
+    async def take_snapshots(batch_size: int = SNAPSHOT_BATCH_SIZE) -> int:
+        """Snapshot every SKU changed since the previous run (every SKU on the first run).
+
+        Every page is stamped with the time the run started, before the first
+        read, so a snapshot never claims to be newer than the levels it holds
+        and the next run starts from the beginning of this one.
+        """
+        run_started = datetime.utcnow()
+        latest = await StockSnapshot.find().sort(-StockSnapshot.taken_at).first_or_none()
+        query = {"updated_at": {"$gte": latest.taken_at}} if latest else {}
+        collection = InventorySKU.get_motor_collection()
+
+        taken = 0
+        last_sku_id = None
+        while True:
+            page = dict(query)
+            if last_sku_id is not None:
+                page["sku_id"] = {"$gt": last_sku_id}
+            skus = await collection.find(
+                page, {"_id": 0, "sku_id": 1, "vendor_id": 1, "current_stock": 1, "reserved_stock": 1}
+            ).sort("sku_id", 1).limit(batch_size).to_list(length=batch_size)
+            if not skus:
+                break
+            await StockSnapshot.insert_many([StockSnapshot(taken_at=run_started, **sku) for sku in skus])
+            taken += len(skus)
+            last_sku_id = skus[-1]["sku_id"]
+            if len(skus) < batch_size:
+                break
+
+        if taken:
+            logger.info(f"Took stock snapshots of {taken} SKUs")
+        return taken
+
+
+async def run_stock_snapshotter(interval_hours: int = SNAPSHOT_INTERVAL_HOURS):
+    """Background loop taking stock snapshots until cancelled"""
+    while True:
+        try:
+            await StockLedgerService.take_snapshots()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Stock snapshot run failed: {e}")
+        await asyncio.sleep(timedelta(hours=interval_hours).total_seconds())
@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import math
+import os
+from typing import Dict, List
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from .mongodb import db
+from .mongo_models import Order, OrderLineItem
+from .inventory_models import InventorySKU, LOW_STOCK_EXPRESSION
+from .stock_movements import stock_movement, insert_movements, MOVEMENT_PROJECTION
+
+logger = logging.getLogger(__name__)
+
+# How long a pending order holds its stock before the sweeper releases it
+RESERVATION_TTL_MINUTES = int(os.getenv("STOCK_RESERVATION_TTL_MINUTES", "60"))
+SWEEP_INTERVAL_SECONDS = int(os.getenv("STOCK_RESERVATION_SWEEP_SECONDS", "60"))
+
+
+class InsufficientStockError(Exception):
+    """Raised when a SKU does not have enough available stock for an order"""
+
+    def __init__(self, sku_id: int, requested: int):
+        self.sku_id = sku_id
+        self.requested = requested
+        super().__init__(f"Insufficient stock for SKU {sku_id}: {requested} requested")
+
+
+def reservation_quantities(line_items: List[OrderLineItem]) -> Dict[int, int]:
+    """Whole units to reserve per SKU; lines without a SKU are not stock-tracked"""
+    quantities: Dict[int, int] = {}
+    for line in line_items:
+        if line.sku_id is not None:
+            # A non-positive quantity would pass the available_stock check and create stock
+            if line.quantity <= 0:
+                raise ValueError(f"Invalid quantity {line.quantity} for SKU {line.sku_id}")
+            quantities[line.sku_id] = quantities.get(line.sku_id, 0) + int(math.ceil(line.quantity))
+    return quantities
+
+
+async def run_in_transaction(callback):
+    """Run ``callback(session)`` in a transaction, retrying transient errors"""
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(callback)
+
+
+class StockReservationService:
+    """Reserves SKU stock for orders and settles the reservation on confirmation or expiry.
+
+    available_stock is only changed through conditional atomic updates, so two
+    orders can never both take the last units of a SKU. Committing a
+    reservation lowers current_stock, so it also refreshes is_low_stock.
+    """
+
+    @staticmethod
+    async def create_order_with_reservation(order: Order) -> Order:
+        """Insert an order and reserve stock for every SKU line, all or nothing"""
+        quantities = reservation_quantities(order.line_items)
+        if not quantities:
+            await order.insert()
+            return order
+
+        order.reservation_status = "reserved"
+        order.reservation_expires_at = datetime.utcnow() + timedelta(minutes=RESERVATION_TTL_MINUTES)
+        collection = InventorySKU.get_motor_collection()
+
+        async def reserve(session):
+            now = datetime.utcnow()
+            movements = []
+            # Fixed SKU order keeps concurrent transactions from deadlocking on each other
+            for sku_id, quantity in sorted(quantities.items()):
+                sku = await collection.find_one_and_update(
+                    {
+                        "sku_id": sku_id,
+                        "vendor_id": order.vendor_id,
+                        "is_active": True,
+                        "available_stock": {"$gte": quantity}
+                    },
+                    {
+                        "$inc": {"reserved_stock": quantity, "available_stock": -quantity},
+                        "$set": {"updated_at": now}
+                    },
+                    projection=MOVEMENT_PROJECTION,
+                    return_document=ReturnDocument.AFTER,
+                    session=session
+                )
+                if sku is None:
+                    raise InsufficientStockError(sku_id, quantity)
+                movements.append(stock_movement(sku, "reservation", reserved_quantity=quantity, order_id=order.order_id))
+            await order.insert(session=session)
+            await insert_movements(movements, session)
+
+        await run_in_transaction(reserve)
+        return order
+
+    @staticmethod
+    async def commit(order: Order) -> bool:
+        """Turn the order's reservation into a stock decrement.
+
+        A reservation that was already released by the sweeper is taken again
+        from available stock, which raises InsufficientStockError if it is gone.
+        Returns False when there was nothing to commit.
+        """
+        quantities = reservation_quantities(order.line_items)
+        collection = InventorySKU.get_motor_collection()
+
+        async def settle(session):
+            now = datetime.utcnow()
+            movements = []
+            previous = await Order.get_motor_collection().find_one_and_update(
+                {"_id": order.id, "reservation_status": {"$in": ["reserved", "released"]}},
+                {"$set": {"reservation_status": "committed", "reservation_expires_at": None, "updated_at": now}},
+                projection={"reservation_status": 1},
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            if previous is None:
+                return False
+
+            for sku_id, quantity in sorted(quantities.items()):
+                if previous["reservation_status"] == "reserved":
+                    sku = await collection.find_one_and_update(
+                        {"sku_id": sku_id},
+                        [
+                            {"$set": {
+                                "current_stock": {"$subtract": ["$current_stock", quantity]},
+                                "reserved_stock": {"$subtract": ["$reserved_stock", quantity]},
+                                "updated_at": now
+                            }},
+                            {"$set": {"is_low_stock": LOW_STOCK_EXPRESSION}}
+                        ],
+                        projection=MOVEMENT_PROJECTION,
+                        return_document=ReturnDocument.AFTER,
+                        session=session
+                    )
+                    reserved_quantity = -quantity
+                else:
+                    sku = await collection.find_one_and_update(
+                        {"sku_id": sku_id, "available_stock": {"$gte": quantity}},
+                        [
+                            {"$set": {
+                                "current_stock": {"$subtract": ["$current_stock", quantity]},
+                                "available_stock": {"$subtract": ["$available_stock", quantity]},
+                                "updated_at": now
+                            }},
+                            {"$set": {"is_low_stock": LOW_STOCK_EXPRESSION}}
+                        ],
+                        projection=MOVEMENT_PROJECTION,
+                        return_document=ReturnDocument.AFTER,
+                        session=session
+                    )
+                    if sku is None:
+                        raise InsufficientStockError(sku_id, quantity)
+                    reserved_quantity = 0
+                if sku is not None:
+                    movements.append(stock_movement(
+                        sku, "sale", quantity=-quantity, reserved_quantity=reserved_quantity, order_id=order.order_id
+                    ))
+            await insert_movements(movements, session)
+            return True
+
+        committed = await run_in_transaction(settle)
+        if committed:
+            order.reservation_status = "committed"
+            order.reservation_expires_at = None
+        return committed
+
+    @staticmethod
+    async def commit_many(orders: List[Order]) -> Dict[int, InsufficientStockError]:
+        """Commit the reservations of many orders in one transaction.
+
+        Orders and SKUs are read inside the transaction, so a concurrent write
+        to any of them makes it retry instead of interleaving. The whole batch
+        is then settled with one update_many on the orders and one bulk_write
+        on the SKUs. Orders whose reservation was released take their stock
+        from available stock again; those that no longer fit are left
+        uncommitted and returned, by order_id, with their error.
+        """
+        orders_by_id = {order.id: order for order in orders}
+        quantities = {order.id: reservation_quantities(order.line_items) for order in orders}
+        sku_ids = sorted({sku_id for order_quantities in quantities.values() for sku_id in order_quantities})
+        collection = InventorySKU.get_motor_collection()
+        committed: List[Order] = []
+        errors: Dict[int, InsufficientStockError] = {}
+
+        async def settle(session):
+            now = datetime.utcnow()
+            committed.clear()
+            errors.clear()
+            movements = []
+            holding = await Order.get_motor_collection().find(
+                {"_id": {"$in": list(orders_by_id)}, "reservation_status": {"$in": ["reserved", "released"]}},
+                {"reservation_status": 1},
+                session=session
+            ).to_list(length=None)
+            skus = {
+                sku["sku_id"]: sku
+                for sku in await collection.find(
+                    {"sku_id": {"$in": sku_ids}},
+                    {**MOVEMENT_PROJECTION, "available_stock": 1},
+                    session=session
+                ).to_list(length=None)
+            }
+
+            deltas: Dict[int, Dict[str, int]] = {}
+            for state in sorted(holding, key=lambda state: orders_by_id[state["_id"]].order_id):
+                order = orders_by_id[state["_id"]]
+                reserved = state["reservation_status"] == "reserved"
+                order_quantities = sorted(quantities[order.id].items())
+                if not reserved:
+                    short = next((
+                        (sku_id, quantity) for sku_id, quantity in order_quantities
+                        if sku_id not in skus or skus[sku_id]["available_stock"] < quantity
+                    ), None)
+                    if short is not None:
+                        errors[order.order_id] = InsufficientStockError(*short)
+                        continue
+
+                for sku_id, quantity in order_quantities:
+                    sku = skus.get(sku_id)
+                    if sku is None:
+                        continue
+                    delta = deltas.setdefault(sku_id, {"current_stock": 0, "reserved_stock": 0, "available_stock": 0})
+                    held_field = "reserved_stock" if reserved else "available_stock"
+                    for field in ("current_stock", held_field):
+                        sku[field] -= quantity
+                        delta[field] -= quantity
+                    movements.append(stock_movement(
+                        sku, "sale", quantity=-quantity, reserved_quantity=-quantity if reserved else 0,
+                        order_id=order.order_id
+                    ))
+                committed.append(order)
+
+            if not committed:
+                return
+            await Order.get_motor_collection().update_many(
+                {"_id": {"$in": [order.id for order in committed]}},
+                {"$set": {"reservation_status": "committed", "reservation_expires_at": None, "updated_at": now}},
+                session=session
+            )
+            if deltas:
+                await collection.bulk_write([
+                    UpdateOne({"sku_id": sku_id}, [
+                        {"$set": {
+                            **{field: {"$add": [f"${field}", change]} for field, change in delta.items()},
+                            "updated_at": now
+                        }},
+                        {"$set": {"is_low_stock": LOW_STOCK_EXPRESSION}}
+                    ])
+                    for sku_id, delta in sorted(deltas.items())
+                ], ordered=False, session=session)
+            await insert_movements(movements, session)
+
+        await run_in_transaction(settle)
+        for order in committed:
+            order.reservation_status = "committed"
+            order.reservation_expires_at = None
+        return dict(errors)
+
+    @staticmethod
+    async def release(order: Order) -> bool:
+        """Return the order's reserved stock to available stock"""
+        quantities = reservation_quantities(order.line_items)
+        collection = InventorySKU.get_motor_collection()
+
+        async def give_back(session):
+            now = datetime.utcnow()
+            movements = []
+            result = await Order.get_motor_collection().update_one(
+                {"_id": order.id, "reservation_status": "reserved"},
+                {"$set": {"reservation_status": "released", "reservation_expires_at": None, "updated_at": now}},
+                session=session
+            )
+            if result.modified_count == 0:
+                return False
+
+            for sku_id, quantity in sorted(quantities.items()):
+                sku = await collection.find_one_and_update(
+                    {"sku_id": sku_id},
+                    {
+                        "$inc": {"reserved_stock": -quantity, "available_stock": quantity},
+                        "$set": {"updated_at": now}
+                    },
+                    projection=MOVEMENT_PROJECTION,
+                    return_document=ReturnDocument.AFTER,
+                    session=session
+                )
+                if sku is not None:
+                    movements.append(stock_movement(sku, "release", reserved_quantity=-quantity, order_id=order.order_id))
+            await insert_movements(movements, session)
+            return True
+
+        released = await run_in_transaction(give_back)
+        if released:
+            order.reservation_status = "released"
+            order.reservation_expires_at = None
+        return released
+
+    @staticmethod
+    async def release_expired(batch_size: int = 100) -> int:
+        """Release reservations of orders still pending past their deadline"""
+        expired = await Order.find(
+            Order.reservation_status == "reserved",
+            Order.reservation_expires_at < datetime.utcnow(),
+            Order.status == "pending"
+        ).limit(batch_size).to_list()
+
+        released = 0
+        for order in expired:
+            if await StockReservationService.release(order):
+                released += 1
+        if released:
+            logger.info(f"Released stock reservations for {released} expired orders")
+        return released
+
+
+async def run_reservation_sweeper(interval_seconds: int = SWEEP_INTERVAL_SECONDS):
+    """Background loop releasing expired reservations until cancelled"""
+    while True:
+        try:
+            await StockReservationService.release_expired()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Stock reservation sweep failed: {e}")
+        await asyncio.sleep(interval_seconds)
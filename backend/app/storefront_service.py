@@ -7,6 +7,7 @@ from .storefront_models import (
     CustomerWishlist, WishlistCreate
 )
 from .inventory_models import InventoryItem, InventorySKU
+from .order_pricing import sku_unit_price
 
 class StorefrontService:
     @staticmethod
@@ -117,7 +118,7 @@ class StorefrontService:
                         "sku_id": sku.sku_id,
                         "name": f"{item.name}" + (f" - {sku.variant_name}" if sku.variant_name else ""),
                         "description": item.description,
-                        "price": sku.price,
+                        "price": sku_unit_price(sku),
                         "unit_of_measure": item.unit_of_measure,
                         "brand": item.brand,
                         "image_urls": item.image_urls,
@@ -0,0 +1,369 @@
+"""
+In-memory typeahead index over product names, brands, category names and
+vendor names for marketplace autocomplete.
+
+Every suggestion is a term, and every word position of a term is a key in a
+sorted list, so a prefix lookup is a bisect followed by a scan of the matching
+keys: "tom" finds "Roma Tomatoes" through its second word. One- and
+two-letter prefixes match too much of the catalog to scan per keystroke, so
+their terms are also grouped by prefix and kind, and the most popular of each
+group are ranked once and kept until the next catalog write or reload. Products, brands and
+categories with the same name across vendors collapse into one term whose
+weight is the sum of its members' popularity (1 plus recent orders).
+
+The index loads on first use and is kept current by inventory, profile and
+order writes in this worker. A background task reloads it periodically to
+pick up writes made by other workers; requests keep using the current index
+while the reload reads the catalog, and only the very first load makes them
+wait.
+"""
+import asyncio
+import bisect
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from pydantic import BaseModel
+from .mongo_models import User, Order
+from .inventory_models import InventoryItem, InventoryCategory
+from .category_index import normalize_category_name
+
+logger = logging.getLogger(__name__)
+
+TYPEAHEAD_KINDS = ("product", "brand", "category", "vendor")
+POPULARITY_DAYS = 90
+SHORT_PREFIX_CHARS = 2  # Prefixes up to this length are served from ranked prefix groups
+TOP_SUGGESTIONS = 25  # Ranked terms kept per prefix group, the autocomplete route's largest limit
+SUGGESTION_CACHE_SIZE = 2048  # Most recently used (prefix, kinds, limit) results kept
+
+TermId = Tuple[str, str]  # (kind, normalized name, or user_id for vendors)
+
+
+class TypeaheadItemView(BaseModel):
+    """Projection of the item fields the index needs"""
+    item_id: int
+    vendor_id: int
+    name: str
+    brand: Optional[str] = None
+
+
+class TypeaheadSuggestion(BaseModel):
+    kind: str  # "product", "brand", "category" or "vendor"
+    text: str
+    weight: int
+    vendor_id: Optional[int] = None  # Set for vendor suggestions
+
+
+class _Term:
+    __slots__ = ("text", "members")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.members: Dict[str, int] = {}  # source key -> weight
+
+    @property
+    def weight(self) -> int:
+        return sum(self.members.values())
+
+
+def _term_keys(normalized: str) -> List[str]:
+    """The term itself and every suffix starting at a later word"""
+    words = normalized.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _short_prefixes(key: str) -> List[str]:
+    return [key[:length] for length in range(1, min(len(key), SHORT_PREFIX_CHARS) + 1)]
+
+
+class TypeaheadIndex:
+    """Prefix index with popularity-weighted suggestions"""
+
+    def __init__(self, reload_seconds: int = 600):
+        self.reload_seconds = reload_seconds
+        self._keys: List[Tuple[str, str, str]] = []  # sorted (key, kind, term_id)
+        self._terms: Dict[TermId, _Term] = {}
+        self._sources: Dict[str, List[TermId]] = {}  # source key -> terms it belongs to
+        self._prefix_terms: Dict[Tuple[str, str], Set[TermId]] = {}  # (short prefix, kind) -> terms
+        self._top: Dict[Tuple[str, str], List[TermId]] = {}  # (short prefix, kind) -> most popular terms
+        self._item_orders: Dict[int, int] = {}
+        self._vendor_orders: Dict[int, int] = {}
+        self._cache: "OrderedDict[Tuple[str, Tuple[str, ...], int], List[TypeaheadSuggestion]]" = OrderedDict()
+        self._loaded_at: Optional[float] = None
+        self._loading = False
+        # Writes made while a reload reads the catalog, replayed on the rebuilt index
+        self._writes_during_reload: Optional[List[Tuple[Callable[..., None], Tuple[Any, ...]]]] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_seconds
+
+    async def ensure_loaded(self):
+        """Load the index on first use; later reloads happen in the background"""
+        if self._loaded_at is None:
+            await self.reload(force=False)
+
+    async def reload(self, force: bool = True):
+        """Read the catalog and popularity, then swap the rebuilt index in.
+
+        The current index keeps serving suggestions while the reads run.
+        Writes applied to it meanwhile may be missing from the reads, so
+        they are recorded and replayed on the rebuilt index. Replaying a
+        catalog write is idempotent; an order the reads already counted is
+        counted once more, which only nudges its popularity.
+        """
+        async with self._lock:
+            if not force and self._is_fresh():
+                return
+            self._writes_during_reload = []
+            try:
+                await self._rebuild()
+                writes = self._writes_during_reload
+            finally:
+                self._writes_during_reload = None
+            for apply, args in writes:
+                apply(*args)
+
+    async def _rebuild(self):
+        since = datetime.utcnow() - timedelta(days=POPULARITY_DAYS)
+        popularity = await Order.get_motor_collection().aggregate([
+            {"$match": {"created_at": {"$gte": since}}},
+            {
+                "$facet": {
+                    "items": [
+                        {"$unwind": "$line_items"},
+                        {"$match": {"line_items.item_id": {"$ne": None}}},
+                        {"$group": {"_id": "$line_items.item_id", "orders": {"$sum": 1}}}
+                    ],
+                    "vendors": [{"$group": {"_id": "$vendor_id", "orders": {"$sum": 1}}}]
+                }
+            }
+        ]).to_list(length=1)
+        categories = await InventoryCategory.find(InventoryCategory.is_active == True).to_list()
+        items = await InventoryItem.find(InventoryItem.is_active == True).project(TypeaheadItemView).to_list()
+        vendors = await User.find(User.role == "vendor").to_list()
+
+        # No awaits from here on, so writes can't interleave with the rebuild
+        self._loading = True
+        self._keys = []
+        self._terms = {}
+        self._sources = {}
+        self._prefix_terms = {}
+        facets = popularity[0] if popularity else {"items": [], "vendors": []}
+        self._item_orders = {group["_id"]: group["orders"] for group in facets["items"]}
+        self._vendor_orders = {group["_id"]: group["orders"] for group in facets["vendors"]}
+        for category in categories:
+            self._add_category(category)
+        for item in items:
+            self._add_item(item)
+        for vendor in vendors:
+            self._add_vendor(vendor)
+        self._keys.sort()
+        self._loading = False
+        self._changed()
+        self._loaded_at = time.monotonic()
+
+    async def run(self):
+        """Background loop reloading the index every ``reload_seconds`` until cancelled"""
+        while True:
+            try:
+                await self.reload(force=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Typeahead index reload failed, keeping the current index: {e}")
+            await asyncio.sleep(self.reload_seconds)
+
+    # Term bookkeeping; while loading, keys are appended and sorted once at the end
+    def _join(self, source: str, kind: str, text: Optional[str], weight: int, term_id: Optional[str] = None):
+        normalized = normalize_category_name(text or "")
+        if not normalized:
+            return
+        term_key = (kind, term_id or normalized)
+        term = self._terms.get(term_key)
+        if term is None:
+            term = self._terms[term_key] = _Term(text.strip())
+            for key in _term_keys(normalized):
+                entry = (key, kind, term_key[1])
+                if self._loading:
+                    self._keys.append(entry)
+                else:
+                    bisect.insort(self._keys, entry)
+                for prefix in _short_prefixes(key):
+                    self._prefix_terms.setdefault((prefix, kind), set()).add(term_key)
+        term.members[source] = weight
+        self._sources.setdefault(source, []).append(term_key)
+
+    def _leave(self, source: str):
+        for term_key in self._sources.pop(source, []):
+            term = self._terms.get(term_key)
+            if term is None:
+                continue
+            term.members.pop(source, None)
+            if term.members:
+                continue
+            del self._terms[term_key]
+            kind, term_id = term_key
+            for key in _term_keys(normalize_category_name(term.text)):
+                entry = (key, kind, term_id)
+                index = bisect.bisect_left(self._keys, entry)
+                if index < len(self._keys) and self._keys[index] == entry:
+                    del self._keys[index]
+                for prefix in _short_prefixes(key):
+                    group = self._prefix_terms.get((prefix, kind))
+                    if group is not None:
+                        group.discard(term_key)
+                        if not group:
+                            del self._prefix_terms[(prefix, kind)]
+
+    def _add_category(self, category: InventoryCategory):
+        self._join(f"category:{category.category_id}", "category", category.name, 1)
+
+    def _add_item(self, item):
+        weight = 1 + self._item_orders.get(item.item_id, 0)
+        self._join(f"item:{item.item_id}", "product", item.name, weight)
+        self._join(f"item:{item.item_id}", "brand", item.brand, weight)
+
+    def _add_vendor(self, vendor: User):
+        if vendor.vendor_profile is None or not vendor.vendor_profile.is_active:
+            return
+        weight = 1 + self._vendor_orders.get(vendor.user_id, 0)
+        self._join(f"vendor:{vendor.user_id}", "vendor", vendor.name, weight, str(vendor.user_id))
+
+    # Incremental updates from writes in this worker
+    def _changed(self):
+        self._cache.clear()
+        self._top = {}
+
+    def _record_write(self, apply: Callable[..., None], *args: Any):
+        if self._writes_during_reload is not None:
+            self._writes_during_reload.append((apply, args))
+
+    def upsert_category(self, category: InventoryCategory):
+        self._record_write(self.upsert_category, category)
+        if self._loaded_at is None:
+            return
+        self._leave(f"category:{category.category_id}")
+        if category.is_active:
+            self._add_category(category)
+        self._changed()
+
+    def remove_category(self, category_id: int):
+        self._record_write(self.remove_category, category_id)
+        if self._loaded_at is None:
+            return
+        self._leave(f"category:{category_id}")
+        self._changed()
+
+    def upsert_item(self, item: InventoryItem):
+        self._record_write(self.upsert_item, item)
+        if self._loaded_at is None:
+            return
+        self._leave(f"item:{item.item_id}")
+        if item.is_active:
+            self._add_item(item)
+        self._changed()
+
+    def remove_item(self, item_id: int):
+        self._record_write(self.remove_item, item_id)
+        if self._loaded_at is None:
+            return
+        self._leave(f"item:{item_id}")
+        self._changed()
+
+    def upsert_vendor(self, user: User):
+        self._record_write(self.upsert_vendor, user)
+        if self._loaded_at is None or user.role != "vendor":
+            return
+        self._leave(f"vendor:{user.user_id}")
+        self._add_vendor(user)
+        self._changed()
+
+    def record_order(self, order: Order):
+        """Count a new order towards its items' and vendor's popularity.
+
+        Cached suggestions and prefix rankings are kept; the new weights
+        reorder them after the next catalog write or reload.
+        """
+        self._record_write(self.record_order, order)
+        if self._loaded_at is None:
+            return
+        self._vendor_orders[order.vendor_id] = self._vendor_orders.get(order.vendor_id, 0) + 1
+        self._bump(f"vendor:{order.vendor_id}", 1 + self._vendor_orders[order.vendor_id])
+        for item_id in {line.item_id for line in order.line_items if line.item_id is not None}:
+            self._item_orders[item_id] = self._item_orders.get(item_id, 0) + 1
+            self._bump(f"item:{item_id}", 1 + self._item_orders[item_id])
+
+    def _bump(self, source: str, weight: int):
+        for term_key in self._sources.get(source, []):
+            term = self._terms.get(term_key)
+            if term is not None:
+                term.members[source] = weight
+
+    def _rank(self, term_key: TermId) -> Tuple[int, int, str]:
+        term = self._terms[term_key]
+        return -term.weight, len(term.text), term.text
+
+    def _top_terms(self, prefix: str, kind: str) -> List[TermId]:
+        """Most popular terms of a short prefix group, ranked on first use"""
+        group = self._prefix_terms.get((prefix, kind))
+        if group is None:
+            return []
+        top = self._top.get((prefix, kind))
+        if top is None:
+            top = self._top[(prefix, kind)] = heapq.nsmallest(TOP_SUGGESTIONS, group, key=self._rank)
+        return top
+
+    async def suggest(
+        self,
+        prefix: str,
+        kinds: Optional[List[str]] = None,
+        limit: int = 10
+    ) -> List[TypeaheadSuggestion]:
+        """Terms with a word starting with ``prefix``, most popular first"""
+        await self.ensure_loaded()
+        query = normalize_category_name(prefix)
+        if not query:
+            return []
+        wanted = tuple(sorted(set(kinds))) if kinds else TYPEAHEAD_KINDS
+        cache_key = (query, wanted, limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return cached
+
+        matches: Set[TermId] = set()
+        if len(query) <= SHORT_PREFIX_CHARS:
+            for kind in wanted:
+                if limit <= TOP_SUGGESTIONS:
+                    matches.update(self._top_terms(query, kind))
+                else:
+                    matches.update(self._prefix_terms.get((query, kind), ()))
+        else:
+            start = bisect.bisect_left(self._keys, (query,))
+            for key, kind, term_id in itertools.islice(self._keys, start, None):
+                if not key.startswith(query):
+                    break
+                if kind in wanted:
+                    matches.add((kind, term_id))
+
+        ranked = heapq.nsmallest(limit, matches, key=self._rank)
+        suggestions = [
+            TypeaheadSuggestion(
+                kind=kind,
+                text=self._terms[(kind, term_id)].text,
+                weight=self._terms[(kind, term_id)].weight,
+                vendor_id=int(term_id) if kind == "vendor" else None
+            )
+            for kind, term_id in ranked
+        ]
+        self._cache[cache_key] = suggestions
+        if len(self._cache) > SUGGESTION_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return suggestions
+
+
+typeahead_index = TypeaheadIndex()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Move orders fulfilled more than N days ago into the orders_archive collection.
+
+Safe to run repeatedly, e.g. nightly from cron. Archived orders are still
+returned by GET /api/orders/{order_id}.
+
+Usage:
+    python archive_orders.py [--days 180] [--batch-size 500]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.mongodb import connect_to_mongo, close_mongo_connection
+from app.order_archive import archive_fulfilled_orders, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+
+async def main(days: int, batch_size: int):
+    await connect_to_mongo()
+    try:
+        archived = await archive_fulfilled_orders(days, batch_size)
+        print(f"✅ Archived {archived} orders fulfilled more than {days} days ago")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old fulfilled orders")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="Archive orders fulfilled more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Orders per bulk write")
+    args = parser.parse_args()
+    asyncio.run(main(args.days, args.batch_size))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Set ancestor_ids on every inventory category from its parent chain.
+
+Run once after deploying materialized category paths so subtree queries and
+the category tree see categories written before them. Safe to run again;
+paths are recomputed from parent_category_id.
+
+Usage:
+    python backfill_category_paths.py
+"""
+
+import asyncio
+import os
+import sys
+from collections import defaultdict
+
+# Add the app directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo import UpdateOne
+from app.mongodb import connect_to_mongo, close_mongo_connection
+from app.inventory_models import InventoryCategory
+
+
+def ancestor_path(category_id, parents):
+    """Ancestors from the root down, stopping at missing parents and cycles"""
+    path = []
+    seen = {category_id}
+    parent_id = parents.get(category_id)
+    while parent_id is not None and parent_id in parents and parent_id not in seen:
+        path.append(parent_id)
+        seen.add(parent_id)
+        parent_id = parents[parent_id]
+    path.reverse()
+    return path
+
+
+async def main():
+    await connect_to_mongo()
+    try:
+        collection = InventoryCategory.get_motor_collection()
+        vendor_parents = defaultdict(dict)
+        async for category in collection.find({}, {"_id": 0, "category_id": 1, "vendor_id": 1, "parent_category_id": 1}):
+            vendor_parents[category["vendor_id"]][category["category_id"]] = category.get("parent_category_id")
+
+        updated = 0
+        for vendor_id, parents in vendor_parents.items():
+            operations = [
+                UpdateOne(
+                    {"vendor_id": vendor_id, "category_id": category_id},
+                    {"$set": {"ancestor_ids": ancestor_path(category_id, parents)}}
+                )
+                for category_id in parents
+            ]
+            result = await collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+        print(f"✅ Updated ancestor_ids on {updated} categories across {len(vendor_parents)} vendors")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
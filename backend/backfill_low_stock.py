@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Set is_low_stock on every inventory SKU from its current stock and threshold.
+
+Run once after deploying the low-stock flag so SKUs written before it show up
+in the low-stock feed. Safe to run again; the flag is recomputed in place.
+
+Usage:
+    python backfill_low_stock.py
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.mongodb import connect_to_mongo, close_mongo_connection
+from app.inventory_models import InventorySKU, LOW_STOCK_EXPRESSION
+
+
+async def main():
+    await connect_to_mongo()
+    try:
+        result = await InventorySKU.get_motor_collection().update_many(
+            {},
+            [{"$set": {"is_low_stock": LOW_STOCK_EXPRESSION}}]
+        )
+        print(f"✅ Updated is_low_stock on {result.modified_count} of {result.matched_count} SKUs")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Backfill structured line items for orders that only have items_text.
+
+Orders are processed in _id order, in chunks, and each chunk is written with a
+single bulk_write. The filter only matches orders without line_items (or with
+an empty list next to a non-empty items_text), so the script can be stopped
+and re-run at any time.
+
+Usage:
+    python backfill_order_line_items.py [--chunk-size 500]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo import UpdateOne
+from app.mongodb import connect_to_mongo, close_mongo_connection
+from app.mongo_models import Order
+from app.order_items import parse_items_text, order_total
+
+
+async def backfill_order_line_items(chunk_size: int):
+    """Parse items_text into line_items for every order missing them"""
+    await connect_to_mongo()
+    collection = Order.get_motor_collection()
+    # Saving an old order through Beanie stores line_items as [], so empty
+    # lists on orders that have items_text are missing too
+    missing = {"$or": [
+        {"line_items": {"$exists": False}},
+        {"line_items": None},
+        {"line_items": {"$size": 0}, "items_text": {"$nin": [None, ""]}}
+    ]}
+
+    last_id = None
+    updated = 0
+    try:
+        while True:
+            query = dict(missing)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+
+            orders = await collection.find(
+                query, {"_id": 1, "items_text": 1}
+            ).sort("_id", 1).limit(chunk_size).to_list(length=chunk_size)
+            if not orders:
+                break
+
+            operations = []
+            for order in orders:
+                line_items = parse_items_text(order.get("items_text", ""))
+                operations.append(UpdateOne(
+                    {"_id": order["_id"], **missing},
+                    {"$set": {
+                        "line_items": [line.dict() for line in line_items],
+                        "total_amount": order_total(line_items)
+                    }}
+                ))
+
+            result = await collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            last_id = orders[-1]["_id"]
+            print(f"🔄 Backfilled {updated} orders so far")
+
+        print(f"✅ Backfill complete: {updated} orders updated")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill structured order line items from items_text")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Orders per bulk write")
+    args = parser.parse_args()
+    asyncio.run(backfill_order_line_items(args.chunk_size))
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Rebuild the order_rollups collection from orders and orders_archive.
+
+Run once after deploying rollups, and again whenever the rollups need to be
+repaired. Every bucket is recomputed and overwritten.
+
+Usage:
+    python backfill_order_rollups.py
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.mongodb import connect_to_mongo, close_mongo_connection
+from app.order_rollups import OrderRollupService
+
+
+async def main():
+    await connect_to_mongo()
+    try:
+        written = await OrderRollupService.rebuild()
+        print(f"✅ Rebuilt {written} order rollups")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+import itertools
+import random
+
+from app.basket_optimizer import optimize_basket
+from app.comparison_models import (
+    Availability,
+    PricingDetails,
+    ProductComparisonResult,
+    ProductQuery,
+    VendorResult
+)
+
+
+def offer(vendor_id, unit_price, delivery_fee=0.0, minimum_order=None, quantity_available=None, in_stock=True):
+    return VendorResult(
+        vendor_id=vendor_id,
+        vendor_name=f"Vendor {vendor_id}",
+        product_id=f"{vendor_id}-{unit_price}",
+        product_name="Product",
+        category="Produce",
+        pricing=PricingDetails(unit_price=unit_price, total_cost=unit_price, delivery_fee=delivery_fee),
+        availability=Availability(in_stock=in_stock, quantity_available=quantity_available),
+        minimum_order=minimum_order
+    )
+
+
+def line(name, quantity, *offers):
+    return ProductComparisonResult(query=ProductQuery(name=name, quantity=quantity), vendors=list(offers))
+
+
+def brute_force(results):
+    """Cheapest total over every assignment that meets all minimums, or None"""
+    lines = [
+        [vendor for vendor in result.vendors if vendor.availability.in_stock]
+        for result in results
+    ]
+    best = None
+    for choice in itertools.product(*lines):
+        subtotals = {}
+        for result, vendor in zip(results, choice):
+            subtotals[vendor.vendor_id] = subtotals.get(vendor.vendor_id, 0.0) \
+                + vendor.pricing.unit_price * result.query.quantity
+        fees = {vendor.vendor_id: vendor.pricing.delivery_fee or 0.0 for vendor in choice}
+        minimums = {vendor.vendor_id: vendor.minimum_order or 0.0 for vendor in choice}
+        if any(subtotal < minimums[vendor_id] - 1e-9 for vendor_id, subtotal in subtotals.items()):
+            continue
+        total = sum(subtotals.values()) + sum(fees.values())
+        if best is None or total < best:
+            best = total
+    return best
+
+
+def random_basket(rng, lines=5, vendors=4, minimums=False):
+    vendor_fees = {f"v{v}": rng.choice([0.0, 5.0, 10.0, 15.0]) for v in range(vendors)}
+    vendor_minimums = {f"v{v}": rng.choice([0.0, 20.0, 60.0]) if minimums else None for v in range(vendors)}
+    results = []
+    for i in range(lines):
+        offers = [
+            offer(vendor_id, round(rng.uniform(1, 20), 2), vendor_fees[vendor_id], vendor_minimums[vendor_id])
+            for vendor_id in rng.sample(sorted(vendor_fees), rng.randint(1, vendors))
+        ]
+        results.append(line(f"product {i}", rng.randint(1, 4), *offers))
+    return results
+
+
+def assert_meets_minimums(plan):
+    for vendor in plan.vendors:
+        assert vendor.subtotal >= vendor.minimum_order - 0.01
+
+
+def test_consolidates_vendors_to_save_delivery_fees():
+    plan = optimize_basket([
+        line("tomatoes", 1, offer("a", 10.0, delivery_fee=5.0), offer("b", 11.0, delivery_fee=5.0)),
+        line("lettuce", 1, offer("a", 11.0, delivery_fee=5.0), offer("b", 10.0, delivery_fee=5.0)),
+    ])
+
+    assert {assignment.vendor_id for assignment in plan.lines} in ({"a"}, {"b"})
+    assert plan.total_cost == 26.0
+    assert plan.baseline_cost == 30.0
+    assert plan.potential_savings == 4.0
+    assert plan.optimal
+
+
+def test_matches_brute_force_and_never_loses_to_greedy_without_minimums():
+    rng = random.Random(7)
+    for _ in range(50):
+        results = random_basket(rng)
+        plan = optimize_basket(results, time_budget_ms=2000)
+
+        assert plan.optimal
+        assert plan.meets_minimums
+        assert plan.total_cost <= plan.baseline_cost + 0.01
+        assert abs(plan.total_cost - brute_force(results)) < 0.01
+
+
+def test_respects_vendor_minimums():
+    # Vendor "a" is cheapest on both lines but the basket can't reach its minimum
+    plan = optimize_basket([
+        line("tomatoes", 2, offer("a", 5.0, minimum_order=100.0), offer("b", 6.0)),
+        line("lettuce", 1, offer("a", 3.0, minimum_order=100.0), offer("b", 4.0)),
+    ])
+
+    assert plan.meets_minimums
+    assert {assignment.vendor_id for assignment in plan.lines} == {"b"}
+    assert plan.total_cost == 16.0
+
+
+def test_plans_with_minimums_are_valid_and_no_worse_than_brute_force_allows():
+    rng = random.Random(11)
+    for _ in range(50):
+        results = random_basket(rng, minimums=True)
+        plan = optimize_basket(results, time_budget_ms=2000)
+        best = brute_force(results)
+
+        if best is None:
+            assert not plan.meets_minimums
+            continue
+        if plan.meets_minimums:
+            assert_meets_minimums(plan)
+            assert plan.total_cost >= best - 0.01
+
+
+def test_falls_back_to_cheapest_per_line_when_no_minimum_can_be_met():
+    plan = optimize_basket([
+        line("tomatoes", 1, offer("a", 5.0, minimum_order=100.0)),
+        line("lettuce", 1, offer("b", 3.0, minimum_order=100.0)),
+    ])
+
+    assert not plan.meets_minimums
+    assert not plan.optimal
+    assert [assignment.vendor_id for assignment in plan.lines] == ["a", "b"]
+    assert plan.total_cost == plan.baseline_cost == 8.0
+
+
+def test_skips_offers_without_enough_stock():
+    plan = optimize_basket([
+        line("tomatoes", 5, offer("a", 1.0, quantity_available=2), offer("b", 2.0)),
+        line("basil", 1, offer("a", 1.0, in_stock=False)),
+    ])
+
+    assert [assignment.vendor_id for assignment in plan.lines] == ["b"]
+    assert plan.unassigned_products == ["basil"]
+
+
+def test_returns_the_greedy_plan_when_the_budget_runs_out():
+    rng = random.Random(3)
+    results = random_basket(rng, lines=12, vendors=10)
+    plan = optimize_basket(results, time_budget_ms=0)
+
+    assert not plan.optimal
+    assert plan.meets_minimums
+    assert len(plan.lines) == len(results)
+    assert plan.total_cost <= plan.baseline_cost + 0.01
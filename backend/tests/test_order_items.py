@@ -0,0 +1,71 @@
+from app.mongo_models import OrderLineItem
+from app.order_items import (
+    format_items_text,
+    order_total,
+    parse_items_line,
+    parse_items_text,
+    parse_product_id
+)
+
+
+def test_parses_storefront_lines():
+    line = parse_items_line("Roma Tomatoes: 3 x $2.50")
+
+    assert line.name == "Roma Tomatoes"
+    assert line.quantity == 3
+    assert line.unit_price == 2.5
+    assert line.extended_price == 7.5
+
+
+def test_parses_free_text_quantities_and_units():
+    assert parse_items_line("10 lbs tomatoes").dict(include={"name", "quantity", "unit"}) == {
+        "name": "tomatoes", "quantity": 10, "unit": "lbs"
+    }
+    assert parse_items_line("Eggs x 12").dict(include={"name", "quantity", "unit"}) == {
+        "name": "Eggs", "quantity": 12, "unit": None
+    }
+    assert parse_items_line("tomatoes - 10 lbs").dict(include={"name", "quantity", "unit"}) == {
+        "name": "tomatoes", "quantity": 10, "unit": "lbs"
+    }
+
+
+def test_keeps_unrecognized_lines_as_single_units():
+    line = parse_items_line("whatever fresh herbs you have")
+
+    assert line.name == "whatever fresh herbs you have"
+    assert line.quantity == 1
+
+
+def test_skips_blank_lines_and_bullets():
+    lines = parse_items_text("- 2 cases lettuce\n\n  \n* basil x 3\n")
+
+    assert [(line.name, line.quantity) for line in lines] == [("lettuce", 2), ("basil", 3)]
+    assert parse_items_text(None) == []
+
+
+def test_format_round_trips_through_the_parser():
+    line_items = [
+        OrderLineItem(name="Roma Tomatoes", quantity=3, unit_price=2.5, extended_price=7.5),
+        OrderLineItem(name="Eggs", quantity=12),
+    ]
+
+    parsed = parse_items_text(format_items_text(line_items))
+
+    assert [(line.name, line.quantity, line.unit_price) for line in parsed] == [
+        ("Roma Tomatoes", 3, 2.5), ("Eggs", 12, None)
+    ]
+
+
+def test_order_total_needs_every_line_priced():
+    priced = [OrderLineItem(name="a", quantity=1, extended_price=1.25), OrderLineItem(name="b", quantity=2, extended_price=2.5)]
+
+    assert order_total(priced) == 3.75
+    assert order_total(priced + [OrderLineItem(name="c", quantity=1)]) is None
+    assert order_total([]) is None
+
+
+def test_parse_product_id():
+    assert parse_product_id("12") == (12, None)
+    assert parse_product_id("12-34") == (12, 34)
+    assert parse_product_id("abc") == (None, None)
+    assert parse_product_id(None) == (None, None)
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+from app.inventory_service import stock_operations_pipeline
+
+
+def evaluate(expression, document):
+    """Evaluate the aggregation operators the stock pipelines use"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document[expression[1:]]
+    if not isinstance(expression, dict):
+        return expression
+    (operator, argument), = expression.items()
+    if operator == "$literal":
+        return argument
+    values = [evaluate(value, document) for value in argument]
+    if operator == "$add":
+        return sum(values)
+    if operator == "$subtract":
+        return values[0] - values[1]
+    if operator == "$max":
+        return max(values)
+    if operator == "$lte":
+        return values[0] <= values[1]
+    raise AssertionError(f"Unexpected operator {operator}")
+
+
+def apply_pipeline(pipeline, document):
+    document = dict(document)
+    for stage in pipeline:
+        (operator, fields), = stage.items()
+        assert operator == "$set"
+        # Every expression in a $set stage sees the document as it was before the stage
+        document.update({field: evaluate(value, document) for field, value in fields.items()})
+    return document
+
+
+def apply(operations, current_stock=10, reserved_stock=2, low_stock_threshold=3):
+    return apply_pipeline(stock_operations_pipeline(operations, datetime(2024, 1, 1)), {
+        "current_stock": current_stock,
+        "reserved_stock": reserved_stock,
+        "low_stock_threshold": low_stock_threshold
+    })
+
+
+@pytest.mark.parametrize("operations, current_stock, change", [
+    ([(5, "add")], 15, 5),
+    ([(4, "subtract")], 6, -4),
+    ([(7, "set")], 7, -3),
+    ([(10, "set")], 10, 0),
+    ([(3, "add"), (2, "add"), (4, "subtract")], 11, 1),
+])
+def test_operations_compose_in_order(operations, current_stock, change):
+    sku = apply(operations)
+
+    assert sku["current_stock"] == current_stock
+    assert sku["last_stock_change"] == change
+    assert sku["available_stock"] == current_stock - 2
+
+
+def test_stock_is_clamped_at_zero_after_every_operation():
+    # Subtracting 20 from 10 clamps to 0 before the add, like two update_stock calls
+    sku = apply([(20, "subtract"), (5, "add")])
+
+    assert sku["current_stock"] == 5
+    assert sku["last_stock_change"] == -5
+
+
+def test_a_set_overrides_the_operations_before_it():
+    sku = apply([(100, "add"), (50, "subtract"), (4, "set"), (1, "add")])
+
+    assert sku["current_stock"] == 5
+    assert sku["last_stock_change"] == -5
+    assert len(stock_operations_pipeline([(100, "add"), (4, "set"), (1, "add")], datetime(2024, 1, 1))) == 4
+
+
+def test_low_stock_follows_the_new_level():
+    assert apply([(7, "subtract")])["is_low_stock"] is True
+    assert apply([(7, "subtract"), (5, "add")])["is_low_stock"] is False